@@ -73,6 +73,8 @@ class Coin(AnimatedSprite):
 
         # Звук подбора
         self.selection_sound = selection_sound
+        # Тип монеты (нужен, чтобы восстановить монету после выгрузки чанка)
+        self.type_of_coin = type_of_coin
 
         # Присваивание цены
         self.cost = None
@@ -0,0 +1,141 @@
+"""Замеры скорости загрузки уровней
+
+Запуск: python benchmark.py [--repeat N] [--copies N] [--workers N]
+
+"""
+import argparse
+import os
+import tempfile
+from time import perf_counter
+
+# Окно для замеров не нужно
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+
+from level_loader import parse_level, load_level, LevelWindow, \
+    COMPILED_LEVEL_EXTENSION
+from constants import CHUNK_SIZE, CHUNK_UNLOAD_RADIUS, CHUNK_PREPARE_WORKERS
+from tile_types import load_tile_images, load_enemy_images
+from world import World
+
+
+def make_large_level(directory: str, copies: int) -> str:
+    """ Синтетический длинный уровень: первый уровень, повторённый
+    несколько раз по горизонтали
+
+    :param directory: папка, куда будет записан уровень
+    :param copies: сколько раз повторить исходный уровень
+    :return: название файла уровня
+    """
+    with open(os.path.join('data', 'levels', 'level_1.txt'),
+              encoding='utf8') as map_file:
+        rows = [line.rstrip('\n') for line in map_file]
+    width = max(map(len, rows))
+    rows = [row.ljust(width, '.') for row in rows]
+    # Игрок должен быть на уровне ровно один раз
+    tail = [row.replace('@', '.') for row in rows]
+    filename = 'level_benchmark.txt'
+    with open(os.path.join(directory, filename), 'w',
+              encoding='utf8') as map_file:
+        map_file.write('\n'.join(
+            row + tail_row * (copies - 1) for row, tail_row in zip(rows, tail)
+        ))
+    return filename
+
+
+def measure(function, repeat: int) -> float:
+    """Лучшее время выполнения функции из нескольких запусков"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def load_image(filename: str) -> pygame.Surface:
+    """Загрузка изображения из папки с изображениями игры"""
+    return pygame.image.load(os.path.join('data', 'images', filename))
+
+
+def benchmark_level_loading(directory: str, copies: int, repeat: int) -> None:
+    """Сравнение разбора текстового файла и чтения скомпилированного
+    уровня
+    """
+    filename = make_large_level(directory, copies)
+    fullname = os.path.join(directory, filename)
+    compiled_name = os.path.splitext(fullname)[0] + COMPILED_LEVEL_EXTENSION
+    level = parse_level(fullname)
+    print(f'Уровень {level.width}x{level.height} тайлов, '
+          f'{level.level_x}x{level.level_y} чанков, '
+          f'{os.path.getsize(fullname) / 2 ** 20:.1f} МБ текста')
+
+    def compile_level():
+        if os.path.exists(compiled_name):
+            os.remove(compiled_name)
+        load_level(filename, directory)
+
+    text_time = measure(lambda: parse_level(fullname), repeat)
+    compile_time = measure(compile_level, repeat)
+    cached_time = measure(lambda: load_level(filename, directory), repeat)
+
+    def open_window():
+        # Открываем уровень и раскодируем чанки вокруг игрока
+        cached = load_level(filename, directory)
+        window = LevelWindow(cached, CHUNK_UNLOAD_RADIUS)
+        center_x = cached.player_x // CHUNK_SIZE
+        for x in range(max(center_x - CHUNK_UNLOAD_RADIUS, 0),
+                       min(center_x + CHUNK_UNLOAD_RADIUS + 1,
+                           cached.level_x)):
+            window.chunk_map(x, cached.player_y // CHUNK_SIZE)
+
+    window_time = measure(open_window, repeat)
+    print(f'  разбор текста:         {text_time * 1000:9.2f} мс')
+    print(f'  разбор + компиляция:   {compile_time * 1000:9.2f} мс')
+    print(f'  скомпилированный кэш:  {cached_time * 1000:9.2f} мс '
+          f'(в {text_time / cached_time:.1f} раз быстрее текста)')
+    print(f'  кэш + окно у игрока:   {window_time * 1000:9.2f} мс')
+
+
+def benchmark_time_to_playable(directory: str, copies: int, repeat: int,
+                               workers: int) -> None:
+    """Время от начала загрузки уровня до первого кадра: чтение уровня,
+    сетка занятости, чанки вокруг игрока и их статичные слои
+    """
+    pygame.display.set_mode((1, 1))
+    tile_images = load_tile_images(load_image)
+    enemy_images = load_enemy_images(load_image)
+    filename = make_large_level(directory, copies)
+    # Компилируем уровень заранее, замеряется запуск с готовым кэшем
+    load_level(filename, directory)
+
+    def start_level(pool_size: int):
+        level = load_level(filename, directory)
+        world = World(level, tile_images, enemy_images, [], None,
+                      workers=pool_size)
+        world.prepare(level.player_x // CHUNK_SIZE,
+                      level.player_y // CHUNK_SIZE)
+
+    serial_time = measure(lambda: start_level(0), repeat)
+    pool_time = measure(lambda: start_level(workers), repeat)
+    print(f'Время до первого кадра ({os.cpu_count()} ядер):')
+    print(f'  в главном потоке:      {serial_time * 1000:9.2f} мс')
+    print(f'  пул из {workers} потоков:     {pool_time * 1000:9.2f} мс '
+          f'(в {serial_time / pool_time:.2f} раз быстрее)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='сколько раз повторять каждый замер')
+    parser.add_argument('--copies', type=int, default=1000,
+                        help='во сколько раз синтетический уровень длиннее '
+                             'первого')
+    parser.add_argument('--workers', type=int, default=CHUNK_PREPARE_WORKERS,
+                        help='сколько потоков готовят чанки')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as temp_directory:
+        benchmark_level_loading(temp_directory, args.copies, args.repeat)
+    with tempfile.TemporaryDirectory() as temp_directory:
+        benchmark_time_to_playable(temp_directory, args.copies, args.repeat,
+                                   args.workers)
@@ -1,99 +1,322 @@
 from random import random
-from typing import Literal
+from typing import Literal, Optional
 
-from pygame.sprite import Sprite, Group, spritecollideany, spritecollide
+import numpy as np
+from pygame.sprite import Sprite, Group
 from pygame.mixer import Sound
-from pygame import Surface
+from pygame import Surface, Rect
 
 from animated_sprites import Coin
 from camera import Camera
-from constants import DIRECTION_RIGHT, BULLET_SPEED
+from collision import WALL, BOX
+from constants import DIRECTION_RIGHT, BULLET_SPEED, TILE_WIDTH, \
+    TILE_HEIGHT, BULLET_LIFETIME, SHIELD_RECHARGE_TIME, BULLET_POOL_SIZE, \
+    FALL_STEP
 from entities import Player
+from metrics import metrics
+from particles import ParticleSystem, BOX_DEBRIS_COLOR, ENEMY_DEBRIS_COLOR
+from spatial_hash import world_rect
+from timing import ticks
 
+# Столбцы пула снарядов и их типы
+BULLET_COLUMNS = {
+    'x': np.int32, 'y': np.int32, 'width': np.int32, 'height': np.int32,
+    # Сдвиг за шаг (знак - направление полёта)
+    'velocity': np.int32, 'direction': np.int8, 'damage': np.int32,
+    # Сколько шагов снаряду осталось лететь
+    'lifetime': np.int32,
+    # Порядковый номер выстрела (снаряды обрабатываются в порядке
+    # выстрелов)
+    'serial': np.int64,
+    # Чей снаряд: врага или игрока
+    'is_enemy': bool,
+    # Занята ли ячейка летящим снарядом
+    'alive': bool
+}
 
-class Bullet(Sprite):
-    """ Снаряд """
 
-    def __init__(self, bullet_group: Group,
-                 bullet_image: Surface,
-                 user_direction: Literal[0, 1],
-                 pos_x, pos_y, is_enemy_bullet=False, damage=1) -> None:
+class BulletPool:
+    """Снаряды уровня в пуле постоянного размера: поля снарядов - массивы
+    NumPy, выстрел занимает свободную ячейку, а попадание её освобождает.
+    Перемещение, истечение времени полёта и поиск снарядов, которые могли
+    во что-то попасть, считаются сразу для всех снарядов. Точная проверка
+    попаданий делается только для этих снарядов
+
+    """
+
+    def __init__(self, bullet_image: Surface, enemy_bullet_image: Surface,
+                 capacity=BULLET_POOL_SIZE) -> None:
+        """
+        :param bullet_image: изображение снаряда игрока
+        :param enemy_bullet_image: изображение снаряда врага
+        :key capacity: сколько снарядов может лететь одновременно (если
+        пул заполнен, новый выстрел занимает место самого старого снаряда)
         """
-        :param bullet_group: Группа спрайтов, куда будет добавлен снаряд
-        :param bullet_image: Изображение снаряда
-        :param user_direction: Направление игрока (оно же будет и для снаряда)
+        # Изображения по флагу is_enemy
+        self.images = (bullet_image, enemy_bullet_image)
+        self.capacity = capacity
+        for name, dtype in BULLET_COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self._serial = 0
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.alive))
+
+    def clear(self) -> None:
+        """Удаление всех снарядов (например, при запуске уровня)"""
+        self.alive[:] = False
+
+    def fire(self, direction: Literal[0, 1], pos_x, pos_y,
+             is_enemy=False, damage=1) -> int:
+        """ Выстрел
+
+        :param direction: направление полёта
         :param pos_x: позиция по оси x
         :param pos_y: позиция по оси y
-        :key is_enemy_bullet: флаг для определения пули врага и игрока
+        :key is_enemy: снаряд врага или игрока
+        :key damage: урон снаряда
+        :return: номер ячейки снаряда
         """
-        super().__init__(bullet_group)
-        self.damage = damage
-        # Счетчик дальности полета
-        self.destroy_timer = 45
-        # Изображение снаряда
-        self.image = bullet_image
-        self.x = pos_x
-        self.y = pos_y
-        # Размещаем снаряд на экране
-        self.rect = self.image.get_rect()
-        self.direction = user_direction
-        # Изменение координаты пули
-        self.d_x = (1 if self.direction == DIRECTION_RIGHT else -1) * \
-                   BULLET_SPEED
-        # Флаг для различия пули игрока и пули врага
-        self.is_enemy_bullet = is_enemy_bullet
+        free = np.flatnonzero(~self.alive)
+        if len(free):
+            slot = int(free[0])
+        else:
+            slot = int(np.argmin(self.serial))
+        width, height = self.images[is_enemy].get_size()
+        self.x[slot], self.y[slot] = pos_x, pos_y
+        self.width[slot], self.height[slot] = width, height
+        self.velocity[slot] = \
+            BULLET_SPEED if direction == DIRECTION_RIGHT else -BULLET_SPEED
+        self.direction[slot] = direction
+        self.damage[slot] = damage
+        self.lifetime[slot] = ticks(BULLET_LIFETIME)
+        self.serial[slot] = self._serial
+        self._serial += 1
+        self.is_enemy[slot] = is_enemy
+        self.alive[slot] = True
+        return slot
 
     def update(
-            self, player: Player, destructible_groups: Group,
-            indestructible_groups: Group,
-            destroy_sounds: list, hit_sounds: list,
+            self, player: Player, destroy_sounds: list, hit_sounds: list,
             player_group: Group, camera: Camera,
-            screen: Surface, coin_images: list,
-            coin_selection_sound: Sound, chunks: list
+            coin_images: list, coin_selection_sound: Sound, chunks,
+            particles: ParticleSystem
     ) -> bool:
-        """ Перемещение снаряда
+        """ Шаг симуляции всех снарядов
         :param player: экземпляр класса игрока
-        :param destructible_groups: группа разрушаемых спрайтов
-        :param indestructible_groups: группа неразрушимых спрайтов
         :param destroy_sounds: список разрушения блоков или смерти врагов
         :param hit_sounds: список звуков попаданий по блокам или врагам
         :param player_group: группа спрайта игрока
         :param camera: экземпляр класса камеры
-        :param screen: окно приложения
         :param coin_images: изображения монетки
         :param coin_selection_sound: звук подбора монеты
-        :param chunks: список чанков
+        :param chunks: мир с чанками уровня (сетка занятости, коробки и
+        враги по строкам тайлов)
+        :param particles: частицы эффектов попаданий и разрушений
+        :return: разрушен ли ключевой объект (условие победы на уровне)
         """
-        self.destroy_timer -= 1
-        if not self.destroy_timer:
+        active = self._active()
+        if not len(active):
+            return False
+        self.lifetime[active] -= 1
+        # Снаряд, время полёта которого вышло, исчезает, но в этом шаге
+        # ещё может попасть
+        expired = active[self.lifetime[active] == 0]
+        for _ in range(len(expired)):
             hit_sounds[0].play()
-            self.kill()
-        # Определяем, в каком направлении передвигать снаряд
-        self.x += self.d_x
-        self.rect.x = self.x - camera.x + camera.dx
-        self.rect.y = self.y - camera.y + camera.dy
-
-        # Список, со всеми спрайтами, в которые ударился снаряд
-        destructible_sprites_hit_list = spritecollide(
-            self, destructible_groups, False
-        )
+        self.x[active] += self.velocity[active]
+
+        left, top, right, bottom = self._paths(active)
+        near_wall = self._cells_hit(chunks.grid, left, top, right, bottom,
+                                    WALL)
+        # Флаг коробки стоит в клетке её центра, поэтому строки клеток
+        # берутся с запасом
+        near_target = self._cells_hit(chunks.grid, left, top, right,
+                                      bottom, BOX, rows_margin=1) | \
+            self._near_enemies(chunks.enemy_store, left, top, right, bottom)
+        # Попадание в игрока проверяется в координатах экрана, как у
+        # прямоугольника игрока
+        offset_x = int(-camera.x + camera.dx)
+        offset_y = int(-camera.y + camera.dy)
+        hit_player = np.zeros(len(active), dtype=bool)
+        for sprite in player_group:
+            target = sprite.rect.move(-offset_x, -offset_y)
+            hit_player |= (left < target.right) & (right > target.left) & \
+                (top < target.bottom) & (bottom > target.top)
+
+        victory = False
+        check = near_wall | near_target | hit_player
+        metrics.count('bullet_checks', int(np.count_nonzero(check)))
+        for index in np.flatnonzero(check).tolist():
+            path = Rect(int(left[index]), int(top[index]),
+                        int(right[index] - left[index]),
+                        int(bottom[index] - top[index]))
+            victory |= self._resolve(
+                int(active[index]), path, bool(near_wall[index]),
+                bool(near_target[index]), bool(hit_player[index]), player,
+                destroy_sounds, hit_sounds, player_group, coin_images,
+                coin_selection_sound, chunks, particles
+            )
+        self.alive[expired] = False
+        return victory
+
+    def draw(self, screen: Surface, camera) -> None:
+        """ Отрисовка всех снарядов одним вызовом blits. Снаряд за шаг
+        сдвигается ровно на свою скорость, поэтому он рисуется между
+        положениями до и после шага без хранения прошлого положения
+
+        :param screen: окно приложения
+        :param camera: положение камеры для отрисовки
+        """
+        active = self._active()
+        x = self.x[active] - np.rint(
+            self.velocity[active] * (1 - camera.alpha)
+        ).astype(np.int32)
+        xs = (x - camera.x + camera.dx).tolist()
+        ys = (self.y[active] - camera.y + camera.dy).tolist()
+        images = [self.images[is_enemy]
+                  for is_enemy in self.is_enemy[active].tolist()]
+        screen.blits(list(zip(images, zip(xs, ys))), doreturn=False)
+
+    def _active(self) -> np.ndarray:
+        """Ячейки летящих снарядов в порядке выстрелов"""
+        active = np.flatnonzero(self.alive)
+        return active[np.argsort(self.serial[active], kind='stable')]
+
+    def _paths(self, active: np.ndarray) -> tuple:
+        """ Пути снарядов за последний шаг в координатах уровня. Прошлое
+        положение уже проверено на прошлом шаге, поэтому путь начинается
+        от его переднего края (при скорости меньше длины снаряда путь
+        совпадает с текущим положением)
+
+        :param active: ячейки снарядов
+        :return: массивы левых, верхних, правых и нижних краёв путей
+        """
+        x, velocity = self.x[active], self.velocity[active]
+        x_right = x + self.width[active]
+        forward = velocity > 0
+        left = np.where(forward, np.minimum(x, x_right - velocity), x)
+        right = np.where(forward, x_right, np.maximum(x_right, x - velocity))
+        top = self.y[active]
+        return left, top, right, top + self.height[active]
+
+    @staticmethod
+    def _cells_hit(grid, left: np.ndarray, top: np.ndarray,
+                   right: np.ndarray, bottom: np.ndarray, mask: int,
+                   rows_margin=0) -> np.ndarray:
+        """ Задевает ли путь каждого снаряда клетки с флагами mask
+
+        :param grid: сетка занятости уровня
+        :param left: левые края путей
+        :param top: верхние края путей
+        :param right: правые края путей
+        :param bottom: нижние края путей
+        :param mask: какие флаги искать
+        :key rows_margin: сколько строк клеток добавить сверху и снизу
+        :return: массив флагов
+        """
+        first_x, last_x = left // TILE_WIDTH, (right - 1) // TILE_WIDTH
+        first_y = top // TILE_HEIGHT - rows_margin
+        last_y = (bottom - 1) // TILE_HEIGHT + rows_margin
+        hit = np.zeros(len(left), dtype=bool)
+        for column in range(int((last_x - first_x).max()) + 1):
+            for row in range(int((last_y - first_y).max()) + 1):
+                cells_x, cells_y = first_x + column, first_y + row
+                hit |= (cells_x <= last_x) & (cells_y <= last_y) & \
+                    grid.solid_cells(cells_x, cells_y, mask)
+        return hit
+
+    @staticmethod
+    def _near_enemies(store, left: np.ndarray, top: np.ndarray,
+                      right: np.ndarray, bottom: np.ndarray) -> np.ndarray:
+        """ Может ли путь каждого снаряда задеть врага. Строки врагов в
+        индексе снарядов обновляются до их падения, поэтому прямоугольники
+        врагов берутся с запасом на шаг падения
+
+        :param store: хранилище врагов
+        :param left: левые края путей
+        :param top: верхние края путей
+        :param right: правые края путей
+        :param bottom: нижние края путей
+        :return: массив флагов
+        """
+        slots = np.flatnonzero(store.alive)
+        if not len(slots):
+            return np.zeros(len(left), dtype=bool)
+        enemy_left = store.x[slots] - FALL_STEP
+        enemy_top = store.y[slots] - FALL_STEP
+        enemy_right = store.x[slots] + store.width[slots] + FALL_STEP
+        enemy_bottom = store.y[slots] + store.height[slots] + FALL_STEP
+        return ((left[:, None] < enemy_right) &
+                (right[:, None] > enemy_left) &
+                (top[:, None] < enemy_bottom) &
+                (bottom[:, None] > enemy_top)).any(axis=1)
+
+    def _resolve(
+            self, slot: int, path: Rect, near_wall: bool, near_target: bool,
+            hit_player: bool, player: Player, destroy_sounds: list,
+            hit_sounds: list, player_group: Group, coin_images: list,
+            coin_selection_sound: Sound, chunks, particles: ParticleSystem
+    ) -> bool:
+        """ Точная проверка попаданий одного снаряда
+
+        :param slot: ячейка снаряда
+        :param path: путь снаряда за шаг
+        :param near_wall: задевает ли путь стены
+        :param near_target: может ли путь задеть коробку или врага
+        :param hit_player: попал ли снаряд в игрока
+        :return: разрушен ли ключевой объект
+        """
+        is_enemy = bool(self.is_enemy[slot])
+        direction = int(self.direction[slot])
+        # Ближайшая стена на пути
+        wall_x = self._first_wall(slot, chunks.grid, path) \
+            if near_wall else None
+
+        # Список, со всеми спрайтами, в которые ударился снаряд (коробки и
+        # враги на пути снаряда до стены, ближайшие - первыми)
+        if near_target:
+            destructible_sprites_hit_list = sorted(
+                chunks.boxes.collide(path) + chunks.enemies.collide(path),
+                key=lambda sprite: self._entry(slot, sprite)
+            )
+        else:
+            destructible_sprites_hit_list = []
+        if wall_x is not None:
+            destructible_sprites_hit_list = [
+                sprite for sprite in destructible_sprites_hit_list
+                if self._entry(slot, sprite) <= self._distance(slot, wall_x)
+            ]
         # Если есть хоть один, такой спрайт, то удаляем его вместе со
         # снарядом.
         if destructible_sprites_hit_list:
-            if not self.is_enemy_bullet:
+            # Искры летят из точки, где снаряд вошёл в спрайт
+            particles.sparks(
+                self._impact_x(slot, destructible_sprites_hit_list[0]),
+                path.centery, direction
+            )
+            if not is_enemy:
                 if destructible_sprites_hit_list[0].type == 2:
                     if destructible_sprites_hit_list[0].direction != \
-                            self.direction:
+                            direction:
                         hit_sounds[1].play()
-                        self.kill()
+                        self.alive[slot] = False
                         return False
                 destructible_sprites_hit_list[0].hp -= player.damage
                 if destructible_sprites_hit_list[0].hp <= 0:
                     sprite_type = destructible_sprites_hit_list[0].type
                     if sprite_type in (0, 1, 2, 3):
                         destroy_sounds[0].play()
+                        particles.debris(
+                            world_rect(destructible_sprites_hit_list[0]),
+                            ENEMY_DEBRIS_COLOR
+                        )
                     elif sprite_type in (4,):
                         destroy_sounds[1].play()
+                        particles.debris(
+                            world_rect(destructible_sprites_hit_list[0]),
+                            BOX_DEBRIS_COLOR
+                        )
                     chance = random()
                     coin_type = None
                     if chance <= 0.15:
@@ -103,48 +326,91 @@ class Bullet(Sprite):
                     elif 0.4 < chance <= 0.7:
                         coin_type = 0
                     if coin_type is not None:
-                        Coin(coin_selection_sound, coin_images[:3], coin_type,
-                             8, 1, destructible_sprites_hit_list[0].x + 5,
-                             destructible_sprites_hit_list[0].y + 5,
-                             chunks[destructible_sprites_hit_list[
-                                 0].chunk_number].coins_group,
-                             chunks[destructible_sprites_hit_list[
-                                 0].chunk_number].all_sprites)
+                        coin = Coin(
+                            coin_selection_sound, coin_images[:3],
+                            coin_type, 8, 1,
+                            destructible_sprites_hit_list[0].x + 5,
+                            destructible_sprites_hit_list[0].y + 5,
+                            chunks[destructible_sprites_hit_list[
+                                0].chunk_number].coins_group,
+                            chunks[destructible_sprites_hit_list[
+                                0].chunk_number].all_sprites
+                        )
+                        chunks.coins.add(coin)
                     if destructible_sprites_hit_list[0].is_key_object:
                         return True
+                    if sprite_type == 4:
+                        chunks.grid.remove_box(
+                            destructible_sprites_hit_list[0]
+                        )
+                        chunks.wake_above(destructible_sprites_hit_list[0])
                     destructible_sprites_hit_list[0].kill()
             if destructible_sprites_hit_list[0].type in (4,) or \
-                    not self.is_enemy_bullet:
+                    not is_enemy:
                 hit_sounds[0].play()
-                self.kill()
+                self.alive[slot] = False
 
-        # Если снаряд столкнулся с каким-то из спрайтов и этот спрайт не
-        # игрок, то удаляем снаряд
-        if spritecollideany(self, indestructible_groups) and \
-                not spritecollideany(self, player_group):
+        # Если снаряд столкнулся со стеной и при этом не с игроком, то
+        # удаляем снаряд
+        hit_wall = wall_x is not None
+        if hit_wall and not hit_player:
             hit_sounds[0].play()
-            self.kill()
-        # Если снаряд столкнулся с каким-то из спрайтов и этот спрайт не
-        # игрок, то удаляем снаряд
-        if spritecollideany(self, indestructible_groups) and \
-                not spritecollideany(self, player_group):
             hit_sounds[1].play()
-            self.kill()
+            particles.sparks(wall_x, path.centery, direction)
+            self.alive[slot] = False
 
         # Если пуля вражеская, то проверяем пересечение со спрайтом игрока и
         # отнимаем либо щит, либо хп
-        if self.is_enemy_bullet:
-            if spritecollideany(self, player_group):
+        if is_enemy:
+            if hit_player:
                 for player in player_group:
                     if player.shield > 0:
-                        player.shield -= self.damage
+                        player.shield -= int(self.damage[slot])
                         if player.shield < 0:
                             player.shield = 0
                     else:
-                        player.hp -= self.damage
+                        player.hp -= int(self.damage[slot])
                     if not player.shield_recharge:
-                        player.shield_recharge = 150
-                self.kill()
-
-        screen.blit(self.image, (self.rect.x, self.rect.y))
+                        player.shield_recharge = ticks(
+                            SHIELD_RECHARGE_TIME)
+                self.alive[slot] = False
         return False
+
+    def _distance(self, slot: int, x: int) -> int:
+        """Расстояние до точки по направлению полёта (для сравнения)"""
+        return x if self.velocity[slot] > 0 else -x
+
+    def _entry(self, slot: int, sprite: Sprite) -> int:
+        """Где снаряд входит в спрайт (по направлению полёта)"""
+        if self.velocity[slot] > 0:
+            return self._distance(slot, sprite.x)
+        return self._distance(slot, sprite.x + sprite.rect.w - 1)
+
+    def _impact_x(self, slot: int, sprite: Sprite) -> int:
+        """Координата x, где снаряд входит в спрайт"""
+        if self.velocity[slot] > 0:
+            return sprite.x
+        return sprite.x + sprite.rect.w - 1
+
+    def _first_wall(self, slot: int, grid, path: Rect) -> Optional[int]:
+        """ Ближайшая стена на пути снаряда
+
+        :param slot: ячейка снаряда
+        :param grid: сетка занятости уровня
+        :param path: путь снаряда за шаг
+        :return: координата x, где снаряд входит в стену, или None
+        """
+        if self.velocity[slot] > 0:
+            start, distance = path.left, path.w - 1
+        else:
+            start, distance = path.right - 1, 1 - path.w
+        hits = [
+            grid.raycast_x(start, max(row * TILE_HEIGHT, path.top),
+                           distance, WALL)
+            for row in range(path.top // TILE_HEIGHT,
+                             (path.bottom - 1) // TILE_HEIGHT + 1)
+        ]
+        hits = [x for x in hits if x is not None]
+        if not hits:
+            return None
+        return min(hits, key=lambda x: self._distance(slot, x))
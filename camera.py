@@ -18,9 +18,55 @@ class Camera:
                     self.target.rect.w // 2 - WIDTH // 2)
         self.dy = -(self.target.rect.y +
                     self.target.rect.h // 2 - HEIGHT // 1.4)
+        # Координаты до последнего шага симуляции (между ними и текущими
+        # камера плавно движется при отрисовке)
+        self.previous_x = self.x
+        self.previous_y = self.y
+
+    def start_step(self) -> None:
+        """Запоминание координат перед шагом симуляции"""
+        self.previous_x = self.x
+        self.previous_y = self.y
+
+    def view(self, alpha: float) -> 'CameraView':
+        """ Положение камеры для отрисовки: между координатами до и после
+        последнего шага симуляции
+
+        :param alpha: какая доля следующего шага уже прошла (от 0 до 1)
+        """
+        return CameraView(
+            round(self.previous_x + (self.x - self.previous_x) * alpha),
+            round(self.previous_y + (self.y - self.previous_y) * alpha),
+            self.dx, self.dy, alpha
+        )
 
     def update(self, dx=0, dy=0):
         self.x += dx
         self.y += dy
         self.target.x += dx
-        self.target.y += dy
\ No newline at end of file
+        self.target.y += dy
+
+    def world_center(self) -> tuple[int, int]:
+        """Координаты центра экрана в координатах уровня"""
+        return (int(self.x - self.dx) + WIDTH // 2,
+                int(self.y - self.dy) + HEIGHT // 2)
+
+
+class CameraView:
+    """Положение камеры, по которому отрисовывается кадр"""
+
+    def __init__(self, x: int, y: int, dx: float, dy: float,
+                 alpha=1.0) -> None:
+        """
+        :param x: координата по оси x
+        :param y: координата по оси y
+        :param dx: смещение по оси x
+        :param dy: смещение по оси y
+        :key alpha: какая доля следующего шага уже прошла (движущиеся
+        объекты рисуются на той же доле пути, что и камера)
+        """
+        self.x = x
+        self.y = y
+        self.dx = dx
+        self.dy = dy
+        self.alpha = alpha
@@ -1,240 +1,248 @@
 from random import random
 
+import numpy as np
 import pygame
 
-from bullets import Bullet
+from animated_sprites import Coin
 
-from constants import BULLET_WIDTH
+from constants import CHUNK_SIZE, TILE_WIDTH, TILE_HEIGHT
+from enemy_store import EnemyStore
+from level_loader import ChunkLayout
+from metrics import metrics
+from spatial_hash import world_rect
+from tile_types import TILE_TYPES
 from tiles import *
 from entities import *
 
+# Поля врага, которые сохраняются при выгрузке чанка
+ENEMY_STATE_FIELDS = (
+    'x', 'y', 'hp', 'direction', 'distance', 'speed', 'attack_player',
+    'is_shoot', 'timer', 'ammo', 'attack_timer', 'current_image_idx'
+)
+
 
 class Chunk:
     """Чанк"""
 
     def __init__(
-            self, tile_images: dict, enemy_images: list, x: int, y: int,
-            chunk_map: list, level_x: int
+            self, tile_images: list, enemy_images: list, x: int, y: int,
+            chunk_map: np.ndarray, level_x: int, layout: ChunkLayout,
+            enemy_store: EnemyStore
     ):
         """
-        :param tile_images: изображение всех тайлов
+        :param tile_images: изображения всех тайлов (индекс - код тайла)
         :param enemy_images: изображения всех врагов
         :param x: координата по оси x
         :param y: координата по оси y
-        :param chunk_map: карта разбитая на сетку чанков
+        :param chunk_map: коды тайлов чанка (сетка CHUNK_SIZE x CHUNK_SIZE из
+        окна уровня)
         :param level_x: длина уровня по оси x
+        :param layout: статичная раскладка чанка (общая для всех одинаковых
+        чанков уровня)
+        :param enemy_store: хранилище врагов уровня
         """
         self.x, self.y = x, y
+        # Номер чанка
+        self.number = self.x + self.y * level_x
+        # Статичная раскладка (по ней отрисовывается статичный слой, сам
+        # чанк хранит только свои динамические объекты)
+        self.layout = layout
         # Все спрайты
         self.all_sprites = pygame.sprite.Group()
         # Спрайты коробок
         self.boxes_group = pygame.sprite.Group()
-        # Спрайты кирпичных блоков
-        self.bricks_group = pygame.sprite.Group()
-        # Группа фантомных блоков (задний фон и украшения)
-        self.phantom_group = pygame.sprite.Group()
         # Спрайты монеток
         self.coins_group = pygame.sprite.Group()
         # Спрайты врагов
         self.enemies_group = pygame.sprite.Group()
 
-        for y, row in enumerate(chunk_map):
-            for x, elem in enumerate(row[0]):
-                # Тут те тайлы, которые не рушатся, создаётся соответствующий
-                # спрайт и добавляется в группу
-                if elem in ('w', 's', 'l', 'd', 'L', '^', 'D'):
-                    Wall(
-                        self.bricks_group, self.all_sprites,
-                        tile_images[elem], x + self.x * 8, y + self.y * 8,
-                                           self.x + self.y * level_x,
-                    )
-                elif elem in ('#', '_', '-', '*', '/', '0', '1', '2', '3',
-                              '4', '5', '6', '6', '7', '8', '9', 'r',
-                              'а', 'б', 'в', 'г', 'д', 'е', 'ё', 'ж', 'з',
-                              'и', 'й', 'к', 'л', 'м', 'н', 'о', 'п', 'р',
-                              'с', 'т', 'у', 'ф', 'х', 'ц', 'ч', 'ш', 'щ'):
-                    PhantomTile(
-                        self.phantom_group, self.all_sprites,
-                        tile_images[elem], x + self.x * 8, y + self.y * 8,
-                                           self.x + self.y * level_x
-                    )
-                elif elem in ('b', 'B', '!'):
-                    Box(
-                        self.boxes_group, self.all_sprites,
-                        tile_images[elem], x + self.x * 8, y + self.y * 8,
-                                           self.x + self.y * level_x,
-                        max_hp=10 if elem == '!' else 5,
-                        is_key_object=elem == '!'
-                    )
-                elif elem == 'o':
-                    Enemy(
-                        [self.enemies_group, self.all_sprites],
-                        enemy_images[0], x + self.x * 8, y + self.y * 8,
-                                         self.x + self.y * level_x,
-                        is_static=True
-                    )
-                elif elem == 'O':
-                    Enemy([self.enemies_group, self.all_sprites],
-                          enemy_images[0], x + self.x * 8, y + self.y * 8,
-                          self.x + self.y * level_x)
-                elif elem == 'h':
-                    HeavyEnemy(
-                        [self.enemies_group, self.all_sprites],
-                        enemy_images[1], x + self.x * 8, y + self.y * 8,
-                                         self.x + self.y * level_x,
-                        is_static=True
-                    )
-                elif elem == 'H':
-                    HeavyEnemy([self.enemies_group, self.all_sprites],
-                               enemy_images[1], x + self.x * 8,
-                               y + self.y * 8, self.x + self.y * level_x)
-                elif elem == 'a':
-                    ArmoredEnemy(
-                        [self.enemies_group, self.all_sprites],
-                        enemy_images[2], x + self.x * 8, y + self.y * 8,
-                                         self.x + self.y * level_x,
-                        is_static=True
-                    )
-                elif elem == 'A':
-                    ArmoredEnemy([self.enemies_group, self.all_sprites],
-                                 enemy_images[2], x + self.x * 8,
-                                 y + self.y * 8, self.x + self.y * level_x)
-                elif elem == 'm':
-                    MarksmanEnemy(
-                        [self.enemies_group, self.all_sprites],
-                        enemy_images[3], x + self.x * 8, y + self.y * 8,
-                                         self.x + self.y * level_x,
-                        is_static=True
+        for y, row in enumerate(chunk_map.tolist()):
+            for x, code in enumerate(row):
+                tile_type = TILE_TYPES[code]
+                # Спрайты нужны только коробкам и врагам. Фантомные тайлы и
+                # стены рисуются из заранее отрисованного слоя, а
+                # столкновения со стенами проверяются по сетке занятости
+                if tile_type.tile_class is None:
+                    continue
+                group = getattr(self, tile_type.group)
+                pos_x, pos_y = x + self.x * CHUNK_SIZE, y + self.y * CHUNK_SIZE
+                if tile_type.enemy_type is None:
+                    tile_type.tile_class(
+                        group, self.all_sprites, tile_images[code],
+                        pos_x, pos_y, self.number, **tile_type.options
                     )
-                elif elem == 'M':
-                    MarksmanEnemy(
-                        [self.enemies_group, self.all_sprites],
-                        enemy_images[3], x + self.x * 8, y + self.y * 8,
-                                         self.x + self.y * level_x
-                    )
-
-    def render(self, screen, camera, frame, player_group, shot_sounds,
-               bullet_group, all_blocks_group, bullet_image):
-        # Тут пришлось сделать так, а не методом draw для группы спрайтов,
-        # чтобы сохранить начальные координаты спрайтов, иначе из-за
-        # особенностей камеры всё съезжает и получаются пропасти между чанками
-        for enemy in self.enemies_group:
-            enemy.update(camera, frame)
-            if enemy.ray.check_collide_with_player(player_group):
-                enemy.attack_player = True
-                enemy.current_image_idx = 0
-                enemy.speed = 0
-                enemy.attack_timer = 120
-            else:
-                if enemy.attack_timer:
-                    enemy.attack_timer -= 1
-                    if enemy.attack_timer == 0:
-                        enemy.attack_player = False
-                        enemy.speed = 1
-                elif enemy.attack_timer == 0:
-                    enemy.attack_player = False
-                    enemy.speed = 1
-
-            # Создание пуль в случае, если враг в режиме атаки
-            if enemy.attack_player:
-                if enemy.is_shoot:
-                    if enemy.direction == DIRECTION_LEFT:
-                        x = enemy.x - BULLET_WIDTH
-                    else:
-                        x = enemy.x + enemy.rect.w
-                    if enemy.ammo:
-                        if enemy.type == 0:
-                            shot_sounds[0].play()
-                        elif enemy.type == 1:
-                            shot_sounds[1].play()
-                        elif enemy.type == 2:
-                            shot_sounds[2].play()
-                        elif enemy.type == 3:
-                            shot_sounds[3].play()
-                        Bullet(bullet_group, bullet_image,
-                               enemy.direction, x,
-                               enemy.y + enemy.rect.h // 2,
-                               is_enemy_bullet=True, damage=enemy.damage)
-                        enemy.timer = enemy.shot_delay
-                        enemy.ammo -= 1
-                    else:
-                        enemy.timer = enemy.recharge_timer
-                        enemy.ammo = enemy.clip_size
-                    enemy.is_shoot = False
                 else:
-                    enemy.timer -= 1
-                    if enemy.timer == 0:
-                        enemy.is_shoot = True
-
-        # Смещение фигуры спрайтов
-        for sprite in self.all_sprites:
-            sprite.rect.x = sprite.x - camera.x + camera.dx
-            sprite.rect.y = sprite.y - camera.y + camera.dy
+                    tile_type.tile_class(
+                        [group, self.all_sprites],
+                        enemy_images[tile_type.enemy_type],
+                        pos_x, pos_y, self.number, enemy_store,
+                        **tile_type.options
+                    )
 
-        # Отрисовка блоков
-        self.phantom_group.draw(screen)
-        self.bricks_group.draw(screen)
+    def save_state(self) -> dict:
+        """Снимок динамического состояния чанка (коробки, враги, монеты),
+        по которому чанк можно восстановить после выгрузки
 
-        target_group = pygame.sprite.Group()
-        target_group.add(self.boxes_group)
-        target_group.add(self.bricks_group)
-        # Смещение коробок в воздухе на блоки
+        """
+        return {
+            # Уцелевшие коробки: клетка появления -> (хп, координата по y)
+            'boxes': {
+                (box.grid_x, box.grid_y): (box.hp, box.y)
+                for box in self.boxes_group
+            },
+            # Живые враги: клетка появления -> значения полей
+            'enemies': {
+                (enemy.grid_x, enemy.grid_y): tuple(
+                    getattr(enemy, field) for field in ENEMY_STATE_FIELDS
+                ) for enemy in self.enemies_group
+            },
+            # Выпавшие монеты: (тип, x, y, кадр анимации)
+            'coins': [
+                (coin.type_of_coin, coin.x, coin.y, coin.cur_frame)
+                for coin in self.coins_group
+            ]
+        }
+
+    def restore_state(self, state: dict, coin_images: list,
+                      coin_selection_sound) -> None:
+        """Восстановление чанка по снимку из save_state
+
+        :param state: снимок динамического состояния
+        :param coin_images: изображения монеток
+        :param coin_selection_sound: звук подбора монеты
+        """
         for box in self.boxes_group:
-            box.pin_to_ground(target_group)
-            if box.is_key_object:
-                box.draw_health_scale(
-                    screen, box.rect.x - 25, box.rect.y - 20
-                )
-        # Отрисовка коробок
-        self.boxes_group.draw(screen)
-
-        # Перемещение врагов
+            saved = state['boxes'].get((box.grid_x, box.grid_y))
+            # Коробку разрушили до выгрузки чанка
+            if saved is None:
+                box.kill()
+            else:
+                box.hp, box.y = saved
         for enemy in self.enemies_group:
-            enemy.check_collision_sides(all_blocks_group)
-            if not enemy.collide_list[7]:
-                if enemy.collide_list[2]:
-                    dx = 1
-                elif enemy.collide_list[3]:
-                    dx = -1
-                else:
-                    dx = 0
-                enemy.x += dx
-                enemy.y += 5
-                enemy.ray.x += dx
-                enemy.ray.y += 5
-                enemy.ray.rect.x = enemy.ray.x - camera.x + camera.dx
-                enemy.ray.rect.y = enemy.ray.y - camera.y + camera.dy
-            enemy.draw_health_scale(
-                screen, enemy.rect.x + (
-                    10 if enemy.direction == DIRECTION_LEFT else -10
-                ), enemy.rect.y - 10
-            )
-
-        # Удаление при подборе или смещение и анимация монет
+            saved = state['enemies'].get((enemy.grid_x, enemy.grid_y))
+            # Враг погиб до выгрузки чанка
+            if saved is None:
+                enemy.kill()
+            else:
+                for field, value in zip(ENEMY_STATE_FIELDS, saved):
+                    setattr(enemy, field, value)
+        for type_of_coin, x, y, cur_frame in state['coins']:
+            coin = Coin(coin_selection_sound, coin_images[:3], type_of_coin,
+                        8, 1, x, y, self.coins_group, self.all_sprites)
+            coin.cur_frame = cur_frame
+            coin.image = coin.frames[cur_frame]
+
+    def update(self, player_group, world) -> None:
+        """ Шаг симуляции чанка: падение коробок, подбор и анимация монет
+        (враги всех чанков обрабатываются вместе, см. World.update_enemies)
+
+        :param player_group: группа спрайта игрока
+        :param world: мир с чанками уровня
+        """
+        # Монеты могли сдвинуться - обновляем их ячейки в хэше
         for coin in self.coins_group:
-            player = pygame.sprite.spritecollide(coin, player_group, False)
-            if pygame.sprite.spritecollideany(coin, player_group):
+            world.coins.move(coin)
+
+        # Смещение коробок в воздухе на блоки (лежащие коробки не
+        # проверяются, их будит разрушение опоры)
+        for box in self.boxes_group:
+            if not box.resting:
+                old_y = box.y
+                box.pin_to_ground(world.grid)
+                world.grid.move_box(box, old_y)
+                world.boxes.move(box)
+
+        # Подбор монет этого чанка, которых касается игрок
+        for player in player_group:
+            for coin in world.coins.collide(world_rect(player)):
+                if not self.coins_group.has(coin):
+                    continue
                 con = connect('DataBase.sqlite')
                 cur = con.cursor()
-                player[0].coins += coin.cost
+                player.coins += coin.cost
                 # Перезаписываем поле с монетками в БД
                 cur.execute(f"UPDATE Player_data SET Coins = "
-                            f"{player[0].coins}")
+                            f"{player.coins}")
                 con.commit()
                 con.close()
                 coin.selection_sound.play()
                 coin.kill()
 
-            if pygame.sprite.spritecollideany(coin, self.boxes_group):
+        # Смещение монет, упавших на коробки, и анимация монет
+        for coin in self.coins_group:
+            if world.boxes.collide(world_rect(coin)):
                 coin.y -= 7
-                coin.rect.y -= 5
             if coin.counter == 2:
                 coin.update()
                 coin.counter = 0
             else:
                 coin.counter += 1
 
+    def draw(self, screen, camera, world) -> None:
+        """ Отрисовка чанка: статичный слой и спрайты на экране
+
+        :param screen: поверхность для отрисовки
+        :param camera: положение камеры для отрисовки
+        :param world: мир с чанками уровня
+        """
+        # Отрисовываются только спрайты на экране (стены чанка рисуются
+        # статичным слоем, спрайтов у них нет)
+        visible_boxes = [box for box in self.boxes_group
+                         if box in world.on_screen]
+        visible_enemies = [enemy for enemy in self.enemies_group
+                           if enemy in world.on_screen]
+        visible_coins = [coin for coin in self.coins_group
+                         if coin in world.on_screen]
+        visible = visible_boxes + visible_enemies + visible_coins
+        metrics.count('sprites_drawn', len(visible))
+        metrics.count('sprites_culled', len(self.boxes_group) +
+                      len(self.enemies_group) + len(self.coins_group) -
+                      len(visible))
+        # Смещение фигуры спрайтов. Тут пришлось сделать так, а не методом
+        # draw для группы спрайтов, чтобы сохранить начальные координаты
+        # спрайтов, иначе из-за особенностей камеры всё съезжает и
+        # получаются пропасти между чанками
+        for sprite in visible_boxes + visible_coins:
+            sprite.rect.x = sprite.x - camera.x + camera.dx
+            sprite.rect.y = sprite.y - camera.y + camera.dy
+        # Враги рисуются между положениями до и после последнего шага
+        # симуляции, как и камера, иначе они дёргаются на её фоне
+        for enemy in visible_enemies:
+            x, y = enemy.view_position(camera.alpha)
+            enemy.rect.x = x - camera.x + camera.dx
+            enemy.rect.y = y - camera.y + camera.dy
+            enemy.sync_image()
+
+        # Отрисовка блоков одним заранее отрисованным слоем
+        static_layer = world.static_layers.get(self.layout)
+        if static_layer is not None:
+            surface, (offset_x, offset_y), _ = static_layer
+            filled = screen.blit(surface, (
+                int(self.x * CHUNK_SIZE * TILE_WIDTH + offset_x -
+                    camera.x + camera.dx),
+                int(self.y * CHUNK_SIZE * TILE_HEIGHT + offset_y -
+                    camera.y + camera.dy)
+            ))
+            metrics.count('pixels_filled', filled.w * filled.h)
+
+        for box in visible_boxes:
+            if box.is_key_object:
+                box.draw_health_scale(
+                    screen, box.rect.x - 25, box.rect.y - 20
+                )
+        # Отрисовка коробок
+        screen.blits([(box.image, box.rect) for box in visible_boxes],
+                     doreturn=False)
+        for enemy in visible_enemies:
+            enemy.draw_health_scale(
+                screen, enemy.rect.x + (
+                    10 if enemy.direction == DIRECTION_LEFT else -10
+                ), enemy.rect.y - 10
+            )
+
         # Отрисовка монет
-        self.coins_group.draw(screen)
+        screen.blits([(coin.image, coin.rect) for coin in visible_coins],
+                     doreturn=False)
         # Отрисовка врагов
-        self.enemies_group.draw(screen)
+        screen.blits([(enemy.image, enemy.rect)
+                      for enemy in visible_enemies], doreturn=False)
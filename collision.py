@@ -0,0 +1,258 @@
+from typing import Optional
+
+import numpy as np
+from pygame import Rect
+
+from constants import TILE_WIDTH, TILE_HEIGHT
+from tile_types import WALL_CODES, SOLID_CODES
+
+# Флаги клеток сетки занятости
+WALL = 1
+BOX = 2
+SOLID = WALL | BOX
+# Коды разрушаемых твёрдых тайлов (коробки)
+BOX_CODES = np.setdiff1d(SOLID_CODES, WALL_CODES)
+# Флаги клетки сетки занятости по коду тайла
+_CELL_FLAGS = np.zeros(256, dtype=np.uint8)
+_CELL_FLAGS[WALL_CODES] = WALL
+_CELL_FLAGS[BOX_CODES] = BOX
+# Сколько столбцов тайлов обрабатывается за раз при построении сетки
+_BUILD_BLOCK = 8192
+
+
+def _merge_rows(solid: np.ndarray) -> list[tuple[int, int, int, int]]:
+    """ Жадное слияние: берём самую левую верхнюю свободную клетку,
+    растягиваем прямоугольник вправо, пока клетки твёрдые, а затем вниз,
+    пока вся строка под ним твёрдая
+
+    :param solid: маска твёрдых клеток
+    :return: список прямоугольников (x, y, ширина, высота) в клетках
+    """
+    free = solid.copy()
+    height, width = free.shape
+    rects = []
+    for y, x in zip(*np.nonzero(free)):
+        if not free[y, x]:
+            continue
+        right = x + 1
+        while right < width and free[y, right]:
+            right += 1
+        bottom = y + 1
+        while bottom < height and free[bottom, x:right].all():
+            bottom += 1
+        free[y:bottom, x:right] = False
+        rects.append((int(x), int(y), int(right - x), int(bottom - y)))
+    return rects
+
+
+def merge_tiles(solid: np.ndarray) -> list[tuple[int, int, int, int]]:
+    """ Слияние соседних твёрдых клеток в набор прямоугольников, которые
+    покрывают ровно эти клетки и не пересекаются между собой
+
+    Слияние пробуется по строкам и по столбцам (стены уровня бывают и
+    горизонтальными, и вертикальными), остаётся вариант с меньшим числом
+    прямоугольников
+
+    :param solid: маска твёрдых клеток (строки - по оси y)
+    :return: список прямоугольников (x, y, ширина, высота) в клетках
+    """
+    by_rows = _merge_rows(solid)
+    by_columns = [(y, x, height, width)
+                  for x, y, width, height in _merge_rows(solid.T)]
+    return by_rows if len(by_rows) <= len(by_columns) else by_columns
+
+
+def _box_row(y) -> int:
+    """Строка сетки, в которой находится коробка (по её центру)"""
+    return int(y + TILE_HEIGHT // 2) // TILE_HEIGHT
+
+
+class OccupancyGrid:
+    """Сетка занятости уровня: для каждой клетки хранится, есть ли в ней
+    стена или коробка. Все вопросы "твёрдо ли здесь" решаются обращением к
+    массиву, без перебора групп спрайтов
+
+    Координаты в методах point, overlaps и raycast_* - пиксели уровня (не
+    экрана), в методах is_solid и set_cell - клетки
+
+    """
+
+    def __init__(self, cells: np.ndarray) -> None:
+        """
+        :param cells: сетка флагов WALL и BOX (строки - по оси y)
+        """
+        self.cells = cells
+        self.height, self.width = cells.shape
+
+    @classmethod
+    def from_level(cls, level, executor=None) -> 'OccupancyGrid':
+        """ Сетка занятости по кодам тайлов уровня (сетка уровня может быть
+        отображена в память, поэтому она обходится кусками по столбцам)
+
+        :param level: загруженный уровень
+        :key executor: пул, в котором куски обрабатываются параллельно
+        """
+        cells = np.zeros((level.height, level.width), dtype=np.uint8)
+
+        def fill(start: int) -> None:
+            cells[:, start:start + _BUILD_BLOCK] = _CELL_FLAGS.take(
+                level.tiles[:, start:start + _BUILD_BLOCK]
+            )
+
+        run = map if executor is None else executor.map
+        # list нужен, чтобы дождаться обработки всех кусков
+        list(run(fill, range(0, level.width, _BUILD_BLOCK)))
+        return cls(cells)
+
+    def is_solid(self, x: int, y: int, mask=SOLID) -> bool:
+        """ Твёрдая ли клетка (за пределами уровня твёрдых клеток нет)
+
+        :param x: клетка по оси x
+        :param y: клетка по оси y
+        :key mask: какие флаги считаются твёрдыми
+        """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return bool(self.cells[y, x] & mask)
+        return False
+
+    def solid_cells(self, xs: np.ndarray, ys: np.ndarray,
+                    mask=SOLID) -> np.ndarray:
+        """ Твёрдые ли клетки - то же, что is_solid, но сразу для массива
+        клеток
+
+        :param xs: клетки по оси x
+        :param ys: клетки по оси y
+        :key mask: какие флаги считаются твёрдыми
+        :return: массив флагов "клетка твёрдая"
+        """
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & \
+            (ys < self.height)
+        solid = np.zeros(len(xs), dtype=bool)
+        solid[inside] = self.cells[ys[inside], xs[inside]] & mask != 0
+        return solid
+
+    def set_cell(self, x: int, y: int, flags: int) -> None:
+        """ Замена флагов клетки (например, когда разрушили коробку)
+
+        :param x: клетка по оси x
+        :param y: клетка по оси y
+        :param flags: новые флаги клетки
+        """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.cells[y, x] = flags
+
+    def remove_box(self, box) -> None:
+        """Коробку разрушили - её клетка больше не твёрдая"""
+        self._clear_box(box.grid_x, _box_row(box.y))
+
+    def move_box(self, box, old_y) -> None:
+        """ Коробка упала - переносим её флаг в новую клетку
+
+        :param box: коробка
+        :param old_y: координата коробки по оси y до падения
+        """
+        old_row, new_row = _box_row(old_y), _box_row(box.y)
+        if old_row != new_row:
+            self._clear_box(box.grid_x, old_row)
+            if 0 <= new_row < self.height:
+                self.cells[new_row, box.grid_x] |= BOX
+
+    def supports_box(self, box) -> bool:
+        """ Есть ли опора под коробкой. Флаг падающей коробки стоит в клетке
+        её центра, и эта клетка не должна считаться опорой для неё самой
+
+        :param box: коробка
+        """
+        x, y = box.x + box.rect.w // 2, box.y + box.rect.h
+        own_row = int(y) // TILE_HEIGHT == _box_row(box.y)
+        return self.point(x, y, WALL if own_row else SOLID)
+
+    def _clear_box(self, x: int, y: int) -> None:
+        """Снятие флага коробки с клетки"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.cells[y, x] &= SOLID & ~BOX
+
+    def point(self, x, y, mask=SOLID) -> bool:
+        """ Попадает ли точка в твёрдую клетку
+
+        :param x: координата точки по оси x
+        :param y: координата точки по оси y
+        :key mask: какие флаги считаются твёрдыми
+        """
+        return self.is_solid(int(x) // TILE_WIDTH, int(y) // TILE_HEIGHT,
+                             mask)
+
+    def overlaps(self, rect: Rect, mask=SOLID) -> bool:
+        """ Пересекает ли прямоугольник хоть одну твёрдую клетку
+
+        :param rect: прямоугольник в координатах уровня
+        :key mask: какие флаги считаются твёрдыми
+        """
+        if rect.w <= 0 or rect.h <= 0:
+            return False
+        left = max(rect.left // TILE_WIDTH, 0)
+        right = min((rect.right - 1) // TILE_WIDTH + 1, self.width)
+        top = max(rect.top // TILE_HEIGHT, 0)
+        bottom = min((rect.bottom - 1) // TILE_HEIGHT + 1, self.height)
+        if left >= right or top >= bottom:
+            return False
+        return bool((self.cells[top:bottom, left:right] & mask).any())
+
+    def raycast_x(self, x, y, distance, mask=SOLID) -> Optional[int]:
+        """ Луч по горизонтали до первой твёрдой клетки
+
+        :param x: начало луча по оси x
+        :param y: высота луча
+        :param distance: длина луча (отрицательная - луч влево)
+        :key mask: какие флаги считаются твёрдыми
+        :return: координата x, где луч упёрся в твёрдую клетку, или None,
+        если на всей длине луча твёрдых клеток нет
+        """
+        row = int(y) // TILE_HEIGHT
+        if not 0 <= row < self.height:
+            return None
+        return self._first_hit(self.cells[row], int(x), int(distance),
+                               TILE_WIDTH, mask)
+
+    def raycast_y(self, x, y, distance, mask=SOLID) -> Optional[int]:
+        """ Луч по вертикали до первой твёрдой клетки
+
+        :param x: положение луча по оси x
+        :param y: начало луча по оси y
+        :param distance: длина луча (отрицательная - луч вверх)
+        :key mask: какие флаги считаются твёрдыми
+        :return: координата y, где луч упёрся в твёрдую клетку, или None,
+        если на всей длине луча твёрдых клеток нет
+        """
+        column = int(x) // TILE_WIDTH
+        if not 0 <= column < self.width:
+            return None
+        return self._first_hit(self.cells[:, column], int(y), int(distance),
+                               TILE_HEIGHT, mask)
+
+    @staticmethod
+    def _first_hit(line: np.ndarray, start: int, distance: int,
+                   tile_size: int, mask: int) -> Optional[int]:
+        """ Первая твёрдая клетка на отрезке строки или столбца сетки
+
+        :param line: строка или столбец сетки
+        :param start: начало луча в пикселях
+        :param distance: длина луча в пикселях (со знаком направления)
+        :param tile_size: размер клетки вдоль луча
+        :param mask: какие флаги считаются твёрдыми
+        :return: пиксель, где луч входит в твёрдую клетку, или None
+        """
+        end = start + distance
+        first = start // tile_size
+        last = end // tile_size
+        if distance >= 0:
+            low, high = max(first, 0), max(min(last + 1, len(line)), 0)
+            hits = np.flatnonzero(line[low:high] & mask)
+            if not len(hits):
+                return None
+            return max((low + int(hits[0])) * tile_size, start)
+        low, high = max(last, 0), max(min(first + 1, len(line)), 0)
+        hits = np.flatnonzero(line[low:high] & mask)
+        if not len(hits):
+            return None
+        return min((low + int(hits[-1]) + 1) * tile_size - 1, start)
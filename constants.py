@@ -1,19 +1,69 @@
 # Размеры тайлов (всегда квадраты)
 TILE_WIDTH = TILE_HEIGHT = 50
-# FPS игры
-FPS = 60
+# Размер чанка в тайлах (чанки тоже квадратные)
+CHUNK_SIZE = 8
+# Радиус (в чанках) вокруг камеры, в котором чанки подгружаются
+CHUNK_LOAD_RADIUS = 2
+# Радиус (в чанках), за пределами которого чанки выгружаются из памяти
+CHUNK_UNLOAD_RADIUS = 4
+# Сколько памяти (в байтах) могут занимать заранее отрисованные слои чанков
+STATIC_LAYER_MEMORY_LIMIT = 64 * 1024 * 1024
+# Размер ячейки пространственного хэша динамических объектов (в пикселях)
+SPATIAL_HASH_CELL_SIZE = 2 * TILE_WIDTH
+# Запас (в пикселях) вокруг экрана, в котором чанки считаются видимыми:
+# враги отходят от своего чанка на расстояние до 150 пикселей
+CHUNK_VIEW_MARGIN = 3 * TILE_WIDTH
+# Ширина (в чанках) кольца вокруг видимых чанков, враги в котором
+# симулируются упрощённо: без проверок столкновений, зрения и стрельбы.
+# Чанки кольца подгружаются, даже если они дальше CHUNK_LOAD_RADIUS
+SIMULATION_NEAR_RADIUS = 1
+# Запас (в пикселях) вокруг экрана, за которым спрайты не отрисовываются:
+# шкалы здоровья рисуются над спрайтами, а сами спрайты за кадр сдвигаются
+SPRITE_CULL_MARGIN = TILE_WIDTH
+# Сколько потоков готовят чанки при запуске уровня (0 - всё в главном потоке)
+CHUNK_PREPARE_WORKERS = 4
+# Предел частоты отрисовки кадров
+FPS = 144
+# Частота шагов симуляции (в секунду): скорости ниже заданы в пикселях за
+# шаг, а игра идёт с одной скоростью при любой частоте кадров
+SIMULATION_RATE = 60
+# Сколько шагов симуляции можно сделать за один кадр: если кадр длился
+# дольше, игра замедляется, а не пытается догнать время
+MAX_SIMULATION_STEPS = 5
 # Ширина экрана
 WIDTH = 800
 # Высота экрана
 HEIGHT = 400
 # На сколько пикселей перемещается игрок
 STEP = 8
+# На сколько пикселей за шаг поднимается игрок в прыжке
+JUMP_STEP = 10
+# На сколько пикселей за шаг падают игрок и враги
+FALL_STEP = 5
+# Длительность прыжка (в секундах)
+JUMP_TIME = 0.33
+# Время перезарядки обоймы (в секундах)
+RELOAD_TIME = 2
+# Через сколько секунд восстанавливается единица щита
+SHIELD_RECHARGE_TIME = 2.5
+# Сколько секунд враг остаётся в режиме атаки, потеряв игрока из виду
+ENEMY_ALERT_TIME = 2
+# Время полёта снаряда (в секундах)
+BULLET_LIFETIME = 0.75
 # Ширина пули
 BULLET_WIDTH = 15
 # Высота пули
 BULLET_HEIGHT = 5
 # Скорость пули
 BULLET_SPEED = 5
+# Сколько снарядов может лететь одновременно
+BULLET_POOL_SIZE = 256
+# Сколько частиц эффектов может существовать одновременно
+PARTICLE_LIMIT = 4096
+# Размер частицы (в пикселях)
+PARTICLE_SIZE = 2
+# На сколько пикселей за шаг ускоряется падение частиц
+PARTICLE_GRAVITY = 0.4
 # Игрок смотрит влево
 DIRECTION_LEFT = 0
 # Игрок смотрит вправо
@@ -0,0 +1,391 @@
+import numpy as np
+from pygame import Rect
+
+from constants import DIRECTION_LEFT, DIRECTION_RIGHT, RELOAD_TIME, \
+    ENEMY_ALERT_TIME, TILE_WIDTH, TILE_HEIGHT
+from kinematics import contacts_array, blocked_array, fall_array
+from line_of_sight import watchers
+from timing import ticks
+
+# Типы врагов (строки таблицы характеристик)
+ORDINARY, HEAVY, ARMORED, MARKSMAN = range(4)
+
+# Характеристики типов врагов: хп, урон, объём обоймы, задержка между
+# выстрелами и время перезарядки (в шагах симуляции), дальность взгляда и
+# на сколько пикселей враг уходит в одну сторону
+ENEMY_ARCHETYPES = np.array([
+    (5, 2, 5, ticks(1.17), ticks(RELOAD_TIME), 300, 150),
+    (20, 1, 10, ticks(0.42), ticks(RELOAD_TIME), 300, 100),
+    (7, 7, 2, ticks(0.58), ticks(RELOAD_TIME), 300, 150),
+    (7, 14, 1, ticks(2.67), ticks(RELOAD_TIME), 450, 70),
+], dtype=[('max_hp', np.int32), ('damage', np.int32),
+          ('clip_size', np.int32), ('shot_delay', np.int32),
+          ('recharge_timer', np.int32), ('sight_range', np.int32),
+          ('max_distance', np.int32)])
+
+# Столбцы хранилища врагов и их типы. Названия совпадают с атрибутами
+# спрайта врага
+ENEMY_COLUMNS = {
+    'type': np.int8, 'chunk_number': np.int32,
+    'x': np.int32, 'y': np.int32, 'width': np.int32, 'height': np.int32,
+    'hp': np.int32, 'max_hp': np.int32, 'direction': np.int8,
+    'distance': np.int32, 'max_distance': np.int32, 'speed': np.int32,
+    'timer': np.int32, 'ammo': np.int32, 'attack_timer': np.int32,
+    'current_image_idx': np.int32, 'frames': np.int32,
+    'contacts': np.int32, 'is_static': bool, 'resting': bool,
+    'attack_player': bool, 'is_shoot': bool,
+    # Занята ли ячейка живым врагом
+    'alive': bool,
+    # Сдвинулся ли враг с тех пор, как его положение записали в индекс
+    # снарядов
+    'moved': bool,
+    # Промежуток по оси x, по которому враг может ходить на высоте span_y
+    # (surveyed - размечен ли он). По нему враг ходит при упрощённой
+    # симуляции, не проверяя касаний
+    'span_left': np.int32, 'span_right': np.int32, 'span_y': np.int32,
+    'surveyed': bool,
+    # Положение до последнего шага симуляции (между ним и текущим враг
+    # плавно движется при отрисовке)
+    'previous_x': np.int32, 'previous_y': np.int32
+}
+
+
+class StoreField:
+    """Атрибут спрайта врага, значение которого лежит в столбце
+    хранилища (в ячейке спрайта)
+
+    """
+
+    def __init__(self, convert=int) -> None:
+        """
+        :key convert: во что превращается значение из массива
+        """
+        self.convert = convert
+        self.name = None
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, sprite, owner=None):
+        if sprite is None:
+            return self
+        return self.convert(getattr(sprite.store, self.name)[sprite.slot])
+
+    def __set__(self, sprite, value) -> None:
+        getattr(sprite.store, self.name)[sprite.slot] = value
+
+
+class EnemyStore:
+    """Хранилище врагов уровня: каждое поле врага - массив NumPy, а враг -
+    номер ячейки в этих массивах. Шаг симуляции обрабатывает сразу всех
+    врагов видимых чанков операциями над массивами, спрайты врагов нужны
+    только для отрисовки и попаданий снарядов
+
+    """
+
+    def __init__(self, capacity=64) -> None:
+        """
+        :key capacity: на сколько врагов сразу выделяются массивы (при
+        нехватке места они удваиваются)
+        """
+        self.capacity = capacity
+        for name, dtype in ENEMY_COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        # Спрайты врагов по номерам ячеек
+        self.sprites = [None] * capacity
+        # Свободные ячейки (первыми занимаются ячейки с меньшими номерами)
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return self.capacity - len(self.free)
+
+    def allocate(self, sprite) -> int:
+        """ Ячейка для нового врага (все поля обнулены)
+
+        :param sprite: спрайт врага
+        :return: номер ячейки
+        """
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        for name in ENEMY_COLUMNS:
+            getattr(self, name)[slot] = 0
+        self.alive[slot] = True
+        self.sprites[slot] = sprite
+        return slot
+
+    def release(self, slot: int) -> None:
+        """Освобождение ячейки погибшего или выгруженного врага"""
+        if self.alive[slot]:
+            self.alive[slot] = False
+            self.sprites[slot] = None
+            self.free.append(slot)
+
+    def start_step(self) -> None:
+        """Запоминание положений всех врагов перед шагом симуляции"""
+        self.previous_x[:] = self.x
+        self.previous_y[:] = self.y
+
+    def place(self, slots: np.ndarray) -> None:
+        """ Враги только что появились на своих местах (при отрисовке они
+        не съезжают туда из прошлого положения)
+
+        :param slots: ячейки врагов
+        """
+        self.previous_x[slots] = self.x[slots]
+        self.previous_y[slots] = self.y[slots]
+
+    def active(self, chunk_numbers: list) -> np.ndarray:
+        """ Ячейки живых врагов из заданных чанков
+
+        :param chunk_numbers: номера чанков
+        :return: номера ячеек по возрастанию
+        """
+        return np.flatnonzero(
+            self.alive & np.isin(self.chunk_number, chunk_numbers)
+        )
+
+    def patrol(self, active: np.ndarray, frame: int) -> None:
+        """ Патрулирование: враги, которые не стоят на месте и не атакуют,
+        идут в свою сторону (или в обратную, если путь прегражден) и
+        разворачиваются, пройдя max_distance пикселей
+
+        :param active: ячейки обрабатываемых врагов
+        :param frame: номер шага симуляции (для анимации)
+        """
+        contacts = self.contacts[active]
+        walking = ~self.is_static[active] & ~self.attack_player[active]
+        right = walking & (self.direction[active] == DIRECTION_RIGHT) & \
+            ~blocked_array(contacts, 1, head=False)
+        left = walking & ~right & ~blocked_array(contacts, -1, head=False)
+        self._walk(active, right, left)
+        if frame % 5 == 0:
+            animated = active[right | left]
+            self.current_image_idx[animated] = \
+                (self.current_image_idx[animated] + 1) % self.frames[animated]
+
+    def coast(self, active: np.ndarray) -> None:
+        """ Упрощённый шаг врагов рядом с экраном: без проверок касаний,
+        зрения, стрельбы и анимации. Враг патрулирует только по своему
+        промежутку (так он не зайдёт в стену и не упадёт), разворачиваясь у
+        его краёв, а таймеры атаки, задержки выстрела и перезарядки идут как
+        обычно. Выстрел, до которого дошёл таймер, откладывается до полной
+        симуляции
+
+        :param active: ячейки обрабатываемых врагов
+        """
+        x = self.x[active]
+        speed = self.speed[active]
+        walking = ~self.is_static[active] & ~self.attack_player[active]
+        room_right = x + speed <= self.span_right[active]
+        room_left = x - speed >= self.span_left[active]
+        # Враг, которому некуда идти в свою сторону, разворачивается у края
+        # промежутка
+        facing_right = self.direction[active] == DIRECTION_RIGHT
+        turned = active[walking & np.where(facing_right, ~room_right,
+                                           ~room_left)]
+        self.direction[turned] = np.where(
+            self.direction[turned] == DIRECTION_RIGHT,
+            DIRECTION_LEFT, DIRECTION_RIGHT
+        )
+        self.distance[turned] = 0
+        facing_right = self.direction[active] == DIRECTION_RIGHT
+        right = walking & facing_right & room_right
+        left = walking & ~facing_right & room_left
+        self._walk(active, right, left, travelled=right | left)
+        self._calm_down(active)
+        attacking = active[self.attack_player[active]]
+        self._wait(attacking[~self.is_shoot[attacking]])
+
+    def survey(self, active: np.ndarray, grid) -> None:
+        """ Обновление промежутков, по которым враги ходят при упрощённой
+        симуляции. Новому врагу и врагу, который сменил высоту, промежуток
+        размечается по сетке занятости, а дальше он расширяется
+        положениями, до которых враг дошёл при полной симуляции
+
+        :param active: ячейки обрабатываемых врагов
+        :param grid: сетка занятости уровня
+        """
+        moved_away = ~self.surveyed[active] | \
+            (self.span_y[active] != self.y[active])
+        self._chart(active[moved_away], grid)
+        x = self.x[active]
+        self.span_left[active] = np.minimum(self.span_left[active], x)
+        self.span_right[active] = np.maximum(self.span_right[active], x)
+
+    def watching(self, active: np.ndarray, grid, target: Rect) -> np.ndarray:
+        """ Какие враги видят цель
+
+        :param active: ячейки обрабатываемых врагов
+        :param grid: сетка занятости уровня
+        :param target: прямоугольник цели в координатах уровня
+        :return: массив флагов (по порядку ячеек active)
+        """
+        return watchers(
+            grid, self.x[active], self.y[active], self.width[active],
+            self.height[active], self.direction[active],
+            ENEMY_ARCHETYPES['sight_range'][self.type[active]], target
+        )
+
+    def think(self, active: np.ndarray, seen: np.ndarray) -> np.ndarray:
+        """ Режим атаки и стрельба. Заметивший игрока враг останавливается и
+        атакует, потерявший - атакует ещё ENEMY_ALERT_TIME секунд.
+        Атакующий враг стреляет с задержкой shot_delay, а расстреляв обойму,
+        перезаряжается
+
+        :param active: ячейки обрабатываемых врагов
+        :param seen: видит ли игрока каждый из них
+        :return: ячейки врагов, которые выстрелили на этом шаге
+        """
+        watching = active[seen]
+        self.attack_player[watching] = True
+        self.current_image_idx[watching] = 0
+        self.speed[watching] = 0
+        self.attack_timer[watching] = ticks(ENEMY_ALERT_TIME)
+        self._calm_down(active[~seen])
+
+        attacking = active[self.attack_player[active]]
+        ready = attacking[self.is_shoot[attacking]]
+        waiting = attacking[~self.is_shoot[attacking]]
+        shooters = ready[self.ammo[ready] != 0]
+        reloading = ready[self.ammo[ready] == 0]
+        stats = ENEMY_ARCHETYPES[self.type[shooters]]
+        self.timer[shooters] = stats['shot_delay']
+        self.ammo[shooters] -= 1
+        stats = ENEMY_ARCHETYPES[self.type[reloading]]
+        self.timer[reloading] = stats['recharge_timer']
+        self.ammo[reloading] = stats['clip_size']
+        self.is_shoot[ready] = False
+        self._wait(waiting)
+        return shooters
+
+    def fall(self, active: np.ndarray, grid) -> None:
+        """ Падение врагов без опоры (стоящий на месте враг на опоре не
+        проверяется, пока опору не разрушат)
+
+        :param active: ячейки обрабатываемых врагов
+        :param grid: сетка занятости уровня
+        """
+        checked = active[~(self.is_static[active] & self.resting[active])]
+        flags = contacts_array(grid, self.x[checked], self.y[checked],
+                               self.width[checked], self.height[checked])
+        self.contacts[checked] = flags
+        dx, dy = fall_array(flags)
+        self.resting[checked] = dy == 0
+        self.x[checked] += dx
+        self.y[checked] += dy
+        self.moved[checked[dy != 0]] = True
+
+    def take_moved(self, active: np.ndarray) -> list:
+        """ Спрайты сдвинувшихся врагов (флаг сдвига при этом снимается)
+
+        :param active: ячейки обрабатываемых врагов
+        """
+        moved = active[self.moved[active]]
+        self.moved[moved] = False
+        return [self.sprites[slot] for slot in moved.tolist()]
+
+    def _walk(self, active: np.ndarray, right: np.ndarray,
+              left: np.ndarray, travelled=None) -> None:
+        """ Сдвиг врагов на их скорость и разворот прошедших max_distance
+
+        :param active: ячейки обрабатываемых врагов
+        :param right: кто из них идёт вправо
+        :param left: кто из них идёт влево
+        :key travelled: кому из них засчитывается пройденный путь (по
+        умолчанию - всем, даже тем, кому путь прегражден)
+        """
+        speed = self.speed[active]
+        self.x[active] += np.where(right, speed, 0) - np.where(left, speed, 0)
+        walked = active[(right | left) & (speed != 0)]
+        self.moved[walked] = True
+
+        if travelled is None:
+            self.distance[active] += speed
+        else:
+            self.distance[active] += np.where(travelled, speed, 0)
+        turned = active[self.distance[active] >= self.max_distance[active]]
+        self.direction[turned] = np.where(
+            self.direction[turned] == DIRECTION_RIGHT,
+            DIRECTION_LEFT, DIRECTION_RIGHT
+        )
+        self.distance[turned] = 0
+
+    def _chart(self, slots: np.ndarray, grid) -> None:
+        """ Разметка промежутков врагов по сетке занятости: от ближайшей
+        стены слева до ближайшей стены справа (лучи по каждой строке клеток,
+        которые занимает враг) в пределах сплошной опоры под ногами и не
+        дальше max_distance в каждую сторону. Враг без опоры стоит на месте
+
+        :param slots: ячейки врагов
+        :param grid: сетка занятости уровня
+        """
+        for slot in slots.tolist():
+            x, y = int(self.x[slot]), int(self.y[slot])
+            width, height = int(self.width[slot]), int(self.height[slot])
+            reach = int(self.max_distance[slot])
+            left, right = x - reach, x + reach
+            # Стоящий враг утоплен в опору на пиксель, поэтому строка опоры
+            # в лучи не попадает
+            for row in range(y // TILE_HEIGHT,
+                             (y + height - 2) // TILE_HEIGHT + 1):
+                wall = grid.raycast_x(x - 1, row * TILE_HEIGHT, -reach)
+                if wall is not None:
+                    left = max(left, wall + 1)
+                wall = grid.raycast_x(x + width, row * TILE_HEIGHT, reach)
+                if wall is not None:
+                    right = min(right, wall - width)
+            # Сплошной ряд твёрдых клеток под ногами, начиная с первой
+            # клетки опоры под врагом
+            first = min(left, x) // TILE_WIDTH
+            columns = np.arange(first,
+                                (max(right, x) + width - 1) // TILE_WIDTH + 1)
+            support = grid.solid_cells(
+                columns, np.full(len(columns), (y + height) // TILE_HEIGHT)
+            )
+            under = support[x // TILE_WIDTH - first:
+                            (x + width - 1) // TILE_WIDTH - first + 1]
+            if under.any():
+                start = x // TILE_WIDTH - first + int(np.argmax(under))
+                gaps = np.flatnonzero(~support)
+                before, after = gaps[gaps < start], gaps[gaps > start]
+                if len(before):
+                    left = max(left, (first + int(before[-1]) + 1) *
+                               TILE_WIDTH)
+                if len(after):
+                    right = min(right, (first + int(after[0])) * TILE_WIDTH -
+                                width)
+            else:
+                left = right = x
+            self.span_left[slot] = min(left, x)
+            self.span_right[slot] = max(right, x)
+            self.span_y[slot] = y
+            self.surveyed[slot] = True
+
+    def _calm_down(self, lost: np.ndarray) -> None:
+        """Отсчёт времени атаки врагов, которые не видят игрока (враг, у
+        которого оно вышло, снова патрулирует)
+        """
+        alert = lost[self.attack_timer[lost] != 0]
+        self.attack_timer[alert] -= 1
+        calm = lost[self.attack_timer[lost] == 0]
+        self.attack_player[calm] = False
+        self.speed[calm] = 1
+
+    def _wait(self, waiting: np.ndarray) -> None:
+        """Отсчёт задержки выстрела или перезарядки (по её окончании враг
+        готов стрелять)
+        """
+        self.timer[waiting] -= 1
+        self.is_shoot[waiting[self.timer[waiting] == 0]] = True
+
+    def _grow(self) -> None:
+        """Удвоение размера массивов"""
+        capacity = self.capacity * 2
+        for name, dtype in ENEMY_COLUMNS.items():
+            column = np.zeros(capacity, dtype=dtype)
+            column[:self.capacity] = getattr(self, name)
+            setattr(self, name, column)
+        self.sprites.extend([None] * (capacity - self.capacity))
+        self.free = list(range(capacity - 1, self.capacity - 1, -1))
+        self.capacity = capacity
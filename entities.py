@@ -1,13 +1,18 @@
 from typing import Literal
 
 from constants import DIRECTION_RIGHT, DIRECTION_LEFT, TILE_WIDTH, \
-    TILE_HEIGHT, HEALTH_SCALE_WIDTH, HEALTH_SCALE_HEIGTH, HEALTH_SCALE_BORDER
-from pygame.sprite import Sprite, Group, spritecollideany
+    TILE_HEIGHT, HEALTH_SCALE_WIDTH, HEALTH_SCALE_HEIGTH, \
+    HEALTH_SCALE_BORDER
+from pygame.sprite import Sprite
 from pygame import Rect
 from pygame.draw import rect
 from sqlite3 import connect
 from pygame.transform import flip
 
+from enemy_store import EnemyStore, StoreField, ENEMY_ARCHETYPES, \
+    ORDINARY, HEAVY, ARMORED, MARKSMAN
+from kinematics import contacts
+
 
 class Entity(Sprite):
     """ Сущность """
@@ -36,8 +41,8 @@ class Entity(Sprite):
         # Координаты персонажа в пикселях
         self.x = self.grid_x * TILE_WIDTH + 24
         self.y = self.grid_y * TILE_HEIGHT + 2
-        # Список с флагами для проверки соприкосновений с группой спрайтов
-        self.collide_list = [False for _ in range(8)]
+        # Маска касаний со стенами и коробками (флаги из kinematics)
+        self.contacts = 0
         # Индекс для получения изображения сущности
         self.current_image_idx = 0
         # Изображения сущностей
@@ -47,50 +52,18 @@ class Entity(Sprite):
         # Размещаем сущность на экране
         self.rect = self.image.get_rect().move(self.x, self.y)
 
-    def check_collision_sides(self, sprite_group):
-        """ Проверяем столкновение игрока с группой спрайтов, при этом
-        получая информацию о том, какими точками спрайт игрока
-        соприкасается с другими спрайтами
+    def check_collision_sides(self, grid) -> int:
+        """ Проверяем столкновение сущности со стенами и коробками, при этом
+        получая информацию о том, какими точками спрайт сущности
+        соприкасается с ними
 
+        :param grid: сетка занятости уровня
+        :return: маска касаний
         """
-        self.collide_list = [False for _ in range(8)]
-
-        for sprite in sprite_group:
-            # Углы
-            if not self.collide_list[0]:
-                self.collide_list[0] = sprite.rect.collidepoint(
-                    self.rect.topleft
-                )
-            if not self.collide_list[1]:
-                self.collide_list[1] = sprite.rect.collidepoint(
-                    self.rect.topright
-                )
-            if not self.collide_list[2]:
-                self.collide_list[2] = sprite.rect.collidepoint(
-                    self.rect.bottomleft
-                )
-            if not self.collide_list[3]:
-                self.collide_list[3] = sprite.rect.collidepoint(
-                    self.rect.bottomright
-                )
-
-            # Грани
-            if not self.collide_list[4]:
-                self.collide_list[4] = sprite.rect.collidepoint(
-                    self.rect.midleft
-                )
-            if not self.collide_list[5]:
-                self.collide_list[5] = sprite.rect.collidepoint(
-                    self.rect.midright
-                )
-            if not self.collide_list[6]:
-                self.collide_list[6] = sprite.rect.collidepoint(
-                    self.rect.midtop
-                )
-            if not self.collide_list[7]:
-                self.collide_list[7] = sprite.rect.collidepoint(
-                    self.rect.midbottom
-                )
+        self.contacts = contacts(
+            grid, Rect(self.x, self.y, self.rect.w, self.rect.h)
+        )
+        return self.contacts
 
     def draw_health_scale(self, screen, x, y):
         """Отрисовка шкалы здоровья"""
@@ -148,7 +121,8 @@ class Player(Entity):
             'SELECT Ammo FROM Player_data'
         ).fetchone()[0]
         self.ammo = self.clip_size
-        # Скорость стрельбы
+        # Скорость стрельбы (задержка между выстрелами в шагах симуляции,
+        # как она хранится в БД)
         self.shot_delay = self.cur.execute(
             'SELECT Shot_delay FROM Player_data'
         ).fetchone()[0]
@@ -162,12 +136,39 @@ class Player(Entity):
 
 
 class Enemy(Entity):
-    """Враг"""
+    """Враг. Его состояние лежит в ячейке хранилища врагов (шаг симуляции
+    обрабатывает всех врагов сразу), а спрайт нужен для отрисовки и
+    попаданий снарядов
+
+    """
+
+    # Тип врага (строка таблицы характеристик ENEMY_ARCHETYPES)
+    type = ORDINARY
+
+    # Поля врага в хранилище
+    chunk_number = StoreField()
+    x = StoreField()
+    y = StoreField()
+    hp = StoreField()
+    max_hp = StoreField()
+    contacts = StoreField()
+    current_image_idx = StoreField()
+    is_static = StoreField(bool)
+    resting = StoreField(bool)
+    distance = StoreField()
+    max_distance = StoreField()
+    speed = StoreField()
+    direction = StoreField()
+    attack_player = StoreField(bool)
+    is_shoot = StoreField(bool)
+    timer = StoreField()
+    ammo = StoreField()
+    attack_timer = StoreField()
 
     def __init__(self, sprite_groups: list,
                  enemy_images: list, pos_x: int, pos_y: int,
-                 chunk_number: int,
-                 is_static=False, max_distance=150,
+                 chunk_number: int, store: EnemyStore,
+                 is_static=False, max_distance=None,
                  direction=DIRECTION_LEFT) -> None:
         """
         :param sprite_groups: Группа, куда будет добавлен враг
@@ -175,31 +176,37 @@ class Enemy(Entity):
         :param pos_x: позиция по оси x
         :param pos_y: позиция по оси y
         :param chunk_number: номер чанка
+        :param store: хранилище врагов уровня
         :key is_static: флаг для определения движения
         :key max_distance: максимальная дистанция на которую ходит враг в
-        одном направлении
+        одном направлении (по умолчанию - из характеристик типа врага)
         :key direction: направление врага
         """
+        # Ячейка нужна до того, как сущность запишет свои координаты
+        self.store = store
+        self.slot = store.allocate(self)
         super().__init__(sprite_groups, enemy_images, pos_x, pos_y)
-
-        # Изменение изображения врага в зависимости стороны, в которую он
-        # смотрит
-        if direction == DIRECTION_LEFT:
-            self.image = flip(
-                enemy_images[self.current_image_idx], True, False
-            )
+        stats = ENEMY_ARCHETYPES[self.type]
+        store.type[self.slot] = self.type
+        store.width[self.slot] = self.rect.w
+        store.height[self.slot] = self.rect.h
+        store.frames[self.slot] = len(enemy_images)
+        # Отражённые кадры (для врага, который смотрит влево)
+        self.flipped_images = _flipped_frames(enemy_images)
         # номер чанка
         self.chunk_number = chunk_number
-        # тип врага
-        self.type = 0
         self.x -= 24
         # HP врага
-        self.max_hp = 5
+        self.max_hp = stats['max_hp']
         self.hp = self.max_hp
         self.is_static = is_static
+        # Стоит ли враг на опоре (стоящий на месте враг после этого не
+        # проверяет касания, пока опору не разрушат)
+        self.resting = False
         # Пройденный промежуток в px
         self.distance = 0
-        self.max_distance = max_distance
+        self.max_distance = stats['max_distance'] \
+            if max_distance is None else max_distance
         # Скорость
         self.speed = 1
         # Направление врага
@@ -210,222 +217,68 @@ class Enemy(Entity):
         self.is_shoot = True
         # Таймер
         self.timer = 0
-        # Скорость стрельбы
-        self.shot_delay = 70
-        # Максимальный объем обоймы
-        self.clip_size = 5
         # Патроны
-        self.ammo = self.clip_size
-        # Таймер перезарядки
-        self.recharge_timer = 120
+        self.ammo = stats['clip_size']
         # Таймер для задержки атаки
         self.attack_timer = 0
-        # Урон
-        self.damage = 2
-        # Луч видимости игрока
-        self.ray = Ray(self.direction,
-                       self.x + self.rect.w,
-                       self.y + self.rect.h // 2)
-
-    def update(self, camera, frame) -> None:
-        """Перемещение врага"""
-        # Проверка на тип поведения
-        if not self.is_static:
-            if not self.attack_player:
-                if self.direction and not any(
-                        (
-                                self.collide_list[5],
-                                (
-                                        not self.collide_list[7] and
-                                        self.collide_list[3]
-                                )
-                        )
-                ):
-                    self.x += self.speed
-                    self.ray.x += self.speed
-                    if frame % 5 == 0:
-                        self.current_image_idx += 1
-                        if self.current_image_idx == len(self.images):
-                            self.current_image_idx = 0
-                elif not any(
-                        (
-                                self.collide_list[4],
-                                (
-                                        not self.collide_list[7] and
-                                        self.collide_list[2]
-                                )
-                        )
-                ):
-                    self.x -= self.speed
-                    self.ray.x -= self.speed
-                    if frame % 5 == 0:
-                        self.current_image_idx += 1
-                        if self.current_image_idx == len(self.images):
-                            self.current_image_idx = 0
-        self.distance += self.speed
-
-        # Меняем направление движения и изображение врага, если враг прошел
-        # 150px
-        if self.distance >= self.max_distance:
-            if self.direction:
-                self.direction = DIRECTION_LEFT
-                self.ray.x -= self.ray.rect.w
-            else:
-                self.direction = DIRECTION_RIGHT
-                self.ray.x += self.ray.rect.w
-            # Обнуляем дистанцию
-            self.distance = 0
+        self.sync_image()
+
+    @property
+    def damage(self) -> int:
+        """Урон от выстрела врага"""
+        return int(ENEMY_ARCHETYPES['damage'][self.type])
+
+    def kill(self) -> None:
+        super().kill()
+        self.store.release(self.slot)
+
+    def view_position(self, alpha: float) -> tuple[int, int]:
+        """ Положение врага для отрисовки: между положениями до и после
+        последнего шага симуляции (как у камеры)
+
+        :param alpha: какая доля следующего шага уже прошла (от 0 до 1)
+        """
+        previous_x = int(self.store.previous_x[self.slot])
+        previous_y = int(self.store.previous_y[self.slot])
+        return (round(previous_x + (self.x - previous_x) * alpha),
+                round(previous_y + (self.y - previous_y) * alpha))
+
+    def sync_image(self) -> None:
+        """Изображение врага по кадру анимации и направлению"""
         if self.direction == DIRECTION_RIGHT:
             self.image = self.images[self.current_image_idx]
         else:
-            self.image = flip(
-                self.images[self.current_image_idx], True, False
-            )
-        self.ray.rect.x = self.ray.x - camera.x + camera.dx
-        self.ray.rect.y = self.ray.y - camera.y + camera.dy
+            self.image = self.flipped_images[self.current_image_idx]
 
 
 class HeavyEnemy(Enemy):
     """Тяжелый враг"""
 
-    def __init__(self, sprite_groups: list,
-                 enemy_images: list, pos_x: int, pos_y: int,
-                 chunk_number: int,
-                 is_static=False, max_distance=100,
-                 direction=DIRECTION_LEFT) -> None:
-        """
-            :param sprite_groups: Группа, куда будет добавлен враг
-            :param enemy_images: Изображения врагов
-            :param pos_x: позиция по оси x
-            :param pos_y: позиция по оси y
-            :param chunk_number: номер чанка
-            :key is_static: флаг для определения движения
-            :key max_distance: максимальная дистанция на которую ходит враг в
-            одном направлении
-            :key direction: направление врага
-        """
-        super().__init__(sprite_groups, enemy_images, pos_x, pos_y,
-                         chunk_number, is_static, max_distance, direction)
-        # Тип врага
-        self.type = 1
-        # Хп врага
-        self.max_hp = 20
-        self.hp = self.max_hp
-        # Урон врага
-        self.damage = 1
-        # Максимальный объем обоймы
-        self.clip_size = 10
-        # Патроны
-        self.ammo = self.clip_size
-        # Скорость стрельбы
-        self.shot_delay = 25
+    type = HEAVY
 
 
 class ArmoredEnemy(Enemy):
     """Враг с щитом"""
 
-    def __init__(self, sprite_groups: list,
-                 enemy_images: list, pos_x: int, pos_y: int,
-                 chunk_number: int,
-                 is_static=False, max_distance=150,
-                 direction=DIRECTION_LEFT) -> None:
-        """
-            :param sprite_groups: Группа, куда будет добавлен враг
-            :param enemy_images: Изображения врагов
-            :param pos_x: позиция по оси x
-            :param pos_y: позиция по оси y
-            :param chunk_number: номер чанка
-            :key is_static: флаг для определения движения
-            :key max_distance: максимальная дистанция на которую ходит враг в
-            одном направлении
-            :key direction: направление врага
-        """
-        super().__init__(sprite_groups, enemy_images, pos_x, pos_y,
-                         chunk_number, is_static, max_distance, direction)
-        # Тип врага
-        self.type = 2
-        # Хп врага
-        self.max_hp = 7
-        self.hp = self.max_hp
-        # Максимальный объем обоймы
-        self.clip_size = 2
-        # Патроны
-        self.ammo = self.clip_size
-        # Скорость стрельбы
-        self.shot_delay = 35
-        # Урон
-        self.damage = 7
+    type = ARMORED
 
 
 class MarksmanEnemy(Enemy):
     """Снайпер"""
 
-    def __init__(self, sprite_groups: list,
-                 enemy_images: list, pos_x: int, pos_y: int,
-                 chunk_number: int,
-                 is_static=False, max_distance=70,
-                 direction=DIRECTION_LEFT) -> None:
-        """
-            :param sprite_groups: Группа, куда будет добавлен враг
-            :param enemy_images: Изображения врагов
-            :param pos_x: позиция по оси x
-            :param pos_y: позиция по оси y
-            :param chunk_number: номер чанка
-            :key is_static: флаг для определения движения
-            :key max_distance: максимальная дистанция на которую ходит враг в
-            одном направлении
-            :key direction: направление врага
-        """
-        super().__init__(sprite_groups, enemy_images, pos_x, pos_y,
-                         chunk_number, is_static, max_distance, direction)
-        # Тип врага
-        self.type = 3
-        # Хп врага
-        self.max_hp = 7
-        self.hp = self.max_hp
-        # Максимальный объем обоймы
-        self.clip_size = 1
-        # Патроны
-        self.ammo = self.clip_size
-        # Скорость стрельбы
-        self.shot_delay = 160
-        # Урон
-        self.damage = 14
-        # Длина и ширина луча видимости игрока (больше чем у других врагов)
-        self.ray.rect.w += 150
-        if self.direction == DIRECTION_RIGHT:
-            self.ray.x += 150
-        else:
-            self.ray.x -= 150
+    type = MARKSMAN
 
 
-class Ray(Sprite):
-    """Луч для проверки наличия спрайта игрока в поле зрения врага"""
+def _flipped_frames(images: list) -> list:
+    """Отражённые по горизонтали кадры (общие для всех врагов с одним
+    набором кадров)
+    """
+    cached = _FLIPPED_FRAMES.get(id(images))
+    if cached is None or cached[0] is not images:
+        cached = (images, [flip(image, True, False) for image in images])
+        _FLIPPED_FRAMES[id(images)] = cached
+    return cached[1]
 
-    def __init__(self, direction: Literal[0, 1],
-                 pos_x: int, pos_y: int) -> None:
-        """
-        :param direction: направление луча
-        :param pos_x: позиция по оси x
-        :param pos_y: позиция по оси y
-        """
-        super().__init__()
-        # Позиция по оси x
-        if direction:
-            self.x = pos_x
-        else:
-            self.x = pos_x - 300
-        # Позиция по оси y
-        self.y = pos_y
-        # Фигура луча
-        self.rect = Rect(self.x, self.y, 300, 1)
-        # Направление луча
-        self.direction = direction
 
-    def check_collide_with_player(
-            self, player_group: Group
-    ) -> bool:
-        """Проверка столкновения с игроком"""
-        if spritecollideany(self, player_group):
-            return True
-        return False
+# Отражённые кадры врагов: id набора кадров -> (набор, отражённые кадры)
+_FLIPPED_FRAMES = {}
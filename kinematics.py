@@ -0,0 +1,158 @@
+import numpy as np
+from pygame import Rect
+
+from constants import TILE_WIDTH, TILE_HEIGHT, FALL_STEP
+
+# Флаги касаний: какие точки прямоугольника сущности попали в твёрдые
+# клетки (углы и середины граней)
+TOP_LEFT = 1
+TOP_RIGHT = 2
+BOTTOM_LEFT = 4
+BOTTOM_RIGHT = 8
+LEFT = 16
+RIGHT = 32
+TOP = 64
+BOTTOM = 128
+
+
+def contacts(grid, rect: Rect) -> int:
+    """ Касания прямоугольника с твёрдыми клетками сетки занятости. Точки
+    берутся как у pygame (правая и нижняя - на пиксель за прямоугольником),
+    поэтому проверяется не больше девяти клеток вокруг сущности
+
+    :param grid: сетка занятости уровня
+    :param rect: прямоугольник сущности в координатах уровня
+    :return: маска флагов касаний
+    """
+    left, center_x, right = (rect.left // TILE_WIDTH,
+                             rect.centerx // TILE_WIDTH,
+                             rect.right // TILE_WIDTH)
+    top, center_y, bottom = (rect.top // TILE_HEIGHT,
+                             rect.centery // TILE_HEIGHT,
+                             rect.bottom // TILE_HEIGHT)
+    solid = grid.is_solid
+    flags = 0
+    for flag, x, y in (
+            (TOP_LEFT, left, top), (TOP_RIGHT, right, top),
+            (BOTTOM_LEFT, left, bottom), (BOTTOM_RIGHT, right, bottom),
+            (LEFT, left, center_y), (RIGHT, right, center_y),
+            (TOP, center_x, top), (BOTTOM, center_x, bottom)
+    ):
+        if solid(x, y):
+            flags |= flag
+    return flags
+
+
+def contacts_array(grid, x: np.ndarray, y: np.ndarray, width: np.ndarray,
+                   height: np.ndarray) -> np.ndarray:
+    """ Касания сразу для многих прямоугольников (точки те же, что у
+    contacts)
+
+    :param grid: сетка занятости уровня
+    :param x: левые края прямоугольников в координатах уровня
+    :param y: верхние края прямоугольников
+    :param width: ширины прямоугольников
+    :param height: высоты прямоугольников
+    :return: массив масок флагов касаний
+    """
+    left, center_x, right = (x // TILE_WIDTH,
+                             (x + width // 2) // TILE_WIDTH,
+                             (x + width) // TILE_WIDTH)
+    top, center_y, bottom = (y // TILE_HEIGHT,
+                             (y + height // 2) // TILE_HEIGHT,
+                             (y + height) // TILE_HEIGHT)
+    flags = np.zeros(len(x), dtype=np.int32)
+    for flag, cells_x, cells_y in (
+            (TOP_LEFT, left, top), (TOP_RIGHT, right, top),
+            (BOTTOM_LEFT, left, bottom), (BOTTOM_RIGHT, right, bottom),
+            (LEFT, left, center_y), (RIGHT, right, center_y),
+            (TOP, center_x, top), (BOTTOM, center_x, bottom)
+    ):
+        flags[grid.solid_cells(cells_x, cells_y)] |= flag
+    return flags
+
+
+def blocked(flags: int, dx: int, head=True) -> bool:
+    """ Мешает ли что-то сдвинуться по горизонтали. Сбоку мешает стена на
+    уровне середины, а также угол ступеньки, если сущность не стоит на ней
+    (или не упирается в неё головой)
+
+    :param flags: маска касаний
+    :param dx: направление сдвига (знак)
+    :key head: учитывать ли препятствия на уровне головы
+    """
+    if dx < 0:
+        side, bottom_corner, top_corner = LEFT, BOTTOM_LEFT, TOP_LEFT
+    else:
+        side, bottom_corner, top_corner = RIGHT, BOTTOM_RIGHT, TOP_RIGHT
+    if flags & side:
+        return True
+    if flags & bottom_corner and not flags & BOTTOM:
+        return True
+    return head and bool(flags & top_corner and not flags & TOP)
+
+
+def blocked_array(flags: np.ndarray, dx: int, head=True) -> np.ndarray:
+    """ То же, что blocked, для массива масок касаний
+
+    :param flags: массив масок касаний
+    :param dx: направление сдвига (знак, общий для всех)
+    :key head: учитывать ли препятствия на уровне головы
+    :return: массив флагов "сдвинуться мешают"
+    """
+    if dx < 0:
+        side, bottom_corner, top_corner = LEFT, BOTTOM_LEFT, TOP_LEFT
+    else:
+        side, bottom_corner, top_corner = RIGHT, BOTTOM_RIGHT, TOP_RIGHT
+    result = (flags & side != 0) | \
+        (flags & bottom_corner != 0) & (flags & BOTTOM == 0)
+    if head:
+        result |= (flags & top_corner != 0) & (flags & TOP == 0)
+    return result
+
+
+def step(flags: int, dx: int, dy: int, head=True) -> tuple[int, int]:
+    """ Сдвиг сущности с учётом касаний: оси разбираются по отдельности,
+    сдвиг по оси отменяется, если в эту сторону мешает твёрдая клетка
+
+    :param flags: маска касаний
+    :param dx: желаемый сдвиг по оси x
+    :param dy: желаемый сдвиг по оси y
+    :key head: учитывать ли препятствия на уровне головы при сдвиге по x
+    :return: разрешённый сдвиг (dx, dy)
+    """
+    if dx and blocked(flags, dx, head):
+        dx = 0
+    if dy < 0 and flags & TOP or dy > 0 and flags & BOTTOM:
+        dy = 0
+    return dx, dy
+
+
+def fall(flags: int) -> tuple[int, int]:
+    """ Сдвиг при падении. Сущность, зацепившаяся углом за край уступа,
+    соскальзывает с него
+
+    :param flags: маска касаний
+    :return: сдвиг (dx, dy), нулевой, если сущность стоит на твёрдой клетке
+    """
+    if flags & BOTTOM:
+        return 0, 0
+    if flags & BOTTOM_LEFT:
+        return 1, FALL_STEP
+    if flags & BOTTOM_RIGHT:
+        return -1, FALL_STEP
+    return 0, FALL_STEP
+
+
+def fall_array(flags: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ То же, что fall, для массива масок касаний
+
+    :param flags: массив масок касаний
+    :return: массивы сдвигов (dx, dy)
+    """
+    standing = flags & BOTTOM != 0
+    dx = np.where(flags & BOTTOM_LEFT != 0, 1,
+                  np.where(flags & BOTTOM_RIGHT != 0, -1, 0))
+    dx[standing] = 0
+    dy = np.where(standing, 0, FALL_STEP)
+    return dx, dy
@@ -0,0 +1,425 @@
+import os
+import struct
+from hashlib import blake2b
+from zlib import crc32
+
+import numpy as np
+
+from constants import CHUNK_SIZE
+from tile_types import LEVEL_GLYPHS, EMPTY_CODE, STATIC_CODES, ENTITY_CODES
+
+# Таблица перевода номера символа юникода в код тайла
+_CODEPOINT_LUT = np.full(max(map(ord, LEVEL_GLYPHS)) + 1, EMPTY_CODE,
+                         dtype=np.uint8)
+_CODEPOINT_LUT[[ord(glyph) for glyph in LEVEL_GLYPHS]] = np.arange(
+    len(LEVEL_GLYPHS), dtype=np.uint8
+)
+
+# Расширение файла скомпилированного уровня (лежит рядом с исходником)
+COMPILED_LEVEL_EXTENSION = '.lvlc'
+# Сигнатура и версия формата скомпилированного уровня
+COMPILED_LEVEL_MAGIC = b'WLVL'
+COMPILED_LEVEL_VERSION = 3
+# Заголовок: сигнатура, версия, контрольная сумма таблицы символов, время
+# изменения и размер исходника, хэш исходника, ширина и высота в тайлах,
+# клетка появления игрока, количество динамических объектов, количество
+# уникальных статичных раскладок чанков. Сразу за заголовком лежит сетка
+# тайлов по столбцам (столбец чанков - один непрерывный кусок файла), а за
+# ней - динамические объекты, маска чанков и раскладки
+_HEADER = struct.Struct('<4sHIqq16sIIiiII')
+# Время изменения и размер исходника внутри заголовка (их переписывают,
+# если исходник тронули, не меняя содержимого)
+_HEADER_STAT = struct.Struct('<qq')
+_HEADER_STAT_OFFSET = struct.calcsize('<4sHI')
+# Сколько столбцов чанков обрабатывается за раз при сборе данных об уровне
+_METADATA_BLOCK = 1024
+
+
+class ChunkLayout:
+    """Статичная раскладка тайлов чанка (стены и фон). Одинаковые чанки
+    уровня ссылаются на одну и ту же неизменяемую раскладку
+
+    """
+    __slots__ = ('number', 'tiles')
+
+    def __init__(self, number: int, tiles: np.ndarray) -> None:
+        """
+        :param number: номер раскладки на уровне
+        :param tiles: коды статичных тайлов (остальные клетки пустые)
+        """
+        self.number = number
+        tiles.setflags(write=False)
+        self.tiles = tiles
+
+
+class Level:
+    """Уровень, где каждая клетка карты - целочисленный код тайла"""
+
+    def __init__(self, tiles: np.ndarray, player_x: int, player_y: int,
+                 entities=None, chunk_mask=None, layout_ids=None,
+                 layouts=None) -> None:
+        """
+        :param tiles: сетка кодов тайлов (строки - по оси y), может быть
+        отображена в память прямо из скомпилированного файла
+        :param player_x: клетка появления игрока по оси x
+        :param player_y: клетка появления игрока по оси y
+        :key entities: массив динамических объектов (код, x, y)
+        :key chunk_mask: маска непустых чанков
+        :key layout_ids: номера статичных раскладок чанков
+        :key layouts: коды тайлов уникальных статичных раскладок (массив
+        раскладок CHUNK_SIZE x CHUNK_SIZE)
+
+        Если entities не указан, то все данные об уровне собираются по сетке
+        """
+        self.tiles = tiles
+        self.player_x = player_x
+        self.player_y = player_y
+        # Размеры уровня в тайлах
+        self.height, self.width = tiles.shape
+        # Размеры уровня в чанках
+        self.level_x = self.width // CHUNK_SIZE
+        self.level_y = self.height // CHUNK_SIZE
+        if entities is None:
+            entities, chunk_mask, layout_ids, layouts = level_metadata(tiles)
+        self.entities = entities
+        # Раскладка чанков: есть ли в чанке хоть один тайл
+        self.chunk_mask = chunk_mask
+        # Номер статичной раскладки каждого чанка
+        self.layout_ids = layout_ids
+        # Уникальные статичные раскладки
+        self.layouts = [ChunkLayout(number, layout_tiles)
+                        for number, layout_tiles in enumerate(layouts)]
+
+    def chunk_layout(self, x: int, y: int) -> ChunkLayout:
+        """Статичная раскладка чанка
+
+        :param x: координата чанка по оси x
+        :param y: координата чанка по оси y
+        """
+        return self.layouts[self.layout_ids[y, x]]
+
+    def chunk_map(self, x: int, y: int) -> np.ndarray:
+        """Коды тайлов одного чанка
+
+        :param x: координата чанка по оси x
+        :param y: координата чанка по оси y
+        """
+        return self.tiles[y * CHUNK_SIZE:(y + 1) * CHUNK_SIZE,
+                          x * CHUNK_SIZE:(x + 1) * CHUNK_SIZE]
+
+
+class LevelWindow:
+    """Окно уровня: раскодированными в памяти держатся только столбцы
+    чанков рядом с камерой, остальная сетка остаётся в файле
+
+    """
+
+    def __init__(self, level: Level, radius: int) -> None:
+        """
+        :param level: уровень
+        :param radius: сколько столбцов чанков по обе стороны от камеры
+        держать в памяти
+        """
+        self.level = level
+        self.radius = radius
+        # Номер столбца чанков -> коды его тайлов
+        self.columns = {}
+
+    def update(self, center_x: int) -> None:
+        """ Забываем столбцы, от которых камера ушла слишком далеко
+
+        :param center_x: столбец чанков, в котором находится камера
+        """
+        for column_x in list(self.columns):
+            if abs(column_x - center_x) > self.radius:
+                del self.columns[column_x]
+
+    def chunk_map(self, x: int, y: int) -> np.ndarray:
+        """ Коды тайлов одного чанка (столбец раскодируется при первом
+        обращении)
+
+        :param x: координата чанка по оси x
+        :param y: координата чанка по оси y
+        """
+        return self.column(x)[y * CHUNK_SIZE:(y + 1) * CHUNK_SIZE]
+
+    def column(self, x: int) -> np.ndarray:
+        """ Коды тайлов столбца чанков (раскодируется при первом обращении,
+        можно вызывать из рабочих потоков)
+
+        :param x: координата столбца чанков по оси x
+        """
+        column = self.columns.get(x)
+        if column is None:
+            column = np.array(
+                self.level.tiles[:, x * CHUNK_SIZE:(x + 1) * CHUNK_SIZE]
+            )
+            self.columns[x] = column
+        return column
+
+
+def level_metadata(tiles: np.ndarray) -> tuple:
+    """ Сбор данных об уровне по сетке тайлов. Сетка обходится кусками по
+    столбцам чанков, так что целиком в памяти она не нужна
+
+    :param tiles: сетка кодов тайлов
+    :return: (динамические объекты, маска непустых чанков, номера
+    статичных раскладок чанков, уникальные раскладки)
+    """
+    height, width = tiles.shape
+    level_x, level_y = width // CHUNK_SIZE, height // CHUNK_SIZE
+    entities = [np.empty((0, 3), np.int32)]
+    chunk_mask = np.empty((level_y, level_x), dtype=bool)
+    layout_ids = np.empty((level_y, level_x), dtype=np.int32)
+    # Байты раскладки -> её номер (в порядке появления на уровне)
+    layout_numbers = {}
+    for start in range(0, level_x, _METADATA_BLOCK):
+        stop = min(start + _METADATA_BLOCK, level_x)
+        block = np.asarray(tiles[:level_y * CHUNK_SIZE,
+                                 start * CHUNK_SIZE:stop * CHUNK_SIZE])
+        ys, xs = np.nonzero(np.isin(block, ENTITY_CODES))
+        entities.append(np.column_stack(
+            (block[ys, xs], xs + start * CHUNK_SIZE, ys)
+        ).astype(np.int32))
+        chunk_mask[:, start:stop] = (block != EMPTY_CODE).reshape(
+            level_y, CHUNK_SIZE, stop - start, CHUNK_SIZE
+        ).any(axis=(1, 3))
+
+        # Номера статичных раскладок: одинаковые чанки получают один номер
+        static = np.where(np.isin(block, STATIC_CODES), block,
+                          EMPTY_CODE).astype(np.uint8)
+        layouts_bytes = static.reshape(
+            level_y, CHUNK_SIZE, stop - start, CHUNK_SIZE
+        ).transpose(0, 2, 1, 3).tobytes()
+        size = CHUNK_SIZE * CHUNK_SIZE
+        numbers = [
+            layout_numbers.setdefault(layouts_bytes[i:i + size],
+                                      len(layout_numbers))
+            for i in range(0, len(layouts_bytes), size)
+        ]
+        layout_ids[:, start:stop] = np.reshape(numbers,
+                                               (level_y, stop - start))
+
+    entities = np.concatenate(entities)
+    # Объекты по порядку строк карты, как они и записаны в файле
+    entities = entities[np.lexsort((entities[:, 1], entities[:, 2]))]
+    layouts = np.frombuffer(b''.join(layout_numbers), dtype=np.uint8)
+    return (entities, chunk_mask, layout_ids,
+            layouts.reshape(-1, CHUNK_SIZE, CHUNK_SIZE))
+
+
+def _read_rows(fullname: str):
+    """Строки текстового уровня без символов перевода строки"""
+    with open(fullname, 'r', encoding='utf8') as map_file:
+        for line in map_file:
+            yield line.strip()
+
+
+def _row_codes(row: str, width: int) -> np.ndarray:
+    """ Коды тайлов одной строки уровня
+
+    :param row: строка карты
+    :param width: ширина уровня (строка обрезается или дополняется пустыми
+    клетками до этой ширины)
+    """
+    codepoints = np.frombuffer(
+        row[:width].ljust(width, '.').encode('utf-32-le'), dtype=np.uint32
+    )
+    codes = np.full(width, EMPTY_CODE, dtype=np.uint8)
+    known = codepoints < len(_CODEPOINT_LUT)
+    codes[known] = _CODEPOINT_LUT[codepoints[known]]
+    return codes
+
+
+def _scan_level(fullname: str) -> tuple[int, int, int, int]:
+    """ Размеры уровня и клетка появления игрока без чтения всего файла в
+    память
+
+    :param fullname: путь к файлу уровня
+    :return: (ширина, высота, x игрока, y игрока), размеры обрезаны до
+    целого числа чанков
+    """
+    width = height = 0
+    player_x = player_y = -1
+    for height, row in enumerate(_read_rows(fullname), 1):
+        width = max(width, len(row))
+        if player_x == -1:
+            player_x, player_y = row.find('@'), height - 1
+    if player_x == -1:
+        raise ValueError(f'На уровне {fullname} нет точки появления игрока')
+    return (width // CHUNK_SIZE * CHUNK_SIZE,
+            height // CHUNK_SIZE * CHUNK_SIZE, player_x, player_y)
+
+
+def parse_level(fullname: str) -> Level:
+    """ Разбор текстового файла уровня целиком в память
+
+    :param fullname: путь к файлу уровня
+    :return: уровень, в котором строки дополнены пустыми клетками ('.'), а
+    размеры обрезаны до целого числа чанков
+    """
+    # Читаем уровень, убирая символы перевода строки
+    level_map = list(_read_rows(fullname))
+    for player_y, row in enumerate(level_map):
+        player_x = row.find('@')
+        if player_x != -1:
+            break
+    else:
+        raise ValueError(f'На уровне {fullname} нет точки появления игрока')
+
+    # Ширина уровня, обрезанная до целого числа чанков
+    width = max(map(len, level_map)) // CHUNK_SIZE * CHUNK_SIZE
+    height = len(level_map) // CHUNK_SIZE * CHUNK_SIZE
+    tiles = np.empty((height, width), dtype=np.uint8)
+    for y in range(height):
+        tiles[y] = _row_codes(level_map[y], width)
+    return Level(tiles, player_x, player_y)
+
+
+def _glyphs_checksum() -> int:
+    """Контрольная сумма реестра тайлов (при его изменении все
+    скомпилированные уровни становятся недействительными)
+    """
+    return crc32(STATIC_CODES.tobytes() + ENTITY_CODES.tobytes(),
+                 crc32(LEVEL_GLYPHS.encode('utf8')))
+
+
+def _source_digest(fullname: str) -> bytes:
+    """Хэш содержимого исходного файла уровня"""
+    digest = blake2b(digest_size=16)
+    with open(fullname, 'rb') as source:
+        for block in iter(lambda: source.read(1 << 20), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def compile_level(source: str, fullname: str) -> None:
+    """ Компиляция текстового уровня построчно прямо в файл, так что уровень
+    любой ширины не нужно держать в памяти целиком
+
+    :param source: путь к исходному текстовому файлу
+    :param fullname: путь к скомпилированному файлу
+    """
+    width, height, player_x, player_y = _scan_level(source)
+    stat = os.stat(source)
+    # Пишем во временный файл и подменяем, чтобы не оставить битый кэш
+    temp_name = f'{fullname}.{os.getpid()}.tmp'
+    with open(temp_name, 'wb') as compiled:
+        compiled.truncate(_HEADER.size + width * height)
+    if width and height:
+        tiles = np.memmap(temp_name, np.uint8, 'r+', _HEADER.size,
+                          (height, width), order='F')
+        for y, row in zip(range(height), _read_rows(source)):
+            tiles[y] = _row_codes(row, width)
+        tiles.flush()
+    else:
+        tiles = np.empty((height, width), dtype=np.uint8)
+    entities, chunk_mask, layout_ids, layouts = level_metadata(tiles)
+    del tiles
+
+    with open(temp_name, 'r+b') as compiled:
+        compiled.write(_HEADER.pack(
+            COMPILED_LEVEL_MAGIC, COMPILED_LEVEL_VERSION, _glyphs_checksum(),
+            stat.st_mtime_ns, stat.st_size, _source_digest(source),
+            width, height, player_x, player_y, len(entities), len(layouts)
+        ))
+        compiled.seek(0, os.SEEK_END)
+        compiled.write(entities.astype('<i4').tobytes())
+        compiled.write(chunk_mask.astype(np.uint8).tobytes())
+        compiled.write(layout_ids.astype('<i4').tobytes())
+        compiled.write(layouts.tobytes())
+    os.replace(temp_name, fullname)
+
+
+def read_compiled_level(fullname: str, source: str):
+    """ Чтение скомпилированного уровня: данные об уровне читаются сразу, а
+    сетка тайлов отображается в память и читается по мере надобности
+
+    :param fullname: путь к скомпилированному файлу
+    :param source: путь к исходному текстовому файлу
+    :return: уровень или None, если файла нет или он устарел
+    """
+    try:
+        with open(fullname, 'rb') as compiled:
+            header = compiled.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return None
+            (magic, version, glyphs_checksum, mtime_ns, size, digest, width,
+             height, player_x, player_y, entities_amount,
+             layouts_amount) = _HEADER.unpack(header)
+            if magic != COMPILED_LEVEL_MAGIC or \
+                    version != COMPILED_LEVEL_VERSION or \
+                    glyphs_checksum != _glyphs_checksum():
+                return None
+            stat = os.stat(source)
+            # Время изменения могло поменяться без изменения содержимого
+            # (например, после git checkout), тогда сверяем хэш
+            touched = (mtime_ns, size) != (stat.st_mtime_ns, stat.st_size)
+            if touched and digest != _source_digest(source):
+                return None
+
+            level_x, level_y = width // CHUNK_SIZE, height // CHUNK_SIZE
+            compiled.seek(_HEADER.size + width * height)
+            entities = np.fromfile(compiled, '<i4', entities_amount * 3)
+            chunk_mask = np.fromfile(compiled, np.uint8, level_x * level_y)
+            layout_ids = np.fromfile(compiled, '<i4', level_x * level_y)
+            layouts = np.fromfile(compiled, np.uint8,
+                                  layouts_amount * CHUNK_SIZE * CHUNK_SIZE)
+            if compiled.read(1) or \
+                    len(layouts) != layouts_amount * CHUNK_SIZE * CHUNK_SIZE:
+                # Файл обрезан или испорчен
+                return None
+    except OSError:
+        return None
+
+    if touched:
+        _update_header_stat(fullname, stat)
+    if width and height:
+        tiles = np.memmap(fullname, np.uint8, 'r', _HEADER.size,
+                          (height, width), order='F')
+    else:
+        tiles = np.empty((height, width), dtype=np.uint8)
+    return Level(tiles, player_x, player_y, entities.reshape(-1, 3),
+                 chunk_mask.reshape(level_y, level_x).astype(bool),
+                 layout_ids.reshape(level_y, level_x),
+                 layouts.reshape(-1, CHUNK_SIZE, CHUNK_SIZE))
+
+
+def _update_header_stat(fullname: str, stat: os.stat_result) -> None:
+    """ Запись в заголовок скомпилированного уровня нового времени
+    изменения и размера исходника, чтобы при следующих загрузках не
+    считать его хэш заново
+
+    :param fullname: путь к скомпилированному файлу
+    :param stat: сведения об исходном текстовом файле
+    """
+    try:
+        with open(fullname, 'r+b') as compiled:
+            compiled.seek(_HEADER_STAT_OFFSET)
+            compiled.write(_HEADER_STAT.pack(stat.st_mtime_ns, stat.st_size))
+    except OSError:
+        # Кэш только для чтения - хэш просто будет считаться каждый раз
+        pass
+
+
+def load_level(filename: str,
+               directory=os.path.join('data', 'levels')) -> Level:
+    """ Загрузчик уровня: берём скомпилированный уровень, если он свежий,
+    иначе компилируем текстовый файл заново
+
+    :param filename: название файла, в котором лежит уровень
+    :key directory: папка с уровнями
+    :return: уровень
+    """
+    # Путь к файлу
+    fullname = os.path.join(directory, filename)
+    compiled_name = os.path.splitext(fullname)[0] + COMPILED_LEVEL_EXTENSION
+    level = read_compiled_level(compiled_name, fullname)
+    if level is None:
+        try:
+            compile_level(fullname, compiled_name)
+        except OSError:
+            # Папка только для чтения - просто разбираем текст в память
+            return parse_level(fullname)
+        level = read_compiled_level(compiled_name, fullname)
+    return level
@@ -0,0 +1,43 @@
+import numpy as np
+from pygame import Rect
+
+from constants import DIRECTION_RIGHT
+
+
+def watchers(grid, x: np.ndarray, y: np.ndarray, width: np.ndarray,
+             height: np.ndarray, direction: np.ndarray,
+             sight_range: np.ndarray, target: Rect) -> np.ndarray:
+    """ Какие враги видят цель. Враг смотрит по горизонтали на уровне
+    середины спрайта на sight_range пикселей в сторону, куда он повёрнут
+    (отсчёт идёт от правого края спрайта). Цель видна, если она пересекает
+    отрезок взгляда и между врагом и целью нет твёрдых клеток (стен и
+    коробок). Пересечение с отрезком проверяется сразу для всех врагов, и
+    луч по сетке пускается только для оставшихся
+
+    :param grid: сетка занятости уровня
+    :param x: координаты врагов по оси x
+    :param y: координаты врагов по оси y
+    :param width: ширины спрайтов врагов
+    :param height: высоты спрайтов врагов
+    :param direction: направления врагов
+    :param sight_range: дальность взгляда врагов
+    :param target: прямоугольник цели в координатах уровня
+    :return: массив флагов "враг видит цель"
+    """
+    eye_y = y + height // 2
+    origin = x + width
+    right = direction == DIRECTION_RIGHT
+    segment_left = np.where(right, origin, origin - sight_range)
+    segment_right = segment_left + sight_range
+    seen = (segment_left < target.right) & (segment_right > target.left) & \
+        (eye_y < target.bottom) & (eye_y + 1 > target.top)
+    # Луч идёт от начала взгляда до ближнего края цели (если цель уже у
+    # самого начала взгляда, между ними ничего нет)
+    start = np.where(right, segment_left, segment_right - 1)
+    distance = np.where(right, target.left - 1 - start, target.right - start)
+    close = np.where(right, distance < 0, distance > 0)
+    for index in np.flatnonzero(seen & ~close):
+        if grid.raycast_x(start[index], eye_y[index],
+                          distance[index]) is not None:
+            seen[index] = False
+    return seen
@@ -2,7 +2,6 @@ import os
 import sys
 from typing import Union, Optional
 
-import numpy as np
 import pygame
 import sqlite3
 
@@ -11,10 +10,16 @@ from dashboard import *
 
 from constants import *
 
-from chunk import Chunk
+from level_loader import Level, load_level
+from tile_types import load_tile_images, load_enemy_images
+from world import World
+from metrics import metrics
 from entities import Player
 from camera import Camera
-from bullets import Bullet
+from kinematics import BOTTOM, step, fall
+from timing import FixedTimestep, ticks
+from bullets import BulletPool
+from particles import ParticleSystem
 
 from menu import *
 
@@ -40,9 +45,6 @@ pygame.mixer.music.play(loops=-1)
 # Игрок
 player: Optional[Player] = None
 
-# Группа спрайтов пуль
-bullet_group: pygame.sprite.Group = pygame.sprite.Group()
-
 
 def load_image(filename: str) -> pygame.Surface:
     """ Загрузчик изображений
@@ -78,53 +80,21 @@ def load_sound(filename: str):
     return sound
 
 
-def grouper(iterable, n):
-    args = [iter(iterable)] * n
-    return zip(*args)
-
+def generate_level(level: Level) -> tuple:
+    """ Генерация уровня (сами чанки создаются миром по мере движения
+    камеры)
 
-def load_level(filename: str):
-    """ Загрузчик уровня из -txt файла
-
-    :param filename: название файла, в котором лежит уровень
-    :return: возвращаем уровень в виде списка, где каждый элемент - один
-    ряд уровня, где символами обозначены тайлы и противники с игроком
-    """
-    # Путь к файлу
-    fullname = os.path.join('data', 'levels', filename)
-    # Читаем уровень, убирая символы перевода строки
-    with open(fullname, 'r', encoding='utf8') as mapFile:
-        level_map = [line.strip() for line in mapFile]
-        for player_y, row in enumerate(level_map):
-            player_x = row.find('@')
-            if player_x != -1:
-                break
-
-    # И подсчитываем максимальную длину
-    max_width = max(map(len, level_map))
-
-    # Дополняем каждую строку пустыми клетками ('.')
-    level_map = list(map(lambda x: x.ljust(max_width, '.'), level_map))
-    return np.array(list(map(lambda x: [''.join(i) for i in grouper(x, 8)],
-                             level_map))), player_x, player_y
-
-
-def generate_level(level_map, player_x, player_y) -> tuple:
-    """ Генерация уровня
-
-    :return: (Player, int, int, list[Chunk])
+    :param level: загруженный уровень
+    :return: (Player, Group, int, int, World)
     """
     player_group = pygame.sprite.Group()
-    chunks = []
-    player = Player((player_group,), PLAYER_IMAGES, player_x, player_y)
-    level_x, level_y = len(level_map[0]), int(len(level_map) // 8)
-    for y1 in range(level_y):
-        for x1 in range(level_x):
-            chunks.append(Chunk(
-                TILE_IMAGES, ENEMY_IMAGES, x1, y1,
-                level_map[y1 * 8:(y1 + 1) * 8, x1:x1 + 1], level_x
-            ))
-    return player, player_group, level_x, level_y, chunks
+    player = Player((player_group,), PLAYER_IMAGES,
+                    level.player_x, level.player_y)
+    chunks = World(level, TILE_IMAGES, ENEMY_IMAGES,
+                   COINS_SHEETS, COIN_SELECTION_SOUND)
+    # Готовим чанки вокруг игрока заранее, чтобы первый кадр не тормозил
+    chunks.prepare(level.player_x // CHUNK_SIZE, level.player_y // CHUNK_SIZE)
+    return player, player_group, level.level_x, level.level_y, chunks
 
 
 def terminate() -> None:
@@ -176,6 +146,8 @@ def set_upgrade_menu():
 
 def continue_game():
     """Выход из паузы"""
+    # Время, проведённое на паузе, уровень не догоняет
+    timestep.reset()
     PAUSE_STOP_SOUND.play()
     pygame.mixer.music.load("data/sounds/main_saundtrack.mp3")
     pygame.mixer.music.play(loops=-1)
@@ -201,41 +173,21 @@ def quit_app():
     return (MAIN_MENU, pause, start, running)
 
 
-def chunks_on_screen(camera, player, level_x, level_y) -> list:
-    """Координаты чанков отрисованных на экране"""
-    x1 = int((camera.x - (7 - player.grid_x) * 50) // (8 * 50))
-    y1 = int((camera.y - (7 - player.grid_y) * 50) // (8 * 50))
-
-    x2 = int(((camera.x - (7 - player.grid_x) * 50) + WIDTH) // (8 * 50))
-    y2 = int(((camera.y - (7 - player.grid_y) * 50) + WIDTH) // (8 * 50))
-
-    x1 = min(max(x1, 0), level_x - 1)
-    x2 = min(max(x2, 0), level_x - 1)
-
-    y1 = min(max(y1, 0), level_y - 1)
-    y2 = min(max(y2, 0), level_y - 1)
-
-    result = []
-
-    for y in range(y1, y2 + 1):
-        for x in range(x1, x2 + 1):
-            result.append(x + y * level_x)
-
-    return result
-
-
 def start_game():
     """Запуск уровня"""
     pygame.mixer.music.load("data/sounds/main_saundtrack.mp3")
     pygame.mixer.music.play(loops=-1)
     # Игрок, размер уровня в ширину и в высоту, список чанков
     player, player_group, level_x, level_y, chunks = generate_level(
-        *load_level(f'level_{select_level_menu.current_level}.txt')
+        load_level(f'level_{select_level_menu.current_level}.txt')
     )
     # Экземпляр класса камеры
     camera = Camera(player)
     player.rect.x += camera.dx
     player.rect.y += camera.dy
+    # Видимые чанки нужны уже первому кадру, даже если до него не успеет
+    # пройти ни одного шага симуляции
+    chunks.update(camera)
     pause, start, running = False, True, True
     dashboard = Dashboard(
         [
@@ -372,62 +324,7 @@ ACTIVE_BUTTON_IMAGE = load_image('active_button_image.png')
 INACTIVE_BUTTON_IMAGE = load_image('inactive_button_image.png')
 
 # Изображения тайлов
-TILE_IMAGES = {
-    'l': load_image('land.png'),
-    '^': load_image('light_land.png'),
-    'd': load_image('dirt.png'),
-    'm': load_image('mixed_dirt.png'),
-    'L': load_image('light_dirt.png'),
-    'b': load_image('box.png'),
-    'B': load_image('shelter_box.png'),
-    's': load_image('shelter_floor.png'),
-    'w': load_image('shelter_wall.png'),
-    'D': load_image('down_shelter_floor.png'),
-    '!': load_image('reactor_image.png'),
-    '*': load_image('shelter_light.png'),
-    '#': load_image('shelter_small_door.png'),
-    '_': load_image('shelter_background_wall_1.png'),
-    '-': load_image('shelter_background_wall_2.png'),
-    '/': load_image('elevator_background_image.png'),
-    '0': load_image('infirmary_background_image_1.png'),
-    '1': load_image('infirmary_background_image_2.png'),
-    '2': load_image('infirmary_background_image_3.png'),
-    '3': load_image('infirmary_background_image_4.png'),
-    '4': load_image('infirmary_background_image_5.png'),
-    '5': load_image('elevator_background_image_1.png'),
-    '6': load_image('elevator_background_image_2.png'),
-    '7': load_image('elevator_background_image_3.png'),
-    '8': load_image('elevator_background_image_4.png'),
-    '9': load_image('elevator_background_image_5.png'),
-    'r': load_image('reactor_background_image_1.png'),
-    'а': load_image('corridor_background_image_1.png'),
-    'б': load_image('corridor_background_image_2.png'),
-    'в': load_image('corridor_background_image_3.png'),
-    'г': load_image('corridor_background_image_4.png'),
-    'д': load_image('corridor_background_image_5.png'),
-    'е': load_image('corridor_background_image_6.png'),
-    'ё': load_image('corridor_background_image_7.png'),
-    'ж': load_image('corridor_background_image_8.png'),
-    'з': load_image('corridor_background_image_9.png'),
-    'и': load_image('corridor_background_image_10.png'),
-    'й': load_image('storage_background_image_1.png'),
-    'к': load_image('storage_background_image_2.png'),
-    'л': load_image('storage_background_image_3.png'),
-    'м': load_image('storage_background_image_4.png'),
-    'н': load_image('storage_background_image_5.png'),
-    'о': load_image('storage_background_image_6.png'),
-    'п': load_image('storage_background_image_7.png'),
-    'р': load_image('storage_background_image_8.png'),
-    'с': load_image('storage_background_image_9.png'),
-    'т': load_image('storage_background_image_10.png'),
-    'у': load_image('water_treatment_plant_background_image_1.png'),
-    'ф': load_image('water_treatment_plant_background_image_2.png'),
-    'х': load_image('water_treatment_plant_background_image_3.png'),
-    'ц': load_image('water_treatment_plant_background_image_4.png'),
-    'ч': load_image('water_treatment_plant_background_image_5.png'),
-    'ш': load_image('water_treatment_plant_background_image_6.png'),
-    'щ': load_image('water_treatment_plant_background_image_7.png'),
-}
+TILE_IMAGES = load_tile_images(load_image)
 
 # Изображение главного меню игры
 MAIN_MENU_IMAGE = load_image('main_menu_image.png')
@@ -443,22 +340,13 @@ PLAYER_IMAGES = [load_image('artur_1.png'), load_image('artur_2.png'),
 # Изображение пули
 BULLET_IMAGE = load_image('bullet.png')
 # Изображения врагов
-ENEMY_IMAGES = [
-    [load_image('ordinary_enemy_image_1.png'),
-     load_image('ordinary_enemy_image_2.png'),
-     load_image('ordinary_enemy_image_3.png')],
-    [load_image('heavy_enemy_1.png'),
-     load_image('heavy_enemy_2.png'),
-     load_image('heavy_enemy_3.png')],
-    [load_image('armored_enemy_1.png'),
-     load_image('armored_enemy_2.png'),
-     load_image('armored_enemy_3.png')],
-    [load_image('marksman_enemy_1.png'),
-     load_image('marksman_enemy_2.png'),
-     load_image('marksman_enemy_3.png')]
-]
+ENEMY_IMAGES = load_enemy_images(load_image)
 # Изображение пули врага
 ENEMY_BULLET_IMAGE = load_image('enemy_bullet.png')
+# Пул снарядов
+bullet_pool = BulletPool(BULLET_IMAGE, ENEMY_BULLET_IMAGE)
+# Частицы эффектов попаданий и разрушений
+particles = ParticleSystem()
 # Звук подборам монет
 COIN_SELECTION_SOUND = load_sound('coin_selection.wav')
 # Звук выстрела
@@ -727,8 +615,8 @@ MENUS: dict[int, Union[Menu, GuideMenu, SelectLevelMenu]] = {
     PAUSE_MENU: pause_menu
 }
 
-# Массив чанков
-chunks = []
+# Мир с чанками уровня
+chunks: Optional[World] = None
 dashboard = None
 
 # Открываем главное меню
@@ -736,6 +624,11 @@ set_main_menu()
 
 # Кадры
 frame = 0
+# Шаги симуляции (для анимации)
+sim_frame = 0
+# Накопитель времени для шагов симуляции и время прошлого кадра
+timestep = FixedTimestep()
+frame_time = 0
 # Направление игрока
 direction = 0
 # Флаг проверки стоит ли игрок на земле
@@ -746,6 +639,7 @@ level_x, level_y = None, None
 
 # Игровой цикл
 while running:
+    metrics.start_frame()
 
     for event in pygame.event.get():
         # Выход из приложения
@@ -759,7 +653,7 @@ while running:
             # Кнопка прыжка
             if event.key == pygame.K_SPACE:
                 if on_ground:
-                    jump_counter = 20
+                    jump_counter = ticks(JUMP_TIME)
                     on_ground = False
             # Движение влево
             if event.key == pygame.K_a:
@@ -769,6 +663,9 @@ while running:
             if event.key == pygame.K_d:
                 direction = 2
                 player.direction = DIRECTION_RIGHT
+            # Показ метрик игрового цикла
+            if event.key == pygame.K_F3:
+                metrics.visible = not metrics.visible
             # Кнопка паузы
             if event.key == pygame.K_ESCAPE:
                 pause = not pause
@@ -798,7 +695,7 @@ while running:
                 if player.ammo != player.clip_size:
                     player.ammo = 0
                     RECHARGE_SOUND.play()
-                    player.recharge_timer = 120
+                    player.recharge_timer = ticks(RELOAD_TIME)
         # Кнопка мыши отжата и если это ЛКМ, стрельба прекращается
         if event.type == pygame.MOUSEBUTTONUP:
             if event.button == 1:
@@ -807,82 +704,66 @@ while running:
     if start:
         # Уровень не стоит на паузе
         if not pause:
-            # Выстрел если нет задержки стрельбы и есть патроны
-            if not player.timer:
-                if button_pushed and player.ammo:
-                    player.ammo -= 1
-                    # Определение направления и координаты пули
-                    if player.direction == DIRECTION_LEFT:
-                        x = player.x - BULLET_WIDTH
-                    else:
-                        x = player.x + player.rect.w + BULLET_WIDTH
-                    SHOT_SOUND.play()
-                    # Выпустить снаряд
-                    new_bul = Bullet(
-                        bullet_group, BULLET_IMAGE, player.direction,
-                        x,
-                        player.y + player.rect.h // 2 + 2,
-                        damage=player.damage
-                    )
-                    player.timer = player.shot_delay
-            # Уменьшаем таймер
-            else:
-                player.timer -= 1
-            # Проверка таймера перезарядки
-            if player.recharge_timer:
-                # отнимаем значение таймера
-                player.recharge_timer -= 1
-                # Если таймер вышел
-                if player.recharge_timer == 0:
-                    # восполняем обойму
-                    player.ammo = player.clip_size
-            # Перезарядка, если кончились патроны
-            elif not player.ammo:
-                RECHARGE_SOUND.play()
-                player.recharge_timer = 120
-
-            # Группа разрушаемых спрайтов
-            destructible_groups = pygame.sprite.Group()
-            # Группа не разрушаемых спрайтов
-            indestructible_groups = pygame.sprite.Group()
-            # Группа для определенно взятых спрайтов
-            target_group = pygame.sprite.Group()
-
-            # Пробегаемся по чанкам, которые отрисованы и формируем группы
-            # спрайтов
-            for chunk_idx in chunks_on_screen(
-                    camera, player, level_x, level_y
-            ):
-                destructible_groups.add(chunks[chunk_idx].boxes_group)
-                destructible_groups.add(chunks[chunk_idx].enemies_group)
-                indestructible_groups.add(chunks[chunk_idx].bricks_group)
-                target_group.add(chunks[chunk_idx].bricks_group)
-                target_group.add(chunks[chunk_idx].boxes_group)
-
-            virtual_surface.blit(BACKGROUND_IMAGE, (0, 0))
-            # Обновляем камеру
-            for chunk_idx in chunks_on_screen(
-                    camera, player, level_x, level_y
-            ):
-                # Перемещаем все спрайты
-                chunks[chunk_idx].render(
-                    virtual_surface, camera, frame, player_group,
+            # Симуляция идёт шагами постоянной длины: за кадр делается
+            # столько шагов, сколько их уместилось в прошедшее время
+            for _ in range(timestep.advance(frame_time)):
+                # Уровень закончился на прошлом шаге
+                if not start:
+                    break
+                camera.start_step()
+                # Выстрел если нет задержки стрельбы и есть патроны
+                if not player.timer:
+                    if button_pushed and player.ammo:
+                        player.ammo -= 1
+                        # Определение направления и координаты пули
+                        if player.direction == DIRECTION_LEFT:
+                            x = player.x - BULLET_WIDTH
+                        else:
+                            x = player.x + player.rect.w + BULLET_WIDTH
+                        SHOT_SOUND.play()
+                        # Выпустить снаряд
+                        bullet_pool.fire(
+                            player.direction, x,
+                            player.y + player.rect.h // 2 + 2,
+                            damage=player.damage
+                        )
+                        player.timer = player.shot_delay
+                # Уменьшаем таймер
+                else:
+                    player.timer -= 1
+                # Проверка таймера перезарядки
+                if player.recharge_timer:
+                    # отнимаем значение таймера
+                    player.recharge_timer -= 1
+                    # Если таймер вышел
+                    if player.recharge_timer == 0:
+                        # восполняем обойму
+                        player.ammo = player.clip_size
+                # Перезарядка, если кончились патроны
+                elif not player.ammo:
+                    RECHARGE_SOUND.play()
+                    player.recharge_timer = ticks(RELOAD_TIME)
+
+                # Подгружаем чанки рядом с камерой, выгружаем дальние и
+                # находим видимые
+                chunks.update(camera)
+                # Коробки и монеты видимых чанков
+                for chunk_idx in chunks.viewport.visible:
+                    chunks[chunk_idx].update(player_group, chunks)
+                # Враги видимых чанков и кольца ближних чанков
+                chunks.update_enemies(
+                    sim_frame, player_group,
                     [SHOT_SOUND, HEAVY_ENEMY_SHOT_SOUND,
                      ARMORED_ENEMY_SHOT_SOUND, MARKSMAN_ENEMY_SHOT_SOUND],
-                    bullet_group, target_group, ENEMY_BULLET_IMAGE
+                    bullet_pool
                 )
-            # Обновляем пули
-            for bullet in bullet_group:
-                # Если вернет True, в случае для уровней с реактором,
-                # то работает условие победы на уровне
-                if bullet.update(
-                        player, destructible_groups,
-                        indestructible_groups,
-                        [ENEMY_DESTROY_SOUND, BOX_DESTROY_SOUND],
+                # Обновляем пули. Если вернет True, в случае для уровней с
+                # реактором, то работает условие победы на уровне
+                if bullet_pool.update(
+                        player, [ENEMY_DESTROY_SOUND, BOX_DESTROY_SOUND],
                         [HIT_SOUND, SHIELD_HIT_SOUND],
-                        player_group, camera,
-                        virtual_surface, COINS_SHEETS, COIN_SELECTION_SOUND,
-                        chunks
+                        player_group, camera, COINS_SHEETS,
+                        COIN_SELECTION_SOUND, chunks, particles
                 ):
                     # Пополняем баланс монет за победу
                     player.coins += LEVELS_REWARD[
@@ -898,98 +779,76 @@ while running:
                     con.close()
                     # Открываем меню победы
                     current_menu, pause, start, running = set_victory_menu()
-            # Обновляем таймер щита игрока
-            if player.shield_recharge:
-                player.shield_recharge -= 1
-                # Таймер вышел
-                if player.shield_recharge <= 0:
-                    # Увеличиваем значение щита на 1
-                    player.shield += 1
-                    # Запускаем таймер восстановления щита, если их значение
-                    # неполное
-                    if player.shield != player.max_shield:
-                        player.shield_recharge = 150
-
-            # Проверяем хп игрока
-            for player in player_group:
-                # Хп все потрачено
-                if player.hp <= 0:
-                    current_menu, pause, start, running = set_endgame_menu()
-
-            # Отрисовка игрока
-            player_group.draw(virtual_surface)
-
-            # Проверка коллизии с группой спрайтов в чанке
-            player.check_collision_sides(target_group)
-            # Проверка направления движения
-            if direction == 1:
-                # Проверка на коллизию с объектами слева
-                if not any(
-                        (
-                                player.collide_list[4],
-                                (
-                                        not player.collide_list[7] and
-                                        player.collide_list[2]
-                                ),
-                                (
-                                        not player.collide_list[6] and
-                                        player.collide_list[0]
-                                )
-                        )
-                ):
+                particles.update()
+                # Обновляем таймер щита игрока
+                if player.shield_recharge:
+                    player.shield_recharge -= 1
+                    # Таймер вышел
+                    if player.shield_recharge <= 0:
+                        # Увеличиваем значение щита на 1
+                        player.shield += 1
+                        # Запускаем таймер восстановления щита, если их
+                        # значение неполное
+                        if player.shield != player.max_shield:
+                            player.shield_recharge = ticks(
+                                SHIELD_RECHARGE_TIME)
+
+                # Проверяем хп игрока
+                for player in player_group:
+                    # Хп все потрачено
+                    if player.hp <= 0:
+                        current_menu, pause, start, running = \
+                            set_endgame_menu()
+
+                # Проверка коллизии со стенами и коробками
+                contacts = player.check_collision_sides(chunks.grid)
+                # Сдвиг игрока по горизонтали, если в ту сторону ничего не
+                # мешает
+                if direction == 1:
+                    step_x, _ = step(contacts, -STEP, 0)
+                elif direction == 2:
+                    step_x, _ = step(contacts, STEP, 0)
+                else:
+                    step_x = 0
+                if step_x:
                     # Передвижение игрока и анимация движения
-                    camera.update(dx=-STEP)
-                    if jump_counter:
-                        player.current_image_idx = 2
-                    elif frame % 5 == 0:
-                        player.current_image_idx += 1
-                        if player.current_image_idx == len(PLAYER_IMAGES):
-                            player.current_image_idx = 0
-            elif direction == 2:
-                # Проверка на коллизию с объектами справа
-                if not any(
-                        (
-                                player.collide_list[5],
-                                (
-                                        not player.collide_list[7] and
-                                        player.collide_list[3]
-                                ),
-                                (
-                                        not player.collide_list[6] and
-                                        player.collide_list[1]
-                                )
-                        )
-                ):
-                    # Движение и анимация движения игрока
-                    camera.update(dx=STEP)
+                    camera.update(dx=step_x)
                     if jump_counter:
                         player.current_image_idx = 2
-                    elif frame % 5 == 0:
+                    elif sim_frame % 5 == 0:
                         player.current_image_idx += 1
                         if player.current_image_idx == len(PLAYER_IMAGES):
                             player.current_image_idx = 0
-            # Индекс изображения игрока сменяется на стоячего
-            else:
-                player.current_image_idx = 0
-            # Прыжок игрока
-            if jump_counter:
-                jump_counter -= 1
-                if not player.collide_list[6]:
-                    camera.update(dy=-10)
-            elif not player.collide_list[7]:
-                if player.collide_list[2]:
-                    dx = 1
-                elif player.collide_list[3]:
-                    dx = -1
+                # Индекс изображения игрока сменяется на стоячего
+                elif not direction:
+                    player.current_image_idx = 0
+                # Прыжок игрока
+                if jump_counter:
+                    jump_counter -= 1
+                    camera.update(*step(contacts, 0, -JUMP_STEP))
+                elif not contacts & BOTTOM:
+                    camera.update(*fall(contacts))
                 else:
-                    dx = 0
-                camera.update(dx, 5)
-            else:
-                on_ground = True
-            # Обновить интерфейс
-            dashboard.update(player)
-            # Отобразить интерфейс
-            dashboard.draw(virtual_surface)
+                    on_ground = True
+                # Шаги симуляции (для анимации)
+                sim_frame = (sim_frame + 1) % 5
+
+            # Камера отрисовывается между двумя последними шагами симуляции
+            view = camera.view(timestep.alpha)
+            visible_chunks = chunks.viewport.visible
+            # Задний фон рисуется только там, где его не закроют
+            # непрозрачные тайлы
+            for rect in chunks.background_rects(view, visible_chunks):
+                filled = virtual_surface.blit(BACKGROUND_IMAGE, rect, rect)
+                metrics.count('pixels_filled', filled.w * filled.h)
+            for chunk_idx in visible_chunks:
+                chunks[chunk_idx].draw(virtual_surface, view, chunks)
+            # Во сколько раз залитая фоном и статичными слоями площадь больше
+            # площади экрана
+            metrics.gauge('overdraw',
+                          metrics.current['pixels_filled'] / (WIDTH * HEIGHT))
+            bullet_pool.draw(virtual_surface, view)
+            particles.draw(virtual_surface, view)
             # Смена изображения игрока исходя из направления
             if player.direction == DIRECTION_RIGHT:
                 player.image = PLAYER_IMAGES[player.current_image_idx]
@@ -997,6 +856,14 @@ while running:
                 player.image = pygame.transform.flip(
                     PLAYER_IMAGES[player.current_image_idx], True, False
                 )
+            # Отрисовка игрока
+            player_group.draw(virtual_surface)
+            # Обновить интерфейс
+            dashboard.update(player)
+            # Отобразить интерфейс
+            dashboard.draw(virtual_surface)
+            # Метрики игрового цикла (по F3)
+            metrics.draw(virtual_surface)
         # Игра на паузе
         else:
             # Блюр фонового изображения
@@ -1034,6 +901,10 @@ while running:
                 camera = result[9]
                 dashboard = result[10]
                 MENUS[UPGRADE_MENU] = result[11]
+                # Время, проведённое в меню, уровень не догоняет
+                timestep.reset()
+                bullet_pool.clear()
+                particles.clear()
 
     # Координаты курсора мыши
     x, y = pygame.mouse.get_pos()
@@ -1047,8 +918,9 @@ while running:
     screen.blit(scaled_surface, (0, 0))
     # Отображение изображения на экран
     pygame.display.flip()
-    # Обновление таймера по FPS
-    clock.tick(FPS)
+    metrics.end_frame()
+    # Ограничение частоты кадров и время, прошедшее за кадр
+    frame_time = clock.tick(FPS)
 
     # Обновление кадров
     frame += 1
@@ -0,0 +1,108 @@
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Optional
+
+from pygame import Surface
+from pygame.font import Font, SysFont
+
+
+class FrameMetrics:
+    """Метрики игрового цикла: счётчики событий (пересборки групп,
+    подгрузка чанков и т.д.) за последний кадр и за всё время, а также
+    время обработки кадра. По F3 показываются поверх игры
+
+    """
+
+    def __init__(self) -> None:
+        # Счётчики за всё время
+        self.totals = Counter()
+        # Счётчики текущего кадра
+        self.current = Counter()
+        # Счётчики последнего завершённого кадра
+        self.last_frame = Counter()
+        # Величины, которые не суммируются, а измеряются за кадр
+        self.gauges = {}
+        # Время частей кадра в секундах (текущего и последнего кадра)
+        self.timings = Counter()
+        self.last_timings = Counter()
+        # Время обработки последнего кадра в секундах
+        self.frame_time = 0.0
+        # Показывать ли метрики поверх игры
+        self.visible = False
+        self._frame_start = perf_counter()
+        self._font: Optional[Font] = None
+
+    def count(self, name: str, amount=1) -> None:
+        """ Учёт события
+
+        :param name: название счётчика
+        :key amount: на сколько увеличить счётчик
+        """
+        self.totals[name] += amount
+        self.current[name] += amount
+
+    def gauge(self, name: str, value: float) -> None:
+        """ Запись величины, измеренной за кадр
+
+        :param name: название величины
+        :param value: значение
+        """
+        self.gauges[name] = value
+
+    @contextmanager
+    def timer(self, name: str):
+        """ Замер времени части кадра (время нескольких замеров с одним
+        названием за кадр складывается)
+
+        :param name: название замера
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += perf_counter() - start
+
+    def start_frame(self) -> None:
+        """Начало обработки кадра"""
+        self._frame_start = perf_counter()
+
+    def end_frame(self) -> None:
+        """Конец обработки кадра (до ожидания следующего кадра)"""
+        self.frame_time = perf_counter() - self._frame_start
+        self.last_frame = self.current
+        self.current = Counter()
+        self.last_timings = self.timings
+        self.timings = Counter()
+
+    def lines(self) -> list[str]:
+        """Строки с метриками для отображения"""
+        lines = [f'кадр: {self.frame_time * 1000:.2f} мс']
+        for name in sorted(self.gauges):
+            lines.append(f'{name}: {self.gauges[name]:.2f}')
+        for name in sorted(self.last_timings):
+            lines.append(f'{name}: {self.last_timings[name] * 1000:.2f} мс')
+        for name in sorted(self.totals):
+            lines.append(f'{name}: {self.last_frame[name]} '
+                         f'(всего {self.totals[name]})')
+        return lines
+
+    def draw(self, screen: Surface, pos_x=10, pos_y=160) -> None:
+        """ Отрисовка метрик поверх игры (если они включены)
+
+        :param screen: поверхность, на которой рисуются метрики
+        :key pos_x: координата левого края текста
+        :key pos_y: координата верхнего края текста
+        """
+        if not self.visible:
+            return
+        if self._font is None:
+            self._font = SysFont('bahnschrift', 18)
+        for line in self.lines():
+            text_surface = self._font.render(line, True, (255, 255, 255))
+            screen.blit(text_surface, (pos_x, pos_y))
+            pos_y += text_surface.get_height()
+
+
+# Метрики игры (общие для всех модулей)
+metrics = FrameMetrics()
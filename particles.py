@@ -0,0 +1,145 @@
+import numpy as np
+from pygame import Rect, Surface
+from pygame.surfarray import pixels3d
+
+from constants import DIRECTION_RIGHT, PARTICLE_LIMIT, PARTICLE_SIZE, \
+    PARTICLE_GRAVITY
+from metrics import metrics
+from timing import ticks
+
+# Цвета частиц (к каждой частице добавляется случайный оттенок)
+SPARK_COLOR = (255, 196, 64)
+BOX_DEBRIS_COLOR = (140, 96, 52)
+ENEMY_DEBRIS_COLOR = (180, 36, 36)
+# Насколько оттенок частицы отличается от цвета эффекта
+COLOR_JITTER = 40
+
+
+class ParticleSystem:
+    """Частицы эффектов (искры от попаданий, обломки коробок, гибель
+    врагов). Поля частиц - массивы NumPy постоянного размера: шаг
+    симуляции двигает все частицы сразу, а отрисовка записывает их цвета в
+    пиксели экрана одной операцией над массивом
+
+    """
+
+    def __init__(self, limit=PARTICLE_LIMIT, seed=None) -> None:
+        """
+        :key limit: сколько частиц может существовать одновременно (лишние
+        частицы эффекта не создаются)
+        :key seed: зерно генератора случайных чисел частиц
+        """
+        self.limit = limit
+        self.x = np.zeros(limit, dtype=np.float32)
+        self.y = np.zeros(limit, dtype=np.float32)
+        self.velocity_x = np.zeros(limit, dtype=np.float32)
+        self.velocity_y = np.zeros(limit, dtype=np.float32)
+        # Сколько шагов симуляции частице осталось жить
+        self.lifetime = np.zeros(limit, dtype=np.int32)
+        self.color = np.zeros((limit, 3), dtype=np.uint8)
+        # Свой генератор, чтобы эффекты не меняли случайные события игры
+        self.random = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.lifetime))
+
+    def clear(self) -> None:
+        """Удаление всех частиц (например, при запуске уровня)"""
+        self.lifetime[:] = 0
+
+    def emit(self, x: np.ndarray, y: np.ndarray, velocity_x: np.ndarray,
+             velocity_y: np.ndarray, lifetime: np.ndarray,
+             color: tuple) -> None:
+        """ Создание частиц
+
+        :param x: координаты частиц по оси x (в координатах уровня)
+        :param y: координаты частиц по оси y
+        :param velocity_x: скорости по оси x (пикселей за шаг)
+        :param velocity_y: скорости по оси y
+        :param lifetime: время жизни частиц в шагах симуляции
+        :param color: цвет эффекта
+        """
+        slots = np.flatnonzero(self.lifetime == 0)[:len(x)]
+        count = len(slots)
+        self.x[slots] = x[:count]
+        self.y[slots] = y[:count]
+        self.velocity_x[slots] = velocity_x[:count]
+        self.velocity_y[slots] = velocity_y[:count]
+        self.lifetime[slots] = lifetime[:count]
+        self.color[slots] = np.clip(
+            self.random.integers(-COLOR_JITTER, COLOR_JITTER + 1,
+                                 (count, 3)) + color, 0, 255
+        )
+        metrics.count('particles_emitted', count)
+
+    def sparks(self, x: int, y: int, direction: int, count=12) -> None:
+        """ Искры от попадания снаряда: летят назад, навстречу снаряду
+
+        :param x: точка попадания по оси x
+        :param y: точка попадания по оси y
+        :param direction: направление полёта снаряда
+        :key count: количество искр
+        """
+        back = -1 if direction == DIRECTION_RIGHT else 1
+        self.emit(
+            np.full(count, x), np.full(count, y),
+            back * self.random.uniform(1, 4, count),
+            self.random.uniform(-3, 1, count),
+            self.random.integers(ticks(0.15), ticks(0.35), count),
+            SPARK_COLOR
+        )
+
+    def debris(self, rect: Rect, color: tuple, count=40) -> None:
+        """ Обломки разрушенного объекта: разлетаются из его прямоугольника
+        вверх и в стороны
+
+        :param rect: прямоугольник объекта в координатах уровня
+        :param color: цвет обломков
+        :key count: количество обломков
+        """
+        self.emit(
+            self.random.uniform(rect.left, rect.right, count),
+            self.random.uniform(rect.top, rect.bottom, count),
+            self.random.uniform(-3, 3, count),
+            self.random.uniform(-6, -1, count),
+            self.random.integers(ticks(0.4), ticks(0.8), count),
+            color
+        )
+
+    def update(self) -> None:
+        """Шаг симуляции: движение частиц под действием тяжести"""
+        alive = self.lifetime > 0
+        self.velocity_y[alive] += PARTICLE_GRAVITY
+        self.x[alive] += self.velocity_x[alive]
+        self.y[alive] += self.velocity_y[alive]
+        self.lifetime[alive] -= 1
+
+    def draw(self, screen: Surface, camera) -> None:
+        """ Отрисовка частиц квадратами PARTICLE_SIZE x PARTICLE_SIZE
+        пикселей прямо в пиксели экрана. За шаг частица сдвигается ровно на
+        свою скорость, поэтому она рисуется между положениями до и после
+        шага
+
+        :param screen: поверхность для отрисовки
+        :param camera: положение камеры для отрисовки
+        """
+        width, height = screen.get_size()
+        alive = np.flatnonzero(self.lifetime)
+        if not len(alive):
+            return
+        lag = 1 - camera.alpha
+        screen_x = (self.x[alive] - self.velocity_x[alive] * lag -
+                    camera.x + camera.dx).astype(np.int32)
+        screen_y = (self.y[alive] - self.velocity_y[alive] * lag -
+                    camera.y + camera.dy).astype(np.int32)
+        on_screen = (screen_x >= 0) & (screen_x <= width - PARTICLE_SIZE) & \
+            (screen_y >= 0) & (screen_y <= height - PARTICLE_SIZE)
+        screen_x, screen_y = screen_x[on_screen], screen_y[on_screen]
+        color = self.color[alive[on_screen]]
+        metrics.count('particles_drawn', len(color))
+        pixels = pixels3d(screen)
+        for offset_x in range(PARTICLE_SIZE):
+            for offset_y in range(PARTICLE_SIZE):
+                pixels[screen_x + offset_x, screen_y + offset_y] = color
+        # Поверхность заблокирована, пока есть ссылка на её пиксели
+        del pixels
@@ -0,0 +1,111 @@
+from bisect import bisect_left, insort
+
+from pygame import Rect
+from pygame.sprite import Group, Sprite
+
+from constants import TILE_HEIGHT
+from spatial_hash import world_rect
+
+
+class RowIndex(Group):
+    """Группа спрайтов, разложенных по строкам тайлов в координатах уровня.
+    В каждой строке спрайты отсортированы по левому краю, поэтому поиск
+    столкновений - это один двоичный поиск в строке и проход по спрайтам,
+    которые начинаются не дальше правого края запроса. Подходит для
+    горизонтально летящих снарядов: их прямоугольник задевает одну-две
+    строки
+
+    Спрайт, убранный из группы (в том числе через kill), пропадает и из
+    строк. После перемещения спрайта нужно вызвать move
+
+    """
+
+    def __init__(self, *sprites, row_height=TILE_HEIGHT) -> None:
+        """
+        :param sprites: спрайты, которые сразу добавляются в группу
+        :key row_height: высота строки в пикселях
+        """
+        self.row_height = row_height
+        # Строка -> отсортированный список (левый край, номер добавления,
+        # спрайт)
+        self.rows = {}
+        # Спрайт -> (прямоугольник в координатах уровня, его строки)
+        self.placement = {}
+        # Спрайт -> порядковый номер добавления (результаты запросов
+        # возвращаются в порядке добавления спрайтов, как у обычной группы)
+        self.order = {}
+        self._counter = 0
+        # Самый широкий спрайт, который был в группе: пересекающий запрос
+        # спрайт начинается не левее, чем на эту ширину от запроса
+        self.max_width = 0
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite: Sprite, layer=None) -> None:
+        super().add_internal(sprite, layer)
+        self.order[sprite] = self._counter
+        self._counter += 1
+        self._place(sprite, world_rect(sprite))
+
+    def remove_internal(self, sprite: Sprite) -> None:
+        super().remove_internal(sprite)
+        self._unplace(sprite)
+        del self.order[sprite]
+
+    def move(self, sprite: Sprite) -> None:
+        """ Обновление положения спрайта по его текущим координатам
+
+        :param sprite: спрайт из этой группы
+        """
+        rect = world_rect(sprite)
+        if rect != self.placement[sprite][0]:
+            self._unplace(sprite)
+            self._place(sprite, rect)
+
+    def collide(self, rect: Rect) -> list:
+        """ Спрайты, пересекающие прямоугольник
+
+        :param rect: прямоугольник в координатах уровня
+        :return: список спрайтов в порядке их добавления в группу
+        """
+        # Левее этой границы начинаются только спрайты, которые кончаются
+        # до запроса
+        low = rect.left - self.max_width + 1
+        candidates = {}
+        for row in self._rows(rect):
+            entries = self.rows.get(row)
+            if not entries:
+                continue
+            for index in range(bisect_left(entries, (low,)), len(entries)):
+                left, _, sprite = entries[index]
+                if left >= rect.right:
+                    break
+                candidates[sprite] = None
+        hits = [sprite for sprite in candidates
+                if self.placement[sprite][0].colliderect(rect)]
+        if len(hits) > 1:
+            hits.sort(key=self.order.__getitem__)
+        return hits
+
+    def _rows(self, rect: Rect) -> range:
+        """Строки, которые задевает прямоугольник"""
+        return range(rect.top // self.row_height,
+                     (rect.bottom - 1) // self.row_height + 1)
+
+    def _place(self, sprite: Sprite, rect: Rect) -> None:
+        """Запись спрайта в строки"""
+        rows = self._rows(rect)
+        entry = (rect.left, self.order[sprite], sprite)
+        for row in rows:
+            insort(self.rows.setdefault(row, []), entry)
+        self.placement[sprite] = (rect, rows)
+        self.max_width = max(self.max_width, rect.w)
+
+    def _unplace(self, sprite: Sprite) -> None:
+        """Удаление спрайта из строк"""
+        rect, rows = self.placement.pop(sprite)
+        key = (rect.left, self.order[sprite])
+        for row in rows:
+            entries = self.rows[row]
+            del entries[bisect_left(entries, key)]
+            if not entries:
+                del self.rows[row]
@@ -0,0 +1,107 @@
+from pygame import Rect
+from pygame.sprite import Group, Sprite
+
+from constants import SPATIAL_HASH_CELL_SIZE
+from metrics import metrics
+
+
+def world_rect(sprite: Sprite) -> Rect:
+    """Прямоугольник спрайта в координатах уровня (а не экрана)"""
+    return Rect(sprite.x, sprite.y, sprite.rect.w, sprite.rect.h)
+
+
+class SpatialHash(Group):
+    """Группа спрайтов, разложенных по ячейкам равномерной сетки в
+    координатах уровня. Поиск столкновений смотрит только ячейки рядом с
+    прямоугольником запроса, поэтому его стоимость зависит от плотности
+    спрайтов рядом, а не от их общего количества
+
+    Спрайт, убранный из группы (в том числе через kill), пропадает и из
+    ячеек. После перемещения спрайта нужно вызвать move
+
+    """
+
+    def __init__(self, *sprites, cell_size=SPATIAL_HASH_CELL_SIZE) -> None:
+        """
+        :param sprites: спрайты, которые сразу добавляются в группу
+        :key cell_size: размер ячейки в пикселях
+        """
+        self.cell_size = cell_size
+        # Ячейка (x, y) -> спрайты в ней (словарь сохраняет порядок)
+        self.cells = {}
+        # Спрайт -> (прямоугольник в координатах уровня, его ячейки)
+        self.placement = {}
+        # Спрайт -> порядковый номер добавления (результаты запросов
+        # возвращаются в порядке добавления спрайтов, как у обычной группы)
+        self.order = {}
+        self._counter = 0
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite: Sprite, layer=None) -> None:
+        super().add_internal(sprite, layer)
+        self.order[sprite] = self._counter
+        self._counter += 1
+        self._place(sprite, world_rect(sprite))
+
+    def remove_internal(self, sprite: Sprite) -> None:
+        super().remove_internal(sprite)
+        del self.order[sprite]
+        self._unplace(sprite)
+
+    def move(self, sprite: Sprite) -> None:
+        """ Обновление положения спрайта по его текущим координатам
+
+        :param sprite: спрайт из этой группы
+        """
+        rect = world_rect(sprite)
+        placed_rect, keys = self.placement[sprite]
+        if rect == placed_rect:
+            return
+        if self._keys(rect) == keys:
+            self.placement[sprite] = (rect, keys)
+        else:
+            self._unplace(sprite)
+            self._place(sprite, rect)
+            metrics.count('spatial_hash_moves')
+
+    def collide(self, rect: Rect) -> list:
+        """ Спрайты, пересекающие прямоугольник
+
+        :param rect: прямоугольник в координатах уровня
+        :return: список спрайтов в порядке их добавления в группу
+        """
+        candidates = {}
+        for key in self._keys(rect):
+            cell = self.cells.get(key)
+            if cell:
+                candidates.update(cell)
+        hits = [sprite for sprite in candidates
+                if self.placement[sprite][0].colliderect(rect)]
+        if len(hits) > 1:
+            hits.sort(key=self.order.__getitem__)
+        return hits
+
+    def _keys(self, rect: Rect) -> tuple:
+        """Ячейки, которые задевает прямоугольник"""
+        size = self.cell_size
+        return tuple(
+            (x, y)
+            for x in range(rect.left // size, (rect.right - 1) // size + 1)
+            for y in range(rect.top // size, (rect.bottom - 1) // size + 1)
+        )
+
+    def _place(self, sprite: Sprite, rect: Rect) -> None:
+        """Запись спрайта в ячейки"""
+        keys = self._keys(rect)
+        for key in keys:
+            self.cells.setdefault(key, {})[sprite] = None
+        self.placement[sprite] = (rect, keys)
+
+    def _unplace(self, sprite: Sprite) -> None:
+        """Удаление спрайта из ячеек"""
+        _, keys = self.placement.pop(sprite)
+        for key in keys:
+            cell = self.cells[key]
+            del cell[sprite]
+            if not cell:
+                del self.cells[key]
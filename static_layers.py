@@ -0,0 +1,193 @@
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from pygame import Surface, SRCALPHA, RLEACCEL, Rect
+from pygame.display import get_surface
+from pygame.mask import from_surface
+
+from collision import merge_tiles
+from constants import TILE_WIDTH, TILE_HEIGHT, STATIC_LAYER_MEMORY_LIMIT
+from level_loader import ChunkLayout
+
+
+def opaque_codes(tile_images: list) -> frozenset:
+    """ Коды тайлов, изображения которых непрозрачны целиком (всё, что
+    под ними, не видно)
+
+    :param tile_images: изображения всех тайлов (индекс - код тайла)
+    """
+    return frozenset(
+        code for code, image in enumerate(tile_images)
+        if image is not None and from_surface(image, 254).count() ==
+        image.get_width() * image.get_height()
+    )
+
+
+def _cells(rect: Rect, origin: Rect, inner: bool) -> tuple[slice, slice]:
+    """ Клетки сетки поверхности слоя, которые задевает прямоугольник
+    (inner - только клетки, лежащие в нём целиком)
+    """
+    left, top = rect.left - origin.left, rect.top - origin.top
+    right, bottom = left + rect.w, top + rect.h
+    if inner:
+        return (slice(-(-top // TILE_HEIGHT), bottom // TILE_HEIGHT),
+                slice(-(-left // TILE_WIDTH), right // TILE_WIDTH))
+    return (slice(top // TILE_HEIGHT, -(-bottom // TILE_HEIGHT)),
+            slice(left // TILE_WIDTH, -(-right // TILE_WIDTH)))
+
+
+def bake_static_layer(
+        chunk_map: np.ndarray, tile_images: list, layers: tuple,
+        opaque=frozenset()
+) -> Optional[tuple[Surface, tuple[int, int], list[Rect]]]:
+    """ Отрисовка статичных тайлов чанка в одну поверхность. Тайлы,
+    целиком закрытые непрозрачными тайлами, которые рисуются позже, не
+    рисуются вовсе
+
+    :param chunk_map: коды тайлов чанка
+    :param tile_images: изображения всех тайлов (индекс - код тайла)
+    :param layers: наборы кодов тайлов в порядке отрисовки (слои)
+    :key opaque: коды непрозрачных тайлов
+    :return: (поверхность, смещение поверхности относительно левого верхнего
+    угла чанка, непрозрачные прямоугольники относительно того же угла) или
+    None, если статичных тайлов в чанке нет
+    """
+    placed = []
+    for codes in layers:
+        for y, row in enumerate(chunk_map.tolist()):
+            for x, code in enumerate(row):
+                if code in codes:
+                    image = tile_images[code]
+                    placed.append((code, image, image.get_rect().move(
+                        x * TILE_WIDTH, y * TILE_HEIGHT
+                    )))
+    if not placed:
+        return None
+
+    # Большие изображения (например, фоны комнат) могут выходить за
+    # границы чанка, поэтому поверхность охватывает все тайлы целиком
+    bounds = placed[0][2].unionall([rect for _, _, rect in placed[1:]])
+    # Идём от последних тайлов к первым и отмечаем клетки, закрытые
+    # непрозрачными тайлами: тайл, все клетки которого уже закрыты, не виден
+    covered = np.zeros((-(-bounds.h // TILE_HEIGHT),
+                        -(-bounds.w // TILE_WIDTH)), dtype=bool)
+    visible = []
+    for code, image, rect in reversed(placed):
+        if covered[_cells(rect, bounds, inner=False)].all():
+            continue
+        visible.append((image, rect.move(-bounds.x, -bounds.y)))
+        if code in opaque:
+            covered[_cells(rect, bounds, inner=True)] = True
+    visible.reverse()
+
+    surface = Surface(bounds.size, SRCALPHA)
+    surface.blits(visible, doreturn=False)
+    opaque_rects = [
+        Rect(bounds.x + x * TILE_WIDTH, bounds.y + y * TILE_HEIGHT,
+             width * TILE_WIDTH, height * TILE_HEIGHT)
+        for x, y, width, height in merge_tiles(covered)
+    ]
+    return surface, bounds.topleft, opaque_rects
+
+
+def finish_static_layer(layer):
+    """ Приведение поверхности слоя к формату экрана и включение
+    RLE-сжатия: прозрачные промежутки между тайлами тогда почти ничего не
+    стоят при отрисовке. Формат берётся у окна, поэтому это делается только
+    в главном потоке
+
+    :param layer: (поверхность, смещение, непрозрачные прямоугольники) или
+    None
+    :return: слой с подготовленной поверхностью
+    """
+    if layer is None:
+        return None
+    surface, offset, opaque_rects = layer
+    if get_surface() is not None:
+        surface = surface.convert_alpha()
+    surface.set_alpha(255, RLEACCEL)
+    return surface, offset, opaque_rects
+
+
+class StaticLayerCache:
+    """Кэш заранее отрисованных статичных слоёв чанков. Когда кэш занимает
+    больше заданного объёма памяти, выбрасываются слои, которые дольше всего
+    не отрисовывались
+
+    """
+
+    def __init__(self, tile_images: list, layers: tuple,
+                 memory_limit=STATIC_LAYER_MEMORY_LIMIT) -> None:
+        """
+        :param tile_images: изображения всех тайлов (индекс - код тайла)
+        :param layers: наборы кодов статичных тайлов в порядке отрисовки
+        :key memory_limit: сколько байт могут занимать все слои вместе
+        """
+        self.tile_images = tile_images
+        self.layers = layers
+        # Непрозрачные тайлы (по альфа-каналу изображений)
+        self.opaque = opaque_codes(tile_images)
+        self.memory_limit = memory_limit
+        # Номер раскладки -> (поверхность, смещение, непрозрачные
+        # прямоугольники); порядок - от давно использованных к недавним
+        self.surfaces = OrderedDict()
+        # Сколько байт занимают слои в кэше
+        self.memory_used = 0
+
+    def __len__(self) -> int:
+        return len(self.surfaces)
+
+    def __contains__(self, layout: ChunkLayout) -> bool:
+        return layout.number in self.surfaces
+
+    def get(self, layout: ChunkLayout):
+        """ Статичный слой раскладки чанка (если его нет в кэше - он
+        отрисовывается). Одинаковые чанки делят один и тот же слой
+
+        :param layout: статичная раскладка чанка
+        :return: (поверхность, смещение, непрозрачные прямоугольники) или
+        None для чанка без статичных тайлов
+        """
+        if layout.number in self.surfaces:
+            self.surfaces.move_to_end(layout.number)
+            return self.surfaces[layout.number]
+        return self.put(layout, self.bake(layout))
+
+    def bake(self, layout: ChunkLayout):
+        """ Отрисовка статичного слоя раскладки без записи в кэш (можно
+        вызывать из рабочих потоков). Поверхность слоя приводится к формату
+        экрана уже при записи в кэш
+
+        :param layout: статичная раскладка чанка
+        :return: (поверхность, смещение, непрозрачные прямоугольники) или
+        None
+        """
+        return bake_static_layer(layout.tiles, self.tile_images, self.layers,
+                                 self.opaque)
+
+    def put(self, layout: ChunkLayout, layer):
+        """ Запись отрисованного слоя в кэш (только из главного потока)
+
+        :param layout: статичная раскладка чанка
+        :param layer: (поверхность, смещение, непрозрачные прямоугольники)
+        или None
+        :return: слой в том виде, в котором он лежит в кэше
+        """
+        layer = finish_static_layer(layer)
+        self.surfaces[layout.number] = layer
+        self.memory_used += self._layer_size(layer)
+        # Выбрасываем самые старые слои, кроме только что отрисованного
+        while self.memory_used > self.memory_limit and len(self.surfaces) > 1:
+            _, old_layer = self.surfaces.popitem(last=False)
+            self.memory_used -= self._layer_size(old_layer)
+        return layer
+
+    @staticmethod
+    def _layer_size(layer) -> int:
+        """Сколько байт занимает слой"""
+        if layer is None:
+            return 0
+        surface = layer[0]
+        return surface.get_bytesize() * surface.get_width() * \
+            surface.get_height()
@@ -0,0 +1,163 @@
+from types import SimpleNamespace
+
+import numpy as np
+from pygame import Rect, Surface
+
+from bullets import BulletPool
+from collision import OccupancyGrid, WALL
+from constants import DIRECTION_LEFT, DIRECTION_RIGHT, BULLET_SPEED, \
+    TILE_WIDTH, TILE_HEIGHT
+from enemy_store import EnemyStore
+
+# Размеры снаряда и врага в пикселях (как у изображений игры)
+BULLET_WIDTH, BULLET_HEIGHT = 20, 5
+ENEMY_SIZE = TILE_WIDTH - 1
+# Высота полёта снарядов (средняя строка клеток)
+BULLET_Y = TILE_HEIGHT + 10
+# Стена толщиной в одну клетку
+WALL_COLUMN = 5
+# Скорость больше клетки: за шаг снаряд перелетает стену целиком
+FAST = 3 * TILE_WIDTH
+SILENT = SimpleNamespace(play=lambda: None)
+
+
+class Targets:
+    """Коробки или враги уровня: отдаёт спрайты, которые пересекает путь
+    снаряда (в обратном порядке, чтобы проверить сортировку по пути)
+    """
+
+    def __init__(self, sprites=()) -> None:
+        self.sprites = list(sprites)
+
+    def collide(self, rect: Rect) -> list:
+        return [sprite for sprite in reversed(self.sprites)
+                if sprite.rect.colliderect(rect)]
+
+
+class Particles:
+    """Частицы, которые только запоминают, где летели искры"""
+
+    def __init__(self) -> None:
+        self.sparks_x = []
+
+    def sparks(self, x: int, y: int, direction: int) -> None:
+        self.sparks_x.append(x)
+
+
+def make_enemy(store: EnemyStore, x: int) -> SimpleNamespace:
+    """Враг на высоте полёта снарядов"""
+    enemy = SimpleNamespace(x=x, y=TILE_HEIGHT + 1, type=0, hp=3,
+                            direction=DIRECTION_LEFT, is_key_object=False)
+    enemy.rect = Rect(enemy.x, enemy.y, ENEMY_SIZE, ENEMY_SIZE)
+    slot = store.allocate(enemy)
+    store.x[slot], store.y[slot] = enemy.x, enemy.y
+    store.width[slot] = store.height[slot] = ENEMY_SIZE
+    return enemy
+
+
+def make_world(enemies_x=()) -> SimpleNamespace:
+    """Поле 10 x 3 клеток со стеной в средней строке и врагами"""
+    cells = np.zeros((3, 10), dtype=np.uint8)
+    cells[1, WALL_COLUMN] = WALL
+    store = EnemyStore()
+    enemies = [make_enemy(store, x) for x in enemies_x]
+    return SimpleNamespace(grid=OccupancyGrid(cells), enemy_store=store,
+                           boxes=Targets(), enemies=Targets(enemies))
+
+
+def make_pool() -> BulletPool:
+    image = Surface((BULLET_WIDTH, BULLET_HEIGHT))
+    return BulletPool(image, image, capacity=4)
+
+
+def step(pool: BulletPool, world, particles: Particles) -> None:
+    """Шаг симуляции снарядов без игрока на поле"""
+    camera = SimpleNamespace(x=0, y=0, dx=0, dy=0)
+    pool.update(SimpleNamespace(damage=1), [SILENT] * 2, [SILENT] * 2, [],
+                camera, [], SILENT, world, particles)
+
+
+def test_path_covers_whole_step() -> None:
+    pool = make_pool()
+    right = pool.fire(DIRECTION_RIGHT, 200, BULLET_Y)
+    left = pool.fire(DIRECTION_LEFT, 320, BULLET_Y)
+    pool.velocity[right], pool.velocity[left] = FAST, -FAST
+    active = np.array([right, left])
+    pool.x[active] += pool.velocity[active]
+    path_left, top, path_right, bottom = pool._paths(active)
+    # Путь начинается от переднего края снаряда до шага
+    assert path_left.tolist() == [200 + BULLET_WIDTH, 320 - FAST]
+    assert path_right.tolist() == [200 + FAST + BULLET_WIDTH, 320]
+    assert top.tolist() == [BULLET_Y] * 2
+    assert bottom.tolist() == [BULLET_Y + BULLET_HEIGHT] * 2
+
+    # Медленный снаряд проверяется по своему текущему положению
+    pool.velocity[right] = 5
+    pool.x[right] = 500
+    path_left, _, path_right, _ = pool._paths(np.array([right]))
+    assert path_left.tolist() == [500]
+    assert path_right.tolist() == [500 + BULLET_WIDTH]
+
+
+def test_bullet_stops_at_wall_at_full_speed() -> None:
+    world = make_world()
+    particles = Particles()
+    pool = make_pool()
+    slot = pool.fire(DIRECTION_RIGHT, 100, BULLET_Y)
+    assert pool.velocity[slot] == BULLET_SPEED
+    while pool.alive[slot]:
+        step(pool, world, particles)
+    assert particles.sparks_x == [WALL_COLUMN * TILE_WIDTH]
+    assert pool.x[slot] + BULLET_WIDTH <= \
+        WALL_COLUMN * TILE_WIDTH + BULLET_SPEED
+
+
+def test_fast_bullet_does_not_tunnel_through_wall() -> None:
+    world = make_world()
+    particles = Particles()
+    pool = make_pool()
+    right = pool.fire(DIRECTION_RIGHT, 200, BULLET_Y)
+    left = pool.fire(DIRECTION_LEFT, 320, BULLET_Y)
+    pool.velocity[right], pool.velocity[left] = FAST, -FAST
+    step(pool, world, particles)
+    # Оба снаряда за шаг оказались по другую сторону стены, но попали в
+    # неё: каждый в ту грань, к которой летел
+    assert pool.x[right] > (WALL_COLUMN + 1) * TILE_WIDTH
+    assert pool.x[left] + BULLET_WIDTH < WALL_COLUMN * TILE_WIDTH
+    assert not pool.alive[right] and not pool.alive[left]
+    assert particles.sparks_x == [WALL_COLUMN * TILE_WIDTH,
+                                  (WALL_COLUMN + 1) * TILE_WIDTH - 1]
+
+
+def test_nearest_enemy_is_hit_first() -> None:
+    world = make_world(enemies_x=(120, 180))
+    near, far = world.enemies.sprites
+    particles = Particles()
+    pool = make_pool()
+    slot = pool.fire(DIRECTION_RIGHT, 60, BULLET_Y)
+    pool.velocity[slot] = FAST
+    step(pool, world, particles)
+    assert not pool.alive[slot]
+    assert (near.hp, far.hp) == (2, 3)
+    assert particles.sparks_x == [near.x]
+
+    # Летящий влево снаряд первым задевает правого врага
+    particles = Particles()
+    slot = pool.fire(DIRECTION_LEFT, 230, BULLET_Y)
+    pool.velocity[slot] = -FAST
+    step(pool, world, particles)
+    assert (near.hp, far.hp) == (2, 2)
+    assert particles.sparks_x == [far.x + ENEMY_SIZE - 1]
+
+
+def test_wall_shields_enemy_behind_it() -> None:
+    world = make_world(enemies_x=((WALL_COLUMN + 1) * TILE_WIDTH + 10,))
+    enemy, = world.enemies.sprites
+    particles = Particles()
+    pool = make_pool()
+    slot = pool.fire(DIRECTION_RIGHT, 200, BULLET_Y)
+    pool.velocity[slot] = FAST
+    step(pool, world, particles)
+    assert not pool.alive[slot]
+    assert enemy.hp == 3
+    assert particles.sparks_x == [WALL_COLUMN * TILE_WIDTH]
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from collision import OccupancyGrid, WALL, BOX
+from constants import TILE_WIDTH, TILE_HEIGHT
+
+
+def make_grid() -> OccupancyGrid:
+    """Поле 10 x 3 клеток: пол в нижней строке, коробка в столбце 2 и
+    стена в столбце 6 средней строки, потолок над столбцом 4
+    """
+    cells = np.zeros((3, 10), dtype=np.uint8)
+    cells[2] = WALL
+    cells[1, 2] = BOX
+    cells[1, 6] = WALL
+    cells[0, 4] = WALL
+    return OccupancyGrid(cells)
+
+
+def make_box(column: int, y: int) -> SimpleNamespace:
+    """Коробка в столбце column на высоте y (в пикселях)"""
+    return SimpleNamespace(grid_x=column, y=y)
+
+
+def test_raycast_x_stops_at_first_solid_cell() -> None:
+    grid = make_grid()
+    y = TILE_HEIGHT + TILE_HEIGHT // 2
+    # Вправо луч упирается в левый край стены
+    assert grid.raycast_x(160, y, 200) == 6 * TILE_WIDTH
+    assert grid.raycast_x(160, y, 100) is None
+    # Влево - в правый край коробки
+    assert grid.raycast_x(160, y, -100) == 3 * TILE_WIDTH - 1
+    assert grid.raycast_x(160, y, -100, mask=WALL) is None
+    # Луч из твёрдой клетки упирается сразу в своё начало
+    assert grid.raycast_x(310, y, 50) == 310
+    # Вне уровня твёрдых клеток нет
+    assert grid.raycast_x(0, -10, 100) is None
+
+
+def test_raycast_y_stops_at_first_solid_cell() -> None:
+    grid = make_grid()
+    x = 4 * TILE_WIDTH + TILE_WIDTH // 2
+    # Вниз луч упирается в верх пола, вверх - в низ потолка
+    assert grid.raycast_y(x, 60, 100) == 2 * TILE_HEIGHT
+    assert grid.raycast_y(x, 90, -100) == TILE_HEIGHT - 1
+    assert grid.raycast_y(x, 60, 20) is None
+    # Над столбцом без потолка луч уходит за верх уровня
+    assert grid.raycast_y(x + TILE_WIDTH, 90, -100) is None
+    assert grid.raycast_y(-5, 0, 100) is None
+
+
+def test_remove_box_clears_its_cell() -> None:
+    grid = make_grid()
+    grid.remove_box(make_box(2, TILE_HEIGHT))
+    assert not grid.is_solid(2, 1)
+    # Стены флаг коробки не трогает
+    grid.remove_box(make_box(6, TILE_HEIGHT))
+    assert grid.cells[1, 6] == WALL
+
+
+def test_move_box_follows_box_centre() -> None:
+    grid = make_grid()
+    box = make_box(2, TILE_HEIGHT)
+    # Пока центр коробки в той же строке, флаг остаётся на месте
+    box.y = TILE_HEIGHT + TILE_HEIGHT // 2 - 1
+    grid.move_box(box, TILE_HEIGHT)
+    assert grid.cells[1, 2] == BOX
+    box.y, old_y = TILE_HEIGHT + TILE_HEIGHT // 2, box.y
+    grid.move_box(box, old_y)
+    assert grid.cells[1, 2] == 0
+    # Флаг стены в новой клетке сохраняется
+    assert grid.cells[2, 2] == WALL | BOX
+    # Коробка упала за низ уровня - флаг просто снимается
+    box.y, old_y = 3 * TILE_HEIGHT, box.y
+    grid.move_box(box, old_y)
+    assert not (grid.cells & BOX).any()
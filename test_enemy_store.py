@@ -0,0 +1,93 @@
+import numpy as np
+
+from collision import OccupancyGrid, WALL
+from constants import DIRECTION_LEFT, DIRECTION_RIGHT, TILE_WIDTH, \
+    TILE_HEIGHT
+from enemy_store import EnemyStore
+
+# Размеры врага в пикселях
+WIDTH, HEIGHT = 40, 60
+# Враг стоит на полу (утоплен в него на пиксель)
+FLOOR_Y = 3 * TILE_HEIGHT - HEIGHT + 1
+
+
+def make_grid(gaps=()) -> OccupancyGrid:
+    """Комната 10 x 4 клеток: стены по краям и пол в нижней строке
+    (gaps - столбцы без пола)
+    """
+    cells = np.zeros((4, 10), dtype=np.uint8)
+    cells[3] = WALL
+    cells[3, list(gaps)] = 0
+    cells[:3, 0] = WALL
+    cells[:3, 9] = WALL
+    return OccupancyGrid(cells)
+
+
+def add_enemy(store: EnemyStore, x: int, direction=DIRECTION_RIGHT) -> int:
+    """Патрулирующий враг на полу комнаты"""
+    slot = store.allocate(object())
+    store.x[slot], store.y[slot] = x, FLOOR_Y
+    store.width[slot], store.height[slot] = WIDTH, HEIGHT
+    store.speed[slot] = 1
+    store.direction[slot] = direction
+    store.max_distance[slot] = 150
+    store.is_shoot[slot] = True
+    return slot
+
+
+def test_span_is_charted_from_grid() -> None:
+    store = EnemyStore()
+    slot = add_enemy(store, 200)
+    store.survey(np.array([slot]), make_grid())
+    # Слева стена, справа - предел max_distance
+    assert store.span_left[slot] == TILE_WIDTH
+    assert store.span_right[slot] == 350
+    assert store.span_y[slot] == FLOOR_Y
+
+    store = EnemyStore()
+    slot = add_enemy(store, 200)
+    store.survey(np.array([slot]), make_grid(gaps=[6]))
+    # Враг не заходит за край пола
+    assert store.span_right[slot] == 6 * TILE_WIDTH - WIDTH
+
+
+def test_coast_moves_enemy_and_counts_down_timers() -> None:
+    store = EnemyStore()
+    walker = add_enemy(store, 200)
+    alert = add_enemy(store, 300)
+    store.attack_player[alert] = True
+    store.speed[alert] = 0
+    store.attack_timer[alert] = 3
+    active = np.array([walker, alert])
+    store.survey(active, make_grid())
+
+    store.coast(active)
+    assert store.x[walker] == 201
+    assert store.moved[walker]
+    assert store.attack_timer[alert] == 2
+    assert store.x[alert] == 300
+
+    store.coast(active)
+    store.coast(active)
+    # Время атаки вышло - враг снова патрулирует
+    assert store.attack_timer[alert] == 0
+    assert not store.attack_player[alert]
+    assert store.speed[alert] == 1
+
+
+def test_coast_turns_at_span_edge() -> None:
+    store = EnemyStore()
+    slot = add_enemy(store, 345)
+    active = np.array([slot])
+    store.survey(active, make_grid(gaps=[8]))
+    right = int(store.span_right[slot])
+    positions = []
+    for _ in range(20):
+        store.coast(active)
+        positions.append(int(store.x[slot]))
+    assert max(positions) == right
+    # У края промежутка враг разворачивается и идёт обратно
+    assert store.direction[slot] == DIRECTION_LEFT
+    assert positions[-1] == right - (20 - (right - 345))
+    # Путь считается от разворота
+    assert store.distance[slot] == right - positions[-1]
@@ -0,0 +1,120 @@
+import numpy as np
+from pygame import Rect
+
+from collision import OccupancyGrid, WALL
+from constants import TILE_WIDTH, TILE_HEIGHT, FALL_STEP
+from kinematics import TOP_LEFT, TOP_RIGHT, BOTTOM_LEFT, BOTTOM_RIGHT, \
+    LEFT, RIGHT, TOP, BOTTOM, contacts, contacts_array, blocked, \
+    blocked_array, step, fall, fall_array
+
+# Размер сущности в пикселях (как у спрайтов игры)
+SIZE = TILE_WIDTH - 1
+# Сущность стоит на полу (утоплена в него на пиксель)
+FLOOR_Y = 3 * TILE_HEIGHT - SIZE
+# Все маски касаний
+ALL_FLAGS = np.arange(256)
+
+
+def make_grid() -> OccupancyGrid:
+    """Комната 10 x 4 клеток: стены по краям, пол в нижней строке и
+    ступенька в столбце 5
+    """
+    cells = np.zeros((4, 10), dtype=np.uint8)
+    cells[3] = WALL
+    cells[2, 5] = WALL
+    cells[:3, 0] = WALL
+    cells[:3, 9] = WALL
+    return OccupancyGrid(cells)
+
+
+def legacy_contacts(grid: OccupancyGrid, rect: Rect) -> list[bool]:
+    """Точки касаний, как их проверяла сущность до маски флагов"""
+    return [grid.point(*point) for point in (
+        rect.topleft, rect.topright, rect.bottomleft, rect.bottomright,
+        rect.midleft, rect.midright, rect.midtop, rect.midbottom
+    )]
+
+
+def to_list(flags: int) -> list[bool]:
+    """Маска касаний в виде списка в порядке legacy_contacts"""
+    return [bool(flags & 1 << bit) for bit in range(8)]
+
+
+def test_contacts_on_floor_wall_and_step() -> None:
+    grid = make_grid()
+    # На полу в середине комнаты
+    assert contacts(grid, Rect(100, FLOOR_Y, SIZE, SIZE)) == \
+        BOTTOM_LEFT | BOTTOM_RIGHT | BOTTOM
+    # Вплотную к правой стене: правые точки уже за прямоугольником
+    assert contacts(grid, Rect(9 * TILE_WIDTH - SIZE, FLOOR_Y, SIZE,
+                               SIZE)) == \
+        TOP_RIGHT | BOTTOM_LEFT | BOTTOM_RIGHT | RIGHT | BOTTOM
+    # Левые точки лежат на самом прямоугольнике: левую стену сущность
+    # касается, только зайдя в неё на пиксель
+    assert contacts(grid, Rect(TILE_WIDTH, FLOOR_Y, SIZE, SIZE)) == \
+        BOTTOM_LEFT | BOTTOM_RIGHT | BOTTOM
+    assert contacts(grid, Rect(TILE_WIDTH - 1, FLOOR_Y, SIZE, SIZE)) == \
+        TOP_LEFT | BOTTOM_LEFT | BOTTOM_RIGHT | LEFT | BOTTOM
+    # Правый нижний угол зашёл на ступеньку
+    assert contacts(grid, Rect(5 * TILE_WIDTH - 30, 2 * TILE_HEIGHT - 40,
+                               SIZE, SIZE)) == BOTTOM_RIGHT
+    # В воздухе касаний нет
+    assert contacts(grid, Rect(100, 10, SIZE, SIZE)) == 0
+
+
+def test_contacts_match_legacy_points() -> None:
+    grid = make_grid()
+    rects = [Rect(x, y, SIZE, SIZE)
+             for x in range(0, 10 * TILE_WIDTH, 7)
+             for y in range(-10, 3 * TILE_HEIGHT, 3)]
+    flags = [contacts(grid, rect) for rect in rects]
+    for rect, mask in zip(rects, flags):
+        assert to_list(mask) == legacy_contacts(grid, rect)
+    # Массовый вариант даёт те же маски
+    xs = np.array([rect.x for rect in rects])
+    ys = np.array([rect.y for rect in rects])
+    size = np.full(len(rects), SIZE)
+    assert contacts_array(grid, xs, ys, size, size).tolist() == flags
+
+
+def test_blocked_matches_legacy_branches() -> None:
+    for flags in ALL_FLAGS.tolist():
+        side = to_list(flags)
+        left = side[4] or not side[7] and side[2] or not side[6] and side[0]
+        right = side[5] or not side[7] and side[3] or not side[6] and side[1]
+        assert blocked(flags, -1) == left
+        assert blocked(flags, 1) == right
+    assert blocked_array(ALL_FLAGS, -1).tolist() == \
+        [blocked(flags, -1) for flags in ALL_FLAGS.tolist()]
+    assert blocked_array(ALL_FLAGS, 1, head=False).tolist() == \
+        [blocked(flags, 1, head=False) for flags in ALL_FLAGS.tolist()]
+
+
+def test_step_resolves_axes_separately() -> None:
+    # Стена сбоку не мешает прыжку, потолок не мешает шагу
+    assert step(RIGHT, 5, -10) == (0, -10)
+    assert step(TOP, 5, -10) == (5, 0)
+    assert step(BOTTOM, -5, 5) == (-5, 0)
+    # На ступеньку можно зайти, только стоя на полу
+    assert step(BOTTOM_RIGHT, 5, 0) == (0, 0)
+    assert step(BOTTOM_RIGHT | BOTTOM, 5, 0) == (5, 0)
+    # Угол на уровне головы мешает, только если его учитывают
+    assert step(TOP_LEFT, -5, 0) == (0, 0)
+    assert step(TOP_LEFT, -5, 0, head=False) == (-5, 0)
+
+
+def test_fall_slides_off_ledge_corner() -> None:
+    for flags in ALL_FLAGS.tolist():
+        side = to_list(flags)
+        if side[7]:
+            expected = 0, 0
+        elif side[2]:
+            expected = 1, FALL_STEP
+        elif side[3]:
+            expected = -1, FALL_STEP
+        else:
+            expected = 0, FALL_STEP
+        assert fall(flags) == expected
+    dx, dy = fall_array(ALL_FLAGS)
+    assert list(zip(dx.tolist(), dy.tolist())) == \
+        [fall(flags) for flags in ALL_FLAGS.tolist()]
@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+
+import level_loader
+from constants import CHUNK_SIZE
+from level_loader import COMPILED_LEVEL_EXTENSION, compile_level, \
+    read_compiled_level, load_level, parse_level
+
+# Уровень в два чанка шириной: игрок, враг и пол
+ROWS = ['.' * 2 * CHUNK_SIZE] * (CHUNK_SIZE - 3) + [
+    '..@', '.' * 10 + 'O', 's' * 2 * CHUNK_SIZE
+]
+
+
+def make_level(tmp_path) -> tuple[str, str]:
+    """Текстовый уровень и путь к его скомпилированному файлу"""
+    source = tmp_path / 'level.txt'
+    source.write_text('\n'.join(ROWS), encoding='utf8')
+    return str(source), str(tmp_path / f'level{COMPILED_LEVEL_EXTENSION}')
+
+
+def count_digests(monkeypatch) -> list:
+    """Подсчёт того, сколько раз считался хэш исходника"""
+    calls = []
+    digest = level_loader._source_digest
+
+    def counted(fullname: str) -> bytes:
+        calls.append(fullname)
+        return digest(fullname)
+
+    monkeypatch.setattr(level_loader, '_source_digest', counted)
+    return calls
+
+
+def assert_same_level(level, expected) -> None:
+    assert np.array_equal(level.tiles, expected.tiles)
+    assert (level.player_x, level.player_y) == \
+        (expected.player_x, expected.player_y)
+    assert np.array_equal(level.entities, expected.entities)
+    assert np.array_equal(level.layout_ids, expected.layout_ids)
+
+
+def test_compiled_level_matches_parsed(tmp_path, monkeypatch) -> None:
+    source, compiled = make_level(tmp_path)
+    compile_level(source, compiled)
+    calls = count_digests(monkeypatch)
+    assert_same_level(read_compiled_level(compiled, source),
+                      parse_level(source))
+    # Исходник не трогали - хэш не считается
+    assert calls == []
+
+
+def test_touched_source_refreshes_header_stat(tmp_path, monkeypatch) -> None:
+    source, compiled = make_level(tmp_path)
+    compile_level(source, compiled)
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    calls = count_digests(monkeypatch)
+    # Время изменилось, а содержимое нет: кэш годится после сверки хэша
+    assert_same_level(read_compiled_level(compiled, source),
+                      parse_level(source))
+    assert len(calls) == 1
+    # Новое время записано в заголовок, и хэш больше не считается
+    assert read_compiled_level(compiled, source) is not None
+    assert len(calls) == 1
+
+
+def test_changed_source_invalidates_cache(tmp_path) -> None:
+    source, compiled = make_level(tmp_path)
+    compile_level(source, compiled)
+    stat = os.stat(source)
+    # Размер тот же, но время новое - хэш сверяется и не совпадает
+    with open(source, 'r+b') as changed:
+        changed.seek(0)
+        changed.write(b'@')
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert read_compiled_level(compiled, source) is None
+    # Изменился размер исходника
+    with open(source, 'a', encoding='utf8') as changed:
+        changed.write('\n' + 's' * 2 * CHUNK_SIZE)
+    compile_level(source, compiled)
+    with open(source, 'a', encoding='utf8') as changed:
+        changed.write('.')
+    assert read_compiled_level(compiled, source) is None
+
+
+def test_glyphs_change_invalidates_cache(tmp_path, monkeypatch) -> None:
+    source, compiled = make_level(tmp_path)
+    compile_level(source, compiled)
+    checksum = level_loader._glyphs_checksum()
+    monkeypatch.setattr(level_loader, '_glyphs_checksum',
+                        lambda: checksum + 1)
+    assert read_compiled_level(compiled, source) is None
+
+
+def test_corrupt_cache_is_rejected(tmp_path) -> None:
+    source, compiled = make_level(tmp_path)
+    assert read_compiled_level(compiled, source) is None
+    compile_level(source, compiled)
+    with open(compiled, 'rb') as cache:
+        data = cache.read()
+    for broken in (data[:10], data[:-1], data + b'\0', b'XXXX' + data[4:]):
+        with open(compiled, 'wb') as cache:
+            cache.write(broken)
+        assert read_compiled_level(compiled, source) is None
+
+
+def test_load_level_recompiles_or_parses(tmp_path, monkeypatch) -> None:
+    source, compiled = make_level(tmp_path)
+    with open(compiled, 'wb') as cache:
+        cache.write(b'WLVL')
+    # Испорченный кэш компилируется заново
+    assert_same_level(load_level('level.txt', str(tmp_path)),
+                      parse_level(source))
+    assert read_compiled_level(compiled, source) is not None
+
+    # Кэш записать нельзя - уровень разбирается прямо из текста
+    def read_only(source: str, fullname: str) -> None:
+        raise PermissionError(fullname)
+
+    os.remove(compiled)
+    monkeypatch.setattr(level_loader, 'compile_level', read_only)
+    level = load_level('level.txt', str(tmp_path))
+    assert_same_level(level, parse_level(source))
+    assert not os.path.exists(compiled)
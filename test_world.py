@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+from pygame import Rect, Surface, SRCALPHA
+
+from camera import Camera
+from constants import CHUNK_SIZE, TILE_WIDTH, TILE_HEIGHT
+from level_loader import parse_level
+from tile_types import load_tile_images, load_enemy_images
+from world import World
+
+# Длина уровня в чанках
+LEVEL_CHUNKS = 12
+# Столбец клеток, где стоит патрулирующий враг
+ENEMY_COLUMN = 9 * CHUNK_SIZE + 4
+
+
+def make_world(tmp_path) -> World:
+    """Коридор в один чанк высотой: пол во всю длину, игрок слева и
+    патрулирующий враг далеко справа
+    """
+    width = LEVEL_CHUNKS * CHUNK_SIZE
+    rows = ['.' * width for _ in range(CHUNK_SIZE)]
+    rows[5] = '..@'
+    rows[6] = '.' * ENEMY_COLUMN + 'O'
+    rows[7] = 's' * width
+    level_file = tmp_path / 'level.txt'
+    level_file.write_text('\n'.join(rows), encoding='utf8')
+    # Враги размером с клетку, как в игре (появившись, враг уже стоит на
+    # полу)
+    enemy_images = load_enemy_images(
+        lambda name: Surface((TILE_WIDTH - 1, TILE_HEIGHT - 1), SRCALPHA)
+    )
+    tile_images = load_tile_images(
+        lambda name: Surface((TILE_WIDTH, TILE_HEIGHT), SRCALPHA)
+    )
+    return World(parse_level(str(level_file)), tile_images, enemy_images,
+                 [], None, workers=0)
+
+
+def make_camera(x: int) -> Camera:
+    """Камера, центр экрана которой стоит на координате x уровня"""
+    target = SimpleNamespace(rect=Rect(x - 24, 5 * TILE_HEIGHT, 48, 98),
+                             x=0, y=0)
+    return Camera(target)
+
+
+def test_near_ring_is_loaded_and_simulated(tmp_path) -> None:
+    world = make_world(tmp_path)
+    enemy_chunk = ENEMY_COLUMN // CHUNK_SIZE
+    # Центр экрана в конце чанка, который на 3 левее чанка врага: видимые
+    # чанки доходят до соседнего с врагом, и чанк врага попадает в кольцо,
+    # хотя он дальше радиуса подгрузки
+    camera = make_camera((enemy_chunk - 2) * CHUNK_SIZE * TILE_WIDTH - 1)
+    world.update(camera)
+    assert enemy_chunk - 1 in world.viewport.visible
+    assert enemy_chunk in world.viewport.near
+    assert enemy_chunk in world.loaded
+    enemy, = world.loaded[enemy_chunk].enemies_group
+    spawn_x = enemy.x
+    for frame in range(30):
+        world.update(camera)
+        world.update_enemies(frame, [], [], None)
+    assert enemy.x != spawn_x
+
+
+def test_enemy_moves_before_it_enters_the_view(tmp_path) -> None:
+    world = make_world(tmp_path)
+    camera = make_camera(2 * TILE_WIDTH)
+    enemy_chunk = ENEMY_COLUMN // CHUNK_SIZE
+    spawn_x = None
+    frame = 0
+    while enemy_chunk not in world.viewport.visible:
+        world.update(camera)
+        assert all(number in world.loaded for number in world.viewport.near)
+        if enemy_chunk in world.loaded and spawn_x is None:
+            enemy, = world.loaded[enemy_chunk].enemies_group
+            spawn_x = enemy.x
+            # Враг подгружается в кольце вокруг экрана, а не на экране
+            assert enemy_chunk in world.viewport.near
+        world.update_enemies(frame, [], [], None)
+        camera.update(dx=4)
+        frame += 1
+    assert spawn_x is not None
+    # Пока враг был рядом с экраном, он патрулировал
+    assert enemy.x != spawn_x
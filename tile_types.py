@@ -0,0 +1,208 @@
+from typing import Optional
+
+import numpy as np
+
+from tiles import Box
+from entities import Enemy, HeavyEnemy, ArmoredEnemy, MarksmanEnemy
+
+# Слои статичных тайлов в порядке отрисовки
+BACKGROUND_LAYER = 0
+WALL_LAYER = 1
+
+
+class TileType:
+    """Тип тайла карты: символ, класс спрайта, группа чанка, здоровье и
+    изображение. Код тайла - номер типа в реестре TILE_TYPES
+
+    """
+    __slots__ = ('code', 'glyph', 'tile_class', 'group', 'hp', 'image',
+                 'enemy_type', 'layer', 'solid', 'options')
+
+    def __init__(self, glyph: str, tile_class=None, group=None,
+                 hp: Optional[int] = None, image: Optional[str] = None,
+                 enemy_type: Optional[int] = None,
+                 layer: Optional[int] = None, solid=False,
+                 **options) -> None:
+        """
+        :param glyph: символ тайла в текстовой карте уровня
+        :key tile_class: класс спрайта, который создаётся для тайла (None -
+        спрайт не нужен)
+        :key group: название группы чанка, куда попадает спрайт
+        :key hp: здоровье (для разрушаемых тайлов)
+        :key image: название файла изображения тайла
+        :key enemy_type: номер набора изображений врага
+        :key layer: статичный слой, в котором отрисовывается тайл (None -
+        тайл не статичный)
+        :key solid: твёрдый ли тайл (сквозь него нельзя пройти)
+        :key options: дополнительные аргументы для класса спрайта
+        """
+        # Код заполняется при сборке реестра
+        self.code = None
+        self.glyph = glyph
+        self.tile_class = tile_class
+        self.group = group
+        self.hp = hp
+        self.image = image
+        self.enemy_type = enemy_type
+        self.layer = layer
+        self.solid = solid
+        self.options = options
+        if hp is not None:
+            self.options['max_hp'] = hp
+
+
+def _wall(glyph: str, image: str) -> TileType:
+    """Неразрушаемая стена или пол. Спрайты стен создаются не для каждого
+    тайла, а для слитых прямоугольников статичной раскладки чанка
+    """
+    return TileType(glyph, image=image, layer=WALL_LAYER, solid=True)
+
+
+def _background(glyph: str, image: str) -> TileType:
+    """Фантомный тайл (задний фон и украшения)"""
+    return TileType(glyph, image=image, layer=BACKGROUND_LAYER)
+
+
+def _enemy(glyph: str, enemy_class, enemy_type: int,
+           is_static: bool) -> TileType:
+    """Враг (маленькая буква - стоит на месте, большая - патрулирует)"""
+    return TileType(glyph, enemy_class, 'enemies_group',
+                    enemy_type=enemy_type, is_static=is_static)
+
+
+# Реестр типов тайлов. Порядок задаёт коды тайлов в скомпилированных
+# уровнях, поэтому новые типы добавляются только в конец
+TILE_TYPES = (
+    TileType('.'),
+    TileType('@'),
+    _wall('w', 'shelter_wall.png'),
+    _wall('s', 'shelter_floor.png'),
+    _wall('l', 'land.png'),
+    _wall('d', 'dirt.png'),
+    _wall('L', 'light_dirt.png'),
+    _wall('^', 'light_land.png'),
+    _wall('D', 'down_shelter_floor.png'),
+    _background('#', 'shelter_small_door.png'),
+    _background('_', 'shelter_background_wall_1.png'),
+    _background('-', 'shelter_background_wall_2.png'),
+    _background('*', 'shelter_light.png'),
+    _background('/', 'elevator_background_image.png'),
+    _background('0', 'infirmary_background_image_1.png'),
+    _background('1', 'infirmary_background_image_2.png'),
+    _background('2', 'infirmary_background_image_3.png'),
+    _background('3', 'infirmary_background_image_4.png'),
+    _background('4', 'infirmary_background_image_5.png'),
+    _background('5', 'elevator_background_image_1.png'),
+    _background('6', 'elevator_background_image_2.png'),
+    _background('7', 'elevator_background_image_3.png'),
+    _background('8', 'elevator_background_image_4.png'),
+    _background('9', 'elevator_background_image_5.png'),
+    _background('r', 'reactor_background_image_1.png'),
+    _background('а', 'corridor_background_image_1.png'),
+    _background('б', 'corridor_background_image_2.png'),
+    _background('в', 'corridor_background_image_3.png'),
+    _background('г', 'corridor_background_image_4.png'),
+    _background('д', 'corridor_background_image_5.png'),
+    _background('е', 'corridor_background_image_6.png'),
+    _background('ё', 'corridor_background_image_7.png'),
+    _background('ж', 'corridor_background_image_8.png'),
+    _background('з', 'corridor_background_image_9.png'),
+    _background('и', 'corridor_background_image_10.png'),
+    _background('й', 'storage_background_image_1.png'),
+    _background('к', 'storage_background_image_2.png'),
+    _background('л', 'storage_background_image_3.png'),
+    _background('м', 'storage_background_image_4.png'),
+    _background('н', 'storage_background_image_5.png'),
+    _background('о', 'storage_background_image_6.png'),
+    _background('п', 'storage_background_image_7.png'),
+    _background('р', 'storage_background_image_8.png'),
+    _background('с', 'storage_background_image_9.png'),
+    _background('т', 'storage_background_image_10.png'),
+    _background('у', 'water_treatment_plant_background_image_1.png'),
+    _background('ф', 'water_treatment_plant_background_image_2.png'),
+    _background('х', 'water_treatment_plant_background_image_3.png'),
+    _background('ц', 'water_treatment_plant_background_image_4.png'),
+    _background('ч', 'water_treatment_plant_background_image_5.png'),
+    _background('ш', 'water_treatment_plant_background_image_6.png'),
+    _background('щ', 'water_treatment_plant_background_image_7.png'),
+    TileType('b', Box, 'boxes_group', hp=5, image='box.png', solid=True),
+    TileType('B', Box, 'boxes_group', hp=5, image='shelter_box.png',
+             solid=True),
+    TileType('!', Box, 'boxes_group', hp=10, image='reactor_image.png',
+             solid=True, is_key_object=True),
+    _enemy('o', Enemy, 0, is_static=True),
+    _enemy('O', Enemy, 0, is_static=False),
+    _enemy('h', HeavyEnemy, 1, is_static=True),
+    _enemy('H', HeavyEnemy, 1, is_static=False),
+    _enemy('a', ArmoredEnemy, 2, is_static=True),
+    _enemy('A', ArmoredEnemy, 2, is_static=False),
+    _enemy('m', MarksmanEnemy, 3, is_static=True),
+    _enemy('M', MarksmanEnemy, 3, is_static=False),
+)
+for _code, _tile_type in enumerate(TILE_TYPES):
+    _tile_type.code = _code
+
+# Символы карты уровня. Индекс символа в этой строке - код тайла
+LEVEL_GLYPHS = ''.join(tile_type.glyph for tile_type in TILE_TYPES)
+# Тип тайла по символу карты
+TILE_TYPES_BY_GLYPH = {tile_type.glyph: tile_type for tile_type in TILE_TYPES}
+
+# Код пустой клетки
+EMPTY_CODE = TILE_TYPES_BY_GLYPH['.'].code
+# Код клетки появления игрока
+PLAYER_CODE = TILE_TYPES_BY_GLYPH['@'].code
+
+
+def _codes(predicate) -> np.ndarray:
+    """Коды всех типов тайлов, подходящих под условие"""
+    return np.array([tile_type.code for tile_type in TILE_TYPES
+                     if predicate(tile_type)], dtype=np.uint8)
+
+
+# Коды неразрушаемых тайлов (стены и пол)
+WALL_CODES = _codes(lambda tile_type: tile_type.layer == WALL_LAYER)
+# Коды фантомных тайлов (задний фон и украшения)
+BACKGROUND_CODES = _codes(
+    lambda tile_type: tile_type.layer == BACKGROUND_LAYER
+)
+# Коды статичных тайлов (они никогда не двигаются и не меняются)
+STATIC_CODES = _codes(lambda tile_type: tile_type.layer is not None)
+# Коды динамических объектов (коробки и враги)
+ENTITY_CODES = _codes(lambda tile_type: tile_type.tile_class is not None)
+# Коды твёрдых тайлов (с ними сталкиваются игрок, враги и пули)
+SOLID_CODES = _codes(lambda tile_type: tile_type.solid)
+# Коды статичных тайлов по слоям в порядке отрисовки (сначала фон, затем
+# стены)
+STATIC_LAYERS = (frozenset(BACKGROUND_CODES.tolist()),
+                 frozenset(WALL_CODES.tolist()))
+
+
+# Кадры анимации врагов по номеру набора изображений (enemy_type)
+ENEMY_IMAGE_FILES = (
+    ('ordinary_enemy_image_1.png', 'ordinary_enemy_image_2.png',
+     'ordinary_enemy_image_3.png'),
+    ('heavy_enemy_1.png', 'heavy_enemy_2.png', 'heavy_enemy_3.png'),
+    ('armored_enemy_1.png', 'armored_enemy_2.png', 'armored_enemy_3.png'),
+    ('marksman_enemy_1.png', 'marksman_enemy_2.png', 'marksman_enemy_3.png')
+)
+
+
+def load_tile_images(load_image) -> list:
+    """ Загрузка изображений тайлов
+
+    :param load_image: функция загрузки изображения по названию файла
+    :return: список изображений, где индекс - код тайла (None для тайлов
+    без изображения)
+    """
+    return [load_image(tile_type.image) if tile_type.image else None
+            for tile_type in TILE_TYPES]
+
+
+def load_enemy_images(load_image) -> list:
+    """ Загрузка изображений врагов
+
+    :param load_image: функция загрузки изображения по названию файла
+    :return: список наборов кадров, где индекс - номер набора (enemy_type)
+    """
+    return [[load_image(filename) for filename in filenames]
+            for filenames in ENEMY_IMAGE_FILES]
@@ -1,7 +1,7 @@
 from pygame.sprite import Sprite, Group
 
 from constants import TILE_WIDTH, TILE_HEIGHT, KEY_OBJECT_HEALTH_SCALE_WIDTH, \
-    KEY_OBJECT_HEALTH_SCALE_HEIGTH, KEY_OBJECT_HEALTH_SCALE_BORDER
+    KEY_OBJECT_HEALTH_SCALE_HEIGTH, KEY_OBJECT_HEALTH_SCALE_BORDER, FALL_STEP
 from pygame.draw import rect
 from pygame import Rect
 
@@ -29,42 +29,13 @@ class Tile(Sprite):
         # Координаты
         self.x = self.rect.x
         self.y = self.rect.y
+        # Координаты блока в сетке (в тайлах)
+        self.grid_x = pos_x
+        self.grid_y = pos_y
         # Номер чанка
         self.chunk_number = chunk_number
 
 
-class PhantomTile(Tile):
-    """ Блок фантомного спрайта """
-
-    def __init__(self, tiles_group: Group, all_sprites: Group, image,
-                 pos_x: int, pos_y: int, chunk_number) -> None:
-        """
-        :param tiles_group: Группа, в которую будет добавлен текущий блок
-        :param all_sprites: Все спрайты
-        :param pos_x: позиция по оси x
-        :param pos_y: позиция по оси y
-        """
-        super().__init__(tiles_group, all_sprites, image, pos_x, pos_y,
-                         chunk_number)
-
-
-class Wall(Tile):
-    """ Блок кирпичной стены """
-
-    def __init__(self, tiles_group:Group, all_sprites: Group,
-                 image, pos_x: int, pos_y: int, chunk_number: int) -> None:
-        """
-        :param tiles_group: Группа, в которую будет добавлен текущий блок
-        :param all_sprites: Все спрайты
-        :param image: Название изображения
-        :param pos_x: позиция по оси x
-        :param pos_y: позиция по оси y
-        :param chunk_number: чаек объекта
-        """
-        super().__init__(tiles_group, all_sprites, image, pos_x, pos_y,
-                         chunk_number)
-
-
 class Box(Tile):
     """ Блок с коробкой """
 
@@ -90,16 +61,22 @@ class Box(Tile):
         self.hp = self.max_hp
         # Координаты по оси
         self.y += 1
+        # Лежит ли коробка на опоре (такие коробки не проверяются, пока
+        # опору не разрушат)
+        self.resting = False
+
+    def pin_to_ground(self, grid) -> bool:
+        """ Падение на землю
 
-    def pin_to_ground(self, sprite_group):
-        """Падение на землю"""
-        for sprite in sprite_group:
-            if sprite != self:
-                if sprite.rect.collidepoint(self.rect.midbottom):
-                    break
+        :param grid: сетка занятости уровня
+        :return: лежит ли коробка на опоре
+        """
+        if grid.supports_box(self):
+            self.resting = True
         else:
-            self.y += 5
-            self.rect.y += 5
+            self.y += FALL_STEP
+            self.rect.y += FALL_STEP
+        return self.resting
 
     def draw_health_scale(self, screen, x, y):
         """Отрисовка шкалы здоровья"""
@@ -0,0 +1,59 @@
+from constants import SIMULATION_RATE, MAX_SIMULATION_STEPS
+
+
+def ticks(seconds: float) -> int:
+    """ Сколько шагов симуляции длится промежуток времени. Таймеры задаются
+    в секундах, а отсчитываются шагами симуляции
+
+    :param seconds: время в секундах
+    :return: число шагов (не меньше одного для ненулевого времени)
+    """
+    if not seconds:
+        return 0
+    return max(round(seconds * SIMULATION_RATE), 1)
+
+
+class FixedTimestep:
+    """Накопитель времени для симуляции с постоянным шагом. Каждый кадр в
+    него добавляется время, прошедшее с прошлого кадра, а он говорит,
+    сколько шагов симуляции за это время прошло. Остаток (доля шага) нужен
+    отрисовке, чтобы сгладить движение камеры между шагами
+
+    """
+
+    def __init__(self, rate=SIMULATION_RATE,
+                 max_steps=MAX_SIMULATION_STEPS) -> None:
+        """
+        :key rate: частота шагов симуляции (в секунду)
+        :key max_steps: наибольшее число шагов за один кадр
+        """
+        self.rate = rate
+        self.max_steps = max_steps
+        # Накопленное время в тысячных долях шага (миллисекунды, умноженные
+        # на частоту), чтобы не накапливать ошибку округления
+        self.accumulator = 0
+
+    def reset(self) -> None:
+        """Сброс накопленного времени (при запуске уровня и после паузы)"""
+        self.accumulator = 0
+
+    def advance(self, milliseconds: float) -> int:
+        """ Добавление времени кадра
+
+        :param milliseconds: сколько миллисекунд прошло с прошлого кадра
+        :return: сколько шагов симуляции нужно сделать
+        """
+        self.accumulator += milliseconds * self.rate
+        steps = int(self.accumulator // 1000)
+        if steps > self.max_steps:
+            # Отстали слишком сильно: лишнее время отбрасывается
+            steps = self.max_steps
+            self.accumulator = 0
+        else:
+            self.accumulator -= steps * 1000
+        return steps
+
+    @property
+    def alpha(self) -> float:
+        """Какая доля следующего шага уже прошла (от 0 до 1)"""
+        return self.accumulator / 1000
@@ -0,0 +1,108 @@
+from constants import TILE_WIDTH, TILE_HEIGHT, CHUNK_SIZE, WIDTH, HEIGHT, \
+    CHUNK_VIEW_MARGIN, SIMULATION_NEAR_RADIUS
+from metrics import metrics
+
+
+class Viewport:
+    """Видимая часть уровня в чанках. Список видимых чанков пересчитывается,
+    только когда камера переходит в другую клетку, и при этом известно,
+    какие чанки стали видны (entered), а какие пропали с экрана (exited)
+
+    Чанк видим, если на экран (с запасом margin с каждой стороны) попадает
+    хоть одна его клетка или изображение, которое выходит за его правый или
+    нижний край (overhang)
+
+    Вокруг видимых чанков лежит кольцо ближних чанков (near) шириной
+    near_radius чанков: их враги симулируются упрощённо
+
+    """
+
+    def __init__(self, level_x: int, level_y: int, exists,
+                 overhang=(0, 0), margin=CHUNK_VIEW_MARGIN,
+                 near_radius=SIMULATION_NEAR_RADIUS) -> None:
+        """
+        :param level_x: ширина уровня в чанках
+        :param level_y: высота уровня в чанках
+        :param exists: проверка, есть ли чанк с таким номером (пустые чанки
+        не отрисовываются)
+        :key overhang: насколько (в пикселях по осям x и y) изображения
+        тайлов могут выходить за правый и нижний край своего чанка
+        :key margin: запас в пикселях вокруг экрана
+        :key near_radius: ширина кольца ближних чанков (в чанках)
+        """
+        self.level_x = level_x
+        self.level_y = level_y
+        self.exists = exists
+        self.overhang_x, self.overhang_y = overhang
+        self.margin = margin
+        self.near_radius = near_radius
+        # Клетки уровня, попавшие на экран при последнем пересчёте (левая,
+        # верхняя, правая, нижняя)
+        self.cells = None
+        # Номера видимых непустых чанков (по строкам, слева направо)
+        self.visible = []
+        # Номера непустых чанков кольца вокруг видимых
+        self.near = []
+        # Чанки, которые стали видны и пропали с экрана при последнем
+        # обновлении
+        self.entered = []
+        self.exited = []
+
+    def update(self, camera) -> bool:
+        """ Пересчёт видимых чанков по положению камеры
+
+        :param camera: камера
+        :return: изменился ли список видимых чанков
+        """
+        left = int(camera.x - camera.dx) - self.margin
+        top = int(camera.y - camera.dy) - self.margin
+        cells = (left // TILE_WIDTH, top // TILE_HEIGHT,
+                 (left + WIDTH + 2 * self.margin - 1) // TILE_WIDTH,
+                 (top + HEIGHT + 2 * self.margin - 1) // TILE_HEIGHT)
+        self.entered, self.exited = [], []
+        if cells == self.cells:
+            return False
+        self.cells = cells
+
+        bounds = self._bounds(*cells)
+        visible = self._chunks(*bounds)
+        x1, y1, x2, y2 = bounds
+        radius = self.near_radius
+        self.near = [
+            number for number in self._chunks(
+                max(x1 - radius, 0), max(y1 - radius, 0),
+                min(x2 + radius, self.level_x - 1),
+                min(y2 + radius, self.level_y - 1)
+            ) if number not in visible
+        ]
+        if visible == self.visible:
+            return False
+        metrics.count('visible_set_rebuilds')
+        old, new = set(self.visible), set(visible)
+        self.entered = [number for number in visible if number not in old]
+        self.exited = [number for number in self.visible if number not in new]
+        self.visible = visible
+        return True
+
+    def _bounds(self, left: int, top: int, right: int,
+                bottom: int) -> tuple[int, int, int, int]:
+        """Крайние столбцы и строки чанков, которые задевает прямоугольник
+        клеток
+        """
+        # Чанк с номером столбца x занимает клетки от x * CHUNK_SIZE до
+        # (x + 1) * CHUNK_SIZE - 1, а его изображения - ещё overhang правее
+        x1 = max((left * TILE_WIDTH - self.overhang_x) //
+                 (CHUNK_SIZE * TILE_WIDTH), 0)
+        y1 = max((top * TILE_HEIGHT - self.overhang_y) //
+                 (CHUNK_SIZE * TILE_HEIGHT), 0)
+        x2 = min(right // CHUNK_SIZE, self.level_x - 1)
+        y2 = min(bottom // CHUNK_SIZE, self.level_y - 1)
+        return x1, y1, x2, y2
+
+    def _chunks(self, x1: int, y1: int, x2: int, y2: int) -> list:
+        """Непустые чанки в прямоугольнике чанков (включая края)"""
+        return [
+            x + y * self.level_x
+            for y in range(y1, y2 + 1) for x in range(x1, x2 + 1)
+            if self.exists(x + y * self.level_x)
+        ]
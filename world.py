@@ -0,0 +1,370 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+from pygame import Rect
+from pygame.mixer import Sound
+
+from camera import Camera
+from chunk import Chunk
+from collision import OccupancyGrid, merge_tiles
+from constants import TILE_WIDTH, TILE_HEIGHT, CHUNK_SIZE, \
+    CHUNK_LOAD_RADIUS, CHUNK_UNLOAD_RADIUS, CHUNK_PREPARE_WORKERS, WIDTH, \
+    HEIGHT, SPRITE_CULL_MARGIN, BULLET_WIDTH, DIRECTION_LEFT
+from enemy_store import EnemyStore
+from level_loader import Level, LevelWindow
+from metrics import metrics
+from row_index import RowIndex
+from spatial_hash import SpatialHash, world_rect
+from static_layers import StaticLayerCache
+from viewport import Viewport
+from tile_types import STATIC_LAYERS
+
+
+class World:
+    """Мир уровня: чанки создаются по мере приближения к ним камеры и
+    выгружаются, когда камера уходит далеко. Пустые чанки (без единого
+    тайла) не создаются вовсе
+
+    """
+
+    def __init__(self, level: Level, tile_images: list, enemy_images: list,
+                 coin_images: list, coin_selection_sound: Sound,
+                 load_radius=CHUNK_LOAD_RADIUS,
+                 unload_radius=CHUNK_UNLOAD_RADIUS,
+                 workers=CHUNK_PREPARE_WORKERS) -> None:
+        """
+        :param level: загруженный уровень
+        :param tile_images: изображения всех тайлов (индекс - код тайла)
+        :param enemy_images: изображения всех врагов
+        :param coin_images: изображения монеток
+        :param coin_selection_sound: звук подбора монеты
+        :key load_radius: радиус (в чанках) вокруг камеры, в котором чанки
+        подгружаются
+        :key unload_radius: радиус (в чанках), за пределами которого чанки
+        выгружаются
+        :key workers: сколько потоков готовят данные чанков при запуске
+        уровня (0 - всё в главном потоке)
+        """
+        if unload_radius < load_radius:
+            raise ValueError('Радиус выгрузки не может быть меньше радиуса '
+                             'подгрузки чанков')
+        self.level = level
+        # Размеры уровня в чанках
+        self.level_x = level.level_x
+        self.level_y = level.level_y
+        self.tile_images = tile_images
+        self.enemy_images = enemy_images
+        self.coin_images = coin_images
+        self.coin_selection_sound = coin_selection_sound
+        self.load_radius = load_radius
+        self.unload_radius = unload_radius
+        self.workers = workers
+        # Маска непустых чанков - только такие чанки и создаются
+        self.occupied = level.chunk_mask.reshape(-1)
+        # Раскодированные столбцы уровня рядом с камерой
+        self.window = LevelWindow(level, unload_radius)
+        # Загруженные чанки: номер чанка -> чанк
+        self.loaded = {}
+        # Сохранённое состояние выгруженных чанков: номер чанка -> снимок
+        self.saved_states = {}
+        # Сетка занятости всего уровня (стены и коробки)
+        with self._executor() as executor:
+            self.grid = OccupancyGrid.from_level(level, executor)
+        # Коробки и враги всех загруженных чанков по строкам тайлов (в них
+        # попадают снаряды) и пространственный хэш монет
+        self.boxes = RowIndex()
+        self.enemies = RowIndex()
+        self.coins = SpatialHash()
+        # Состояние врагов всех загруженных чанков (массивы по ячейкам)
+        self.enemy_store = EnemyStore()
+        # Коробки, враги и монеты на экране (остальные не отрисовываются)
+        self.on_screen = set()
+        # Видимые чанки (изображения тайлов могут выходить за край чанка)
+        self.viewport = Viewport(self.level_x, self.level_y, self.__contains__,
+                                 self._overhang(tile_images))
+        # Заранее отрисованные стены и фон чанков
+        self.static_layers = StaticLayerCache(tile_images, STATIC_LAYERS)
+
+    def __len__(self) -> int:
+        return self.level_x * self.level_y
+
+    def __contains__(self, chunk_number: int) -> bool:
+        """Есть ли в чанке с таким номером хоть один тайл"""
+        return 0 <= chunk_number < len(self) and \
+            bool(self.occupied[chunk_number])
+
+    def __getitem__(self, chunk_number: int) -> Chunk:
+        """Чанк по номеру (если чанк не загружен, он тут же создаётся).
+        Для пустого чанка выбрасывается KeyError
+        """
+        chunk = self.loaded.get(chunk_number)
+        if chunk is None:
+            chunk = self.load_chunk(chunk_number)
+        return chunk
+
+    def load_chunk(self, chunk_number: int) -> Chunk:
+        """Создание чанка и восстановление его сохранённого состояния"""
+        if chunk_number not in self:
+            raise KeyError(f'Чанк с номером {chunk_number} пуст')
+        x, y = chunk_number % self.level_x, chunk_number // self.level_x
+        chunk = Chunk(
+            self.tile_images, self.enemy_images, x, y,
+            self.window.chunk_map(x, y), self.level_x,
+            self.level.chunk_layout(x, y), self.enemy_store
+        )
+        state = self.saved_states.pop(chunk_number, None)
+        if state is not None:
+            chunk.restore_state(state, self.coin_images,
+                                self.coin_selection_sound)
+        slots = np.array([enemy.slot for enemy in chunk.enemies_group],
+                         dtype=np.intp)
+        self.enemy_store.place(slots)
+        # Враги сразу получают промежутки для упрощённой симуляции
+        self.enemy_store.survey(slots, self.grid)
+        self.boxes.add(chunk.boxes_group)
+        self.enemies.add(chunk.enemies_group)
+        self.coins.add(chunk.coins_group)
+        self.loaded[chunk_number] = chunk
+        metrics.count('chunk_loads')
+        return chunk
+
+    def unload_chunk(self, chunk_number: int) -> None:
+        """Выгрузка чанка с сохранением его динамического состояния"""
+        chunk = self.loaded.pop(chunk_number)
+        self.saved_states[chunk_number] = chunk.save_state()
+        # Убираем спрайты из всех групп, чтобы их можно было собрать
+        for sprite in chunk.all_sprites:
+            sprite.kill()
+        metrics.count('chunk_unloads')
+
+    def background_rects(self, camera: Camera, chunk_numbers: list) -> list:
+        """ Участки экрана, где виден задний фон: всё, что закрыто
+        непрозрачными статичными слоями отрисовываемых чанков, фон всё равно
+        закрасит
+
+        :param camera: камера (или её положение для отрисовки)
+        :param chunk_numbers: номера отрисовываемых чанков
+        :return: прямоугольники в координатах экрана
+        """
+        # Клетки уровня, которые попадают на экран
+        origin_x = int(camera.x - camera.dx)
+        origin_y = int(camera.y - camera.dy)
+        left, top = origin_x // TILE_WIDTH, origin_y // TILE_HEIGHT
+        covered = np.zeros(
+            ((origin_y + HEIGHT - 1) // TILE_HEIGHT - top + 1,
+             (origin_x + WIDTH - 1) // TILE_WIDTH - left + 1), dtype=bool
+        )
+        for chunk_number in chunk_numbers:
+            chunk = self[chunk_number]
+            layer = self.static_layers.get(chunk.layout)
+            if layer is None:
+                continue
+            chunk_left = chunk.x * CHUNK_SIZE - left
+            chunk_top = chunk.y * CHUNK_SIZE - top
+            # Закрытыми считаются только клетки, лежащие в непрозрачных
+            # прямоугольниках целиком
+            for rect in layer[2]:
+                covered[
+                    max(chunk_top - (-rect.top // TILE_HEIGHT), 0):
+                    max(chunk_top + rect.bottom // TILE_HEIGHT, 0),
+                    max(chunk_left - (-rect.left // TILE_WIDTH), 0):
+                    max(chunk_left + rect.right // TILE_WIDTH, 0)
+                ] = True
+        screen = Rect(0, 0, WIDTH, HEIGHT)
+        return [
+            Rect((left + x) * TILE_WIDTH - origin_x,
+                 (top + y) * TILE_HEIGHT - origin_y,
+                 width * TILE_WIDTH, height * TILE_HEIGHT).clip(screen)
+            for x, y, width, height in merge_tiles(~covered)
+        ]
+
+    def update_enemies(self, frame: int, player_group, shot_sounds: list,
+                       bullets) -> None:
+        """ Шаг симуляции врагов с тремя уровнями детализации. Враги
+        видимых чанков симулируются полностью: патрулирование, поиск
+        игрока, стрельба и падение. Враги кольца ближних чанков только
+        патрулируют и отсчитывают таймеры (без проверок касаний и зрения),
+        а враги остальных загруженных чанков спят, пока камера не подойдёт
+        ближе. Время каждого уровня записывается в метрики кадра. Чанки
+        кольца всегда загружены (их подгружает update)
+
+        :param frame: номер шага симуляции (для анимации)
+        :param player_group: группа спрайта игрока
+        :param shot_sounds: звуки выстрелов по типам врагов
+        :param bullets: пул снарядов
+        """
+        store = self.enemy_store
+        store.start_step()
+        with metrics.timer('enemies_full_time'):
+            active = store.active(self.viewport.visible)
+            self._simulate_enemies(active, frame, player_group, shot_sounds,
+                                   bullets)
+        with metrics.timer('enemies_near_time'):
+            near = store.active(self.viewport.near)
+            store.coast(near)
+            for enemy in store.take_moved(near):
+                self.enemies.move(enemy)
+        metrics.count('enemies_simulated', len(active))
+        metrics.count('enemies_coasting', len(near))
+        metrics.count('enemies_dormant', len(store) - len(active) - len(near))
+
+    def _simulate_enemies(self, active: np.ndarray, frame: int, player_group,
+                          shot_sounds: list, bullets) -> None:
+        """ Полный шаг симуляции врагов. Всё считается сразу для всех
+        врагов операциями над массивами хранилища, по одному обходятся
+        только выстрелившие и сдвинувшиеся враги
+
+        :param active: ячейки обрабатываемых врагов
+        :param frame: номер шага симуляции (для анимации)
+        :param player_group: группа спрайта игрока
+        :param shot_sounds: звуки выстрелов по типам врагов
+        :param bullets: пул снарядов
+        """
+        store = self.enemy_store
+        store.patrol(active, frame)
+        seen = np.zeros(len(active), dtype=bool)
+        for player in player_group:
+            seen |= store.watching(active, self.grid, world_rect(player))
+        # Создание пуль выстреливших врагов
+        for slot in store.think(active, seen).tolist():
+            enemy = store.sprites[slot]
+            if enemy.direction == DIRECTION_LEFT:
+                x = enemy.x - BULLET_WIDTH
+            else:
+                x = enemy.x + enemy.rect.w
+            shot_sounds[enemy.type].play()
+            bullets.fire(enemy.direction, x, enemy.y + enemy.rect.h // 2,
+                         is_enemy=True, damage=enemy.damage)
+        # Сдвинувшиеся враги обновляют свои строки в индексе снарядов
+        for enemy in store.take_moved(active):
+            self.enemies.move(enemy)
+        store.fall(active, self.grid)
+        # Промежутки врагов нужны упрощённой симуляции
+        store.survey(active, self.grid)
+
+    def wake_above(self, support) -> None:
+        """ Опору (коробку) разрушают - будим коробки и стоящих врагов над
+        ней. Проснувшаяся коробка начнёт падать, поэтому будятся и все, кто
+        стоит на ней
+
+        :param support: разрушаемая коробка
+        """
+        # Сама опора тоже попадает в полосу над собой
+        support.resting = False
+        supports = [support]
+        while supports:
+            rect = world_rect(supports.pop())
+            # Полоса над опорой (с запасом на пиксель внутрь опоры, в который
+            # утоплены стоящие на ней враги)
+            above = Rect(rect.x, rect.y - TILE_HEIGHT, rect.w,
+                         TILE_HEIGHT + 1)
+            for box in self.boxes.collide(above):
+                if box.resting:
+                    box.resting = False
+                    supports.append(box)
+                    metrics.count('bodies_woken')
+            for enemy in self.enemies.collide(above):
+                if enemy.resting:
+                    enemy.resting = False
+                    metrics.count('bodies_woken')
+
+    def _executor(self):
+        """Пул потоков для подготовки данных (или заглушка без потоков)"""
+        if self.workers:
+            return ThreadPoolExecutor(self.workers)
+        return nullcontext()
+
+    def prepare(self, chunk_x: int, chunk_y: int) -> None:
+        """ Подготовка чанков вокруг точки появления игрока до первого кадра.
+        Раскодирование столбцов уровня и отрисовка статичных слоёв -
+        независимые задачи, они выполняются в пуле потоков. В главном
+        потоке остаётся только создание спрайтов
+
+        :param chunk_x: координата чанка по оси x
+        :param chunk_y: координата чанка по оси y
+        """
+        numbers = list(self._missing_chunks(chunk_x, chunk_y))
+        columns = sorted({number % self.level_x for number in numbers})
+        layouts = {}
+        for number in numbers:
+            layout = self.level.chunk_layout(number % self.level_x,
+                                             number // self.level_x)
+            if layout not in self.static_layers:
+                layouts[layout.number] = layout
+
+        with self._executor() as executor:
+            run = map if executor is None else executor.map
+            # list нужен, чтобы дождаться выполнения всех задач
+            list(run(self.window.column, columns))
+            layers = list(run(self.static_layers.bake, layouts.values()))
+        for layout, layer in zip(layouts.values(), layers):
+            self.static_layers.put(layout, layer)
+        for number in numbers:
+            self.load_chunk(number)
+
+    def update(self, camera: Camera) -> None:
+        """Подгрузка чанков рядом с камерой, выгрузка дальних чанков и
+        пересчёт видимых чанков
+        """
+        center_x, center_y = camera.world_center()
+        chunk_x = center_x // (CHUNK_SIZE * TILE_WIDTH)
+        chunk_y = center_y // (CHUNK_SIZE * TILE_HEIGHT)
+
+        self.window.update(chunk_x)
+        # Выгружаем чанки, от которых камера ушла слишком далеко (кроме
+        # видимых и кольца вокруг них)
+        kept = set(self.viewport.visible)
+        kept.update(self.viewport.near)
+        for chunk_number in list(self.loaded):
+            x, y = chunk_number % self.level_x, chunk_number // self.level_x
+            if max(abs(x - chunk_x), abs(y - chunk_y)) > \
+                    self.unload_radius and chunk_number not in kept:
+                self.unload_chunk(chunk_number)
+
+        # Подгружаем чанки в радиусе камеры
+        for chunk_number in self._missing_chunks(chunk_x, chunk_y):
+            self.load_chunk(chunk_number)
+
+        # Чанкам, которые только что появились на экране, заранее готовим
+        # статичный слой
+        if self.viewport.update(camera):
+            for chunk_number in self.viewport.entered:
+                self.static_layers.get(self[chunk_number].layout)
+        # Кольцо вокруг видимых чанков шире радиуса подгрузки (видимые
+        # чанки доходят до второго чанка от камеры), поэтому его чанки
+        # подгружаются отдельно: их враги должны двигаться ещё до того, как
+        # появятся на экране
+        for chunk_number in self.viewport.near:
+            if chunk_number not in self.loaded:
+                self.load_chunk(chunk_number)
+
+        # Спрайты на экране находятся одним запросом к индексам всего
+        # уровня, а не перебором спрайтов каждого чанка
+        view = Rect(int(camera.x - camera.dx), int(camera.y - camera.dy),
+                    WIDTH, HEIGHT).inflate(2 * SPRITE_CULL_MARGIN,
+                                           2 * SPRITE_CULL_MARGIN)
+        self.on_screen = set(self.boxes.collide(view))
+        self.on_screen.update(self.enemies.collide(view))
+        self.on_screen.update(self.coins.collide(view))
+
+    @staticmethod
+    def _overhang(tile_images: list) -> tuple[int, int]:
+        """Насколько изображения тайлов выходят за свою клетку"""
+        images = [image for image in tile_images if image is not None]
+        return (max([image.get_width() for image in images],
+                    default=TILE_WIDTH) - TILE_WIDTH,
+                max([image.get_height() for image in images],
+                    default=TILE_HEIGHT) - TILE_HEIGHT)
+
+    def _missing_chunks(self, chunk_x: int, chunk_y: int):
+        """Номера непустых, но ещё не загруженных чанков в радиусе
+        подгрузки вокруг чанка
+        """
+        for y in range(max(chunk_y - self.load_radius, 0),
+                       min(chunk_y + self.load_radius + 1, self.level_y)):
+            for x in range(max(chunk_x - self.load_radius, 0),
+                           min(chunk_x + self.load_radius + 1, self.level_x)):
+                chunk_number = x + y * self.level_x
+                if chunk_number in self and chunk_number not in self.loaded:
+                    yield chunk_number